@@ -15,9 +15,13 @@
 #
 
 import os
+import sys
 from ctypes import *
 from enum import Enum
 
+# byte order prefix of native samples in array interface type strings and buffer formats
+_NATIVE_ORDER = '<' if sys.byteorder == 'little' else '>'
+
 
 class Porcupine(object):
     """Python binding for Picovoice's wake word detection (aka Porcupine) library."""
@@ -94,6 +98,7 @@ class Porcupine(object):
             raise ValueError("Sensitivity and/or keyword file path is missing")
 
         self._num_keywords = len(keyword_file_paths)
+        self._keyword_file_paths = list(keyword_file_paths)
 
         init_func = library.pv_porcupine_multiple_keywords_init
         init_func.argtypes = [
@@ -119,12 +124,21 @@ class Porcupine(object):
         self.process_func.argtypes = [POINTER(self.CPorcupine), POINTER(c_short), POINTER(c_int)]
         self.process_func.restype = self.PicovoiceStatuses
 
+        # second binding of the same symbol for 'process_buffer': raw addresses in, plain int status out
+        self._process_buffer_func = library['pv_porcupine_multiple_keywords_process']
+        self._process_buffer_func.argtypes = [c_void_p, c_void_p, c_void_p]
+        self._process_buffer_func.restype = c_int
+        self._handle_address = cast(self._handle, c_void_p).value
+        self._result = c_int()
+        self._result_address = addressof(self._result)
+
         self._delete_func = library.pv_porcupine_delete
         self._delete_func.argtypes = [POINTER(self.CPorcupine)]
         self._delete_func.restype = None
 
         self._sample_rate = library.pv_sample_rate()
         self._frame_length = library.pv_porcupine_frame_length()
+        self._frame_bytes = self._frame_length * sizeof(c_short)
 
     @property
     def sample_rate(self):
@@ -138,6 +152,12 @@ class Porcupine(object):
 
         return self._frame_length
 
+    @property
+    def keyword_file_paths(self):
+        """Keyword files in the order of the keyword indices returned by 'process'."""
+
+        return self._keyword_file_paths
+
     def process(self, pcm):
         """
         Monitors incoming audio stream for given wake word(s).
@@ -162,6 +182,52 @@ class Porcupine(object):
         else:
             return keyword_index
 
+    def process_buffer(self, pcm):
+        """
+        Same as 'process' but hands the memory of 'pcm' straight to the C library instead of copying the samples into a
+        new ctypes array. Intended for the per-frame hot path of audio stream callbacks.
+
+        :param pcm: Object supporting the buffer protocol (e.g. bytes, bytearray, memoryview or an int16 numpy array)
+        holding at least 'frame_length' 16-bit samples in native byte order. Only the first 'frame_length' samples are
+        processed.
+        :return: Same as 'process'.
+        """
+
+        status = self._process_buffer_func(self._handle_address, self._buffer_address(pcm), self._result_address)
+        if status:
+            raise self._PICOVOICE_STATUS_TO_EXCEPTION[self.PicovoiceStatuses(status)]('Processing failed')
+
+        if self._num_keywords == 1:
+            return self._result.value == 0
+        else:
+            return self._result.value
+
+    def _buffer_address(self, pcm):
+        """Returns something ctypes can pass as 'const int16_t *' without copying the samples of 'pcm'."""
+
+        if isinstance(pcm, bytes):
+            if len(pcm) < self._frame_bytes:
+                raise ValueError('Buffer holds less than %d samples' % self._frame_length)
+            return pcm
+
+        array_interface = getattr(pcm, '__array_interface__', None)
+        if array_interface is not None:
+            # the type, not only the item size: uint16, float16 or byte-swapped samples would be read as int16 PCM
+            if array_interface['typestr'] != _NATIVE_ORDER + 'i2' or not pcm.flags['C_CONTIGUOUS']:
+                raise ValueError('Array has to be C-contiguous with int16 samples in native byte order')
+            if pcm.nbytes < self._frame_bytes:
+                raise ValueError('Buffer holds less than %d samples' % self._frame_length)
+            return array_interface['data'][0]
+
+        view = memoryview(pcm)
+        if view.format.lstrip('@=' + _NATIVE_ORDER) not in ('B', 'b', 'c', 'h'):
+            raise ValueError("Buffer has to hold raw bytes or int16 samples in native byte order, not '%s'" % view.format)
+        if view.nbytes < self._frame_bytes:
+            raise ValueError('Buffer holds less than %d samples' % self._frame_length)
+        if view.readonly:
+            return view.tobytes()
+        return addressof(c_char.from_buffer(view))
+
     def delete(self):
         """Releases resources acquired by Porcupine's library."""
 
@@ -18,6 +18,7 @@ import os
 import platform
 import unittest
 
+import numpy as np
 import soundfile
 from porcupine import Porcupine
 
@@ -45,6 +46,52 @@ class PorcupineTestCase(unittest.TestCase):
 
         self.assertEqual(sum(results), 1)
 
+    def test_process_buffer(self):
+        # keyword files and model bundled with the wake-word tool, there are no audio samples: synthetic speech-like
+        # audio that makes some of the keywords fire at the highest sensitivity
+        keyword_file_paths = [
+            self._abs_path('../../keyword_files/%s_%s.ppn' % (name, self._keyword_file_extension())) for name in
+            ['alexa', 'americano', 'avocado', 'blueberry', 'bumblebee', 'caterpillar', 'christina', 'dragonfly',
+             'flamingo', 'francesca', 'grapefruit', 'grasshopper', 'iguana', 'picovoice', 'pineapple', 'porcupine',
+             'raspberry', 'terminator', 'vancouver']]
+        detectors = [Porcupine(
+            library_path=self._library_path(),
+            model_file_path=self._abs_path('../../lib/common/porcupine_params.pv'),
+            keyword_file_paths=keyword_file_paths,
+            sensitivities=[1.0] * len(keyword_file_paths)) for _ in range(2)]
+        porcupine, buffer_porcupine = detectors
+
+        audio = self._synthetic_speech(12, 20, porcupine.sample_rate)
+        audio_bytes = audio.tobytes()
+        frame_bytes = 2 * porcupine.frame_length
+        num_frames = len(audio) // porcupine.frame_length
+        results = []
+        buffer_results = []
+        for i in range(num_frames):
+            frame = audio[i * porcupine.frame_length:(i + 1) * porcupine.frame_length]
+            results.append(porcupine.process(frame))
+            # every kind of buffer an audio stream or the frame queue delivers
+            frame_buffer = [
+                frame,
+                audio_bytes[i * frame_bytes:(i + 1) * frame_bytes],
+                bytearray(audio_bytes[i * frame_bytes:(i + 1) * frame_bytes]),
+                memoryview(bytearray(audio_bytes[i * frame_bytes:(i + 1) * frame_bytes]))][i % 4]
+            buffer_results.append(buffer_porcupine.process_buffer(frame_buffer))
+
+        self.assertEqual(buffer_results, results)
+        self.assertTrue(any(x >= 0 for x in results))
+
+        with self.assertRaises(ValueError):
+            buffer_porcupine.process_buffer(b'\x00' * (frame_bytes - 2))
+        frame = audio[:porcupine.frame_length]
+        for wrong_type in [frame.astype(np.uint16), frame.astype(np.float16), frame.astype('>i2'),
+                           memoryview(frame.astype(np.uint16))]:
+            with self.assertRaises(ValueError):
+                buffer_porcupine.process_buffer(wrong_type)
+
+        for detector in detectors:
+            detector.delete()
+
     def test_process_multiple(self):
         keyword_file_names = ['alexa', 'americano', 'avocado', 'blueberry', 'bumblebee', 'caterpillar', 'christina',
                               'dragonfly', 'flamingo', 'francesca', 'grapefruit', 'grasshopper', 'iguana', 'picovoice',
@@ -76,6 +123,17 @@ class PorcupineTestCase(unittest.TestCase):
 
         porcupine.delete()
 
+    @staticmethod
+    def _synthetic_speech(seed, seconds, sample_rate):
+        """Harmonic tones with a random pitch and syllable-like loudness, plus some noise (int16)."""
+
+        random = np.random.RandomState(seed)
+        pitch = np.repeat(random.uniform(100, 250, seconds * 5), sample_rate // 5)
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        signal = sum(np.sin(k * phase) * random.uniform(0.2, 1) for k in range(1, 8))
+        envelope = np.repeat(random.uniform(0, 1, seconds * 8), sample_rate // 8)
+        return (signal * envelope * 3000 + random.normal(0, 300, len(signal))).astype(np.int16)
+
     @staticmethod
     def _abs_path(rel_path):
         return os.path.join(os.path.dirname(__file__), rel_path)
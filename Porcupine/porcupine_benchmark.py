@@ -0,0 +1,214 @@
+#
+# S.E.P.I.A. wake-word hot-path micro-benchmarks
+#
+
+import argparse
+import json
+import os
+import platform
+import re
+import struct
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from ctypes import c_short
+from datetime import datetime
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
+from porcupine import Porcupine
+
+from porcupine_sepia_remote import SepiaPorcupineRemote
+from wakeword.frames import FrameQueue, FrameRingBuffer
+from wakeword.library import default_library_path, default_model_file_path
+from wakeword.sources import AudioSource
+
+FORMAT_VERSION = 1
+
+
+def measure(stage, iterations, warm_up=0.1):
+    """
+    Calls 'stage()' 'iterations' times and times every call. Returns a dict with frames per second (one call = one
+    frame), mean and p50/p99/p99.9 latency in microseconds.
+    """
+    for _ in range(max(1, int(iterations * warm_up))):
+        stage()
+    timer = time.perf_counter_ns
+    durations = np.zeros(iterations, dtype=np.int64)
+    for i in range(iterations):
+        start = timer()
+        stage()
+        durations[i] = timer() - start
+    total = float(durations.sum())
+    p50, p99, p999 = np.percentile(durations, [50, 99, 99.9]) / 1000.0
+    return OrderedDict([
+        ('iterations', iterations),
+        ('frames_per_second', iterations / (total / 1e9) if total else 0.0),
+        ('mean_us', total / iterations / 1000.0),
+        ('p50_us', p50),
+        ('p99_us', p99),
+        ('p999_us', p999)])
+
+
+def create_stages(porcupine, data, daemon):
+    """
+    Returns an ordered dict name -> (function, relative cost) of all stages for one frame of audio 'data' (bytes).
+    Cheap stages run 10x as often as the native ones to get stable percentiles. 'daemon' is a 'SepiaPorcupineRemote'
+    whose audio callback is measured.
+    """
+    frame_length = porcupine.frame_length
+    frame_format = '%dh' % frame_length
+    legacy_format = 'h' * frame_length     # the format string the original callback built for every frame
+    pcm = struct.unpack_from(frame_format, data)
+    array = np.frombuffer(data, dtype=np.int16).copy()
+    array_type = c_short * frame_length
+    statuses = Porcupine.PicovoiceStatuses
+    native = porcupine._process_buffer_func
+    handle_address = porcupine._handle_address
+    result_address = porcupine._result_address
+
+    # what the daemon does per frame: audio callback -> frame queue -> detector thread
+    frame_queue = FrameQueue(4, len(data))
+    frame_buffer = FrameRingBuffer(frame_length)
+    # the daemon's own callback, delivering into our queue as if 'run' had set it up with a live source
+    daemon._frame_queue = frame_queue
+    daemon._audio_source_instance = AudioSource(porcupine.sample_rate, frame_length)
+    audio_callback = daemon._audio_callback
+
+    def detector():
+        in_data = frame_queue.get(timeout=0)
+        for frame in frame_buffer.push(in_data):
+            porcupine.process_buffer(frame)
+        frame_queue.release()
+
+    def callback_and_detector():
+        audio_callback(data)
+        detector()
+
+    def callback():
+        audio_callback(data)
+        frame_queue.get(timeout=0)
+        frame_queue.release()
+
+    stages = OrderedDict()
+    stages['timer'] = (lambda: None, 10)
+    stages['convert_struct_legacy'] = (lambda: struct.unpack_from(legacy_format, data), 10)
+    stages['convert_struct'] = (lambda: struct.unpack_from(frame_format, data), 10)
+    stages['convert_numpy'] = (lambda: np.frombuffer(data, dtype=np.int16), 10)
+    stages['convert_memoryview'] = (lambda: memoryview(data).cast('h'), 10)
+    stages['ctypes_array_from_tuple'] = (lambda: array_type(*pcm), 10)
+    stages['ctypes_array_from_buffer'] = (lambda: array_type.from_buffer_copy(data), 10)
+    stages['buffer_address_bytes'] = (lambda: porcupine._buffer_address(data), 10)
+    stages['buffer_address_numpy'] = (lambda: porcupine._buffer_address(array), 10)
+    stages['status_enum'] = (lambda: statuses(0) is not statuses.SUCCESS, 10)
+    stages['status_int'] = (lambda: bool(0), 10)
+    stages['native_call'] = (lambda: native(handle_address, data, result_address), 1)
+    stages['process_legacy'] = (lambda: porcupine.process(struct.unpack_from(legacy_format, data)), 1)
+    stages['process'] = (lambda: porcupine.process(pcm), 1)
+    stages['process_buffer_bytes'] = (lambda: porcupine.process_buffer(data), 1)
+    stages['process_buffer_numpy'] = (lambda: porcupine.process_buffer(array), 1)
+    stages['callback'] = (callback, 10)
+    stages['callback_and_detector'] = (callback_and_detector, 1)
+    return stages
+
+
+def host_info():
+    """Describes the machine, so results of different hosts can be told apart."""
+
+    cpu = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as cpuinfo:
+            for line in cpuinfo:
+                key, _, value = line.partition(':')
+                if key.strip() in ('model name', 'Model', 'Hardware'):
+                    cpu = value.strip()
+    except IOError:
+        pass
+    return OrderedDict([
+        ('machine', platform.machine()),
+        ('platform', platform.platform()),
+        ('cpu', cpu),
+        ('cpu_count', os.cpu_count()),
+        ('python', platform.python_version()),
+        ('numpy', np.__version__)])
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+            stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(stages, baseline=None):
+    if baseline:
+        print('%-26s %12s %9s %9s %9s %9s' % ('stage', 'frames/s', 'p50 us', 'p99 us', 'p99.9 us', 'speed-up'))
+    else:
+        print('%-26s %12s %9s %9s %9s' % ('stage', 'frames/s', 'p50 us', 'p99 us', 'p99.9 us'))
+    for name, result in stages.items():
+        line = '%-26s %12.0f %9.2f %9.2f %9.2f' % (
+            name, result['frames_per_second'], result['p50_us'], result['p99_us'], result['p999_us'])
+        if baseline:
+            old = baseline.get(name)
+            line += ' %8.2fx' % (old['p50_us'] / result['p50_us']) if old and result['p50_us'] else ' %9s' % '-'
+        print(line)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Per-frame cost of each stage from audio buffer to Porcupine result.')
+    parser.add_argument('--keyword_file_paths', help='Comma-separated absolute paths to keyword files.', type=str, default='porcupine/keyword_files/hey_sepia_windows.ppn')
+    parser.add_argument('--library_path', help='Path to Porcupine library (default: autodetect).', type=str)
+    parser.add_argument('--model_file_path', help='Path to model parameter file.', type=str, default=default_model_file_path())
+    parser.add_argument('--iterations', help='Timed calls of the native stages (cheap stages run 10x as often).', type=int, default=2000)
+    parser.add_argument('--stages', help='Regular expression selecting the stages to run.', type=str, default='.')
+    parser.add_argument('--cpu', help='Pin the benchmark to this CPU core for more stable numbers (Linux).', type=int, default=None)
+    parser.add_argument('--baseline', help='JSON results of an earlier run (other commit or host) to compare with.', type=str, default=None)
+    parser.add_argument('--output_path', help='Write the results as JSON to this file.', type=str, default=None)
+    args = parser.parse_args()
+
+    if args.cpu is not None:
+        os.sched_setaffinity(0, [args.cpu])
+    library_path = args.library_path if args.library_path is not None else default_library_path()
+    keyword_file_paths = [x.strip() for x in args.keyword_file_paths.split(',')]
+    porcupine = Porcupine(
+        library_path=library_path,
+        model_file_path=args.model_file_path,
+        keyword_file_paths=keyword_file_paths,
+        sensitivities=[0.5] * len(keyword_file_paths))
+    daemon = SepiaPorcupineRemote(library_path=library_path, model_file_path=args.model_file_path,
+        keyword_file_paths=keyword_file_paths, user_id="")
+    try:
+        # speech-level noise, fixed seed so every run processes the same audio
+        data = (np.random.RandomState(0).randn(porcupine.frame_length) * 3000).astype(np.int16).tobytes()
+        results = OrderedDict()
+        for name, (stage, cost) in create_stages(porcupine, data, daemon).items():
+            if re.search(args.stages, name):
+                results[name] = measure(stage, args.iterations * cost)
+    finally:
+        daemon._dispatcher.stop()
+        porcupine.delete()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)['stages']
+    print_results(results, baseline)
+
+    if args.output_path:
+        with open(args.output_path, 'w') as output:
+            json.dump(OrderedDict([
+                ('format_version', FORMAT_VERSION),
+                ('commit', git_commit()),
+                ('time', datetime.now().isoformat()),
+                ('host', host_info()),
+                ('settings', OrderedDict([
+                    ('library_path', os.path.relpath(library_path)),
+                    ('model_file_path', os.path.relpath(args.model_file_path)),
+                    ('keyword_file_paths', keyword_file_paths),
+                    ('frame_length', porcupine.frame_length),
+                    ('iterations', args.iterations),
+                    ('cpu', args.cpu)])),
+                ('stages', results)]), output, indent=2)
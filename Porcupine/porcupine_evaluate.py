@@ -0,0 +1,271 @@
+#
+# S.E.P.I.A. wake-word evaluation (miss rate and false alarms per hour)
+#
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from collections import namedtuple
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
+from porcupine import Porcupine
+
+from porcupine_scan import read_frames
+from wakeword.library import default_library_path, default_model_file_path, tiny_keyword_file_path
+from wakeword.vad import GatedDetector
+
+ModelConfig = namedtuple('ModelConfig', ['name', 'model_file_path', 'keyword_file_paths', 'vad'])
+Label = namedtuple('Label', ['keyword_index', 'start', 'end'])
+
+# audio replayed into gated detectors when the gate opens, a detection in it is reported up to this late
+VAD_PRE_ROLL_SECONDS = 1.0
+
+_worker = {}
+
+
+def _init_worker(library_path, configs, sensitivities, channel, block_frames):
+    """Process pool initializer: remembers the settings of this worker, Porcupine instances are created per file."""
+
+    _worker.update(library_path=library_path, configs=configs, sensitivities=sensitivities, channel=channel,
+        block_frames=block_frames)
+
+
+def _create_detectors():
+    """One Porcupine instance for each model configuration and sensitivity, all fed with the same frames."""
+
+    detectors = []
+    for config in _worker['configs']:
+        for sensitivity in _worker['sensitivities']:
+            porcupine = Porcupine(
+                library_path=_worker['library_path'],
+                model_file_path=config.model_file_path,
+                keyword_file_paths=config.keyword_file_paths,
+                sensitivities=[sensitivity] * len(config.keyword_file_paths))
+            if config.vad:
+                porcupine = GatedDetector(porcupine, len(config.keyword_file_paths), pre_roll_seconds=VAD_PRE_ROLL_SECONDS)
+            detectors.append(porcupine)
+    return detectors
+
+
+def evaluate_file(path):
+    """
+    Decodes the file once and runs all detectors over it. Returns (path, audio seconds, frames, processing seconds,
+    detections, detector seconds, skipped frames) where detections is a list with one list of (time, keyword index)
+    per detector, detector seconds the processing time of each detector and skipped frames the number of frames each
+    detector did not process because of its VAD gate.
+    """
+    # fresh instances per file (~2 ms each), so no detector state carries over from the previous file
+    detectors = _create_detectors()
+    try:
+        frame_length = detectors[0].frame_length
+        sample_rate = detectors[0].sample_rate
+        single_keyword = [len(config.keyword_file_paths) == 1
+            for config in _worker['configs'] for _ in _worker['sensitivities']]
+        detections = [[] for _ in detectors]
+        detector_seconds = [0.0] * len(detectors)
+        frame_index = 0
+        start = time.time()
+
+        for frame in read_frames(path, frame_length, sample_rate, _worker['channel'], _worker['block_frames']):
+            frame_index += 1
+            for i, porcupine in enumerate(detectors):
+                detector_start = time.time()
+                result = porcupine.process_buffer(frame)
+                detector_seconds[i] += time.time() - detector_start
+                if single_keyword[i]:
+                    result = 0 if result else -1
+                if result >= 0:
+                    detections[i].append((frame_index * frame_length / float(sample_rate), result))
+
+        skipped = [int(porcupine.skip_ratio * porcupine.frames) if isinstance(porcupine, GatedDetector) else 0
+            for porcupine in detectors]
+        return (path, frame_index * frame_length / float(sample_rate), frame_index, time.time() - start, detections,
+            detector_seconds, skipped)
+    finally:
+        for porcupine in detectors:
+            porcupine.delete()
+
+
+def read_labels(labels_path):
+    """
+    Reads a CSV file with the columns 'path,keyword_index,start,end' (times in seconds, header optional).
+    Relative paths are relative to the folder of the labels file. Returns a dict path -> list of Label.
+    """
+    labels = {}
+    base_folder = os.path.dirname(os.path.abspath(labels_path))
+    with open(labels_path) as labels_file:
+        for row in csv.reader(labels_file):
+            if not row or row[0] == 'path' or row[0].startswith('#'):
+                continue
+            path = row[0] if os.path.isabs(row[0]) else os.path.join(base_folder, row[0])
+            labels.setdefault(path, []).append(Label(int(row[1]), float(row[2]), float(row[3])))
+    return labels
+
+
+def count_errors(labels, detections, tolerance):
+    """
+    Matches detections of one file against its labels. A detection matches a label with the same keyword index
+    (or any keyword if the label index is -1) if it falls into [start - tolerance, end + tolerance]. Repeated
+    detections of an already matched label are ignored. Returns (misses, false alarms).
+    """
+    matched = [False] * len(labels)
+    false_alarms = 0
+    for detection_time, keyword_index in detections:
+        for i, label in enumerate(labels):
+            if label.keyword_index in (-1, keyword_index) and \
+                    label.start - tolerance <= detection_time <= label.end + tolerance:
+                matched[i] = True
+                break
+        else:
+            false_alarms += 1
+    return (matched.count(False), false_alarms)
+
+
+def _tiny_config(config):
+    """Configuration using the '*_tiny.ppn' versions of the keyword files and the tiny model."""
+
+    return ModelConfig(
+        name='tiny',
+        model_file_path=default_model_file_path(tiny=True),
+        keyword_file_paths=[tiny_keyword_file_path(x) for x in config.keyword_file_paths],
+        vad=False)
+
+
+def count_changed(detections, gated_detections, tolerance=VAD_PRE_ROLL_SECONDS):
+    """
+    Number of detections that are only in one of both lists. A gated detector reports detections in the replayed
+    pre-roll at the frame that opened the gate, so detections of the same keyword up to 'tolerance' seconds apart
+    are the same detection, only shifted in time.
+    """
+    unmatched = sorted(gated_detections)
+    changed = 0
+    for detection_time, keyword_index in sorted(detections):
+        for j, (gated_time, gated_index) in enumerate(unmatched):
+            if gated_index == keyword_index and abs(gated_time - detection_time) <= tolerance:
+                del unmatched[j]
+                break
+        else:
+            changed += 1
+    return changed + len(unmatched)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Evaluate miss rate and false alarms per hour on a labelled corpus.')
+    parser.add_argument('audio_files', help='Additional (e.g. background noise) files without labels.', nargs='*')
+    parser.add_argument('--labels', help="CSV file with 'path,keyword_index,start,end' rows of all keyword occurrences.", type=str)
+    parser.add_argument('--keyword_file_paths', help='Comma-separated absolute paths to keyword files.', type=str, required=True)
+    parser.add_argument('--library_path', help='Path to Porcupine library (default: autodetect).', type=str)
+    parser.add_argument('--model_file_path', help='Path to model parameter file.', type=str, default=default_model_file_path())
+    parser.add_argument('--compare_tiny', help="Also evaluate the '*_tiny.ppn' keyword files with the tiny model.", action='store_true')
+    parser.add_argument('--compare_vad', help='Also evaluate every model behind the VAD gate (wakeword.vad) and check that detections do not change.', action='store_true')
+    parser.add_argument('--sensitivities', help='Comma-separated sensitivities to evaluate.', type=str, default='0.1,0.2,0.3,0.4,0.5,0.6,0.7,0.8,0.9,1.0')
+    parser.add_argument('--tolerance', help='Seconds a detection may be outside of a labelled keyword.', type=float, default=0.5)
+    parser.add_argument('--channel', help='Channel to use in multi-channel files.', type=int, default=0)
+    parser.add_argument('--workers', help='Number of worker processes (default: number of CPUs).', type=int, default=0)
+    parser.add_argument('--block_frames', help='Number of detector frames read at once.', type=int, default=256)
+    parser.add_argument('--output_path', help='Write the results as JSON to this file.', type=str, default=None)
+    args = parser.parse_args()
+
+    labels = read_labels(args.labels) if args.labels else {}
+    paths = list(labels.keys())
+    for path in args.audio_files:
+        path = os.path.abspath(path)
+        if path not in labels:
+            paths.append(path)
+    if not paths:
+        raise ValueError('No audio files to evaluate')
+    # biggest files first, so no worker ends up alone with a long file at the end
+    paths.sort(key=os.path.getsize, reverse=True)
+
+    configs = [ModelConfig('full', args.model_file_path, [x.strip() for x in args.keyword_file_paths.split(',')], False)]
+    if args.compare_tiny:
+        configs.append(_tiny_config(configs[0]))
+    if args.compare_vad:
+        configs += [config._replace(name=config.name + '+vad', vad=True) for config in configs]
+    sensitivities = [float(x) for x in args.sensitivities.split(',')]
+    workers = args.workers or multiprocessing.cpu_count()
+
+    num_detectors = len(configs) * len(sensitivities)
+    misses = [0] * num_detectors
+    false_alarms = [0] * num_detectors
+    num_labels = sum(len(x) for x in labels.values())
+    audio_seconds = 0.0
+    num_frames = 0
+    processing_seconds = 0.0
+    detector_seconds = [0.0] * num_detectors
+    skipped_frames = [0] * num_detectors
+    changed = [0] * num_detectors   # detections of gated detectors that differ from their twin without gate
+    num_detections = [0] * num_detectors
+
+    start = time.time()
+    pool = multiprocessing.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(args.library_path if args.library_path is not None else default_library_path(),
+            configs, sensitivities, args.channel, args.block_frames))
+    try:
+        for path, file_seconds, file_frames, file_processing_seconds, detections, file_detector_seconds, skipped in \
+                pool.imap_unordered(evaluate_file, paths):
+            audio_seconds += file_seconds
+            num_frames += file_frames
+            processing_seconds += file_processing_seconds
+            for i in range(num_detectors):
+                file_misses, file_false_alarms = count_errors(labels.get(path, []), detections[i], args.tolerance)
+                misses[i] += file_misses
+                false_alarms[i] += file_false_alarms
+                detector_seconds[i] += file_detector_seconds[i]
+                skipped_frames[i] += skipped[i]
+                num_detections[i] += len(detections[i])
+                if configs[i // len(sensitivities)].vad:
+                    changed[i] += count_changed(detections[i - num_detectors // 2], detections[i])
+    finally:
+        pool.close()
+        pool.join()
+    wall_seconds = time.time() - start
+
+    hours = audio_seconds / 3600.0
+    results = []
+    print('%-8s %11s %9s %14s' % ('model', 'sensitivity', 'miss rate', 'false alarms/h'))
+    for c, config in enumerate(configs):
+        for s, sensitivity in enumerate(sensitivities):
+            i = c * len(sensitivities) + s
+            miss_rate = misses[i] / float(num_labels) if num_labels else 0.0
+            false_alarms_per_hour = false_alarms[i] / hours if hours else 0.0
+            print('%-8s %11.2f %9.3f %14.2f' % (config.name, sensitivity, miss_rate, false_alarms_per_hour))
+            results.append({'model': config.name, 'model_file_path': config.model_file_path,
+                'keyword_file_paths': config.keyword_file_paths, 'sensitivity': sensitivity,
+                'misses': misses[i], 'false_alarms': false_alarms[i],
+                'miss_rate': miss_rate, 'false_alarms_per_hour': false_alarms_per_hour})
+
+    # real-time factors: per detector (CPU time of one instance) and for the whole pool (wall-clock)
+    detector_rtf = audio_seconds / (processing_seconds / num_detectors) if processing_seconds else 0.0
+    pool_rtf = audio_seconds * num_detectors / wall_seconds if wall_seconds else 0.0
+    print('\nFiles: %d, audio: %.2f h, labels: %d, workers: %d' % (len(paths), hours, num_labels, workers))
+    print('Real-time factor: %.1fx per detector, %.1fx for all %d detectors in %.1fs' % (
+        detector_rtf, pool_rtf, num_detectors, wall_seconds))
+
+    vad_results = []
+    if args.compare_vad:
+        # cpu: processing time per second of audio of one detector (average over the sensitivities)
+        print('\n%-8s %8s %9s %9s %12s %9s' % ('model', 'skipped', 'cpu', 'cpu+vad', 'detections', 'changed'))
+        for c, config in enumerate(configs[:len(configs) // 2]):
+            plain = range(c * len(sensitivities), (c + 1) * len(sensitivities))
+            gated = [i + num_detectors // 2 for i in plain]
+            cpu = sum(detector_seconds[i] for i in plain) / audio_seconds / len(sensitivities)
+            gated_cpu = sum(detector_seconds[i] for i in gated) / audio_seconds / len(sensitivities)
+            skipped = sum(skipped_frames[i] for i in gated) / float(num_frames * len(sensitivities))
+            print('%-8s %7.1f%% %8.2f%% %8.2f%% %12d %9d' % (config.name, 100 * skipped, 100 * cpu, 100 * gated_cpu,
+                sum(num_detections[i] for i in plain), sum(changed[i] for i in gated)))
+            vad_results.append({'model': config.name, 'skipped_frames': skipped, 'cpu_load': cpu, 'cpu_load_vad': gated_cpu,
+                'detections': sum(num_detections[i] for i in plain), 'changed_detections': sum(changed[i] for i in gated)})
+
+    if args.output_path:
+        with open(args.output_path, 'w') as output:
+            json.dump({'files': len(paths), 'audio_seconds': audio_seconds, 'labels': num_labels, 'workers': workers,
+                'wall_seconds': wall_seconds, 'detector_real_time_factor': detector_rtf,
+                'pool_real_time_factor': pool_rtf, 'results': results,
+                'vad': vad_results}, output, indent=2)
@@ -0,0 +1,133 @@
+#
+# S.E.P.I.A. load generator for the network wake-word ingest server
+#
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+import numpy as np
+import soundfile
+
+
+class StreamStats():
+    """Per-connection results of the load test."""
+
+    def __init__(self):
+        self.sent_seconds = 0.0
+        self.max_lag = 0.0
+        self.backlog = 0.0
+        self.detections = 0
+        self.error = None
+
+
+async def _read_detections(reader, stats):
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        stats.detections += 1
+
+
+async def run_stream(index, host, port, audio, sample_rate, duration, chunk_seconds, speed, header):
+    """
+    One simulated satellite: connects, sends the header and then the audio (looped) in chunks, paced to 'speed' times
+    real-time. Lag is how far sending fell behind that pace because the server paused reading (backpressure) once the
+    socket buffers were full, backlog is how long the server still needed for the rest of the audio after the last
+    chunk was sent.
+    """
+    stats = StreamStats()
+    chunk_bytes = int(chunk_seconds * sample_rate) * 2
+    view = memoryview(audio)
+    try:
+        reader, writer = await asyncio.open_connection(host, port)
+    except OSError as e:
+        stats.error = str(e)
+        return stats
+    header = dict(header, id="sim%d" % index)
+    writer.write((json.dumps(header) + "\n").encode('utf-8'))
+    detections_task = asyncio.ensure_future(_read_detections(reader, stats))
+    # start at a random position, so the streams don't detect in lockstep
+    position = random.randrange(0, max(1, len(audio) // chunk_bytes)) * chunk_bytes
+    start = time.time()
+    try:
+        while stats.sent_seconds < duration:
+            chunk = view[position:position + chunk_bytes]
+            writer.write(chunk)
+            await writer.drain()
+            position = (position + len(chunk)) % len(audio)
+            stats.sent_seconds += len(chunk) / 2.0 / sample_rate
+            if speed:
+                delay = start + stats.sent_seconds / speed - time.time()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_lag = max(stats.max_lag, -delay)
+        writer.write_eof()
+        sent = time.time()
+        await asyncio.wait_for(detections_task, duration + 30)
+        stats.backlog = time.time() - sent
+    except (OSError, asyncio.TimeoutError) as e:
+        stats.error = str(e)
+    finally:
+        detections_task.cancel()
+        writer.close()
+    return stats
+
+
+async def run_load_test(args):
+    audio, sample_rate = soundfile.read(args.audio_file, dtype='int16')
+    if audio.ndim > 1:
+        audio = audio[:, 0]
+    audio = np.ascontiguousarray(audio).tobytes()
+    header = {}
+    if args.user_id:
+        header['user_id'] = args.user_id
+    if args.device:
+        header['device'] = args.device
+    if args.secret:
+        header['secret'] = args.secret
+
+    start = time.time()
+    tasks = []
+    for i in range(args.connections):
+        tasks.append(asyncio.ensure_future(run_stream(i, args.host, args.port, audio, sample_rate, args.duration,
+            args.chunk_seconds, args.replay_speed, header)))
+        # ramp up over one chunk, so the chunks of all streams don't arrive at the same time
+        await asyncio.sleep(args.chunk_seconds / args.connections)
+    results = await asyncio.gather(*tasks)
+    wall_seconds = time.time() - start
+
+    failed = [stats for stats in results if stats.error]
+    lags = sorted(stats.max_lag for stats in results)
+    backlogs = sorted(stats.backlog for stats in results)
+    sent_seconds = sum(stats.sent_seconds for stats in results)
+    print("Connections: %d (%d failed), audio sent: %.1fs in %.1fs = %.1fx real-time" % (
+        len(results), len(failed), sent_seconds, wall_seconds, sent_seconds / wall_seconds))
+    for name, values in (("Max. lag of sending per stream", lags), ("Server backlog at the end", backlogs)):
+        print("%s: median %.3fs, p99 %.3fs, max %.3fs" % (
+            name, values[len(values) // 2], values[min(len(values) - 1, int(len(values) * 0.99))], values[-1]))
+    print("Detections reported: %d" % sum(stats.detections for stats in results))
+    for stats in failed[:5]:
+        print("Error: %s" % stats.error)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Simulate many satellites streaming PCM to porcupine_ingest_server.py.')
+    parser.add_argument('--audio_file', help='Audio file (16 kHz, first channel is used) that every stream sends in a loop.', type=str, required=True)
+    parser.add_argument('--host', help='Address of the ingest server.', type=str, default='127.0.0.1')
+    parser.add_argument('--port', help='Port of the ingest server.', type=int, default=20741)
+    parser.add_argument('--connections', help='Number of concurrent streams.', type=int, default=100)
+    parser.add_argument('--duration', help='Seconds of audio each stream sends.', type=float, default=30.0)
+    parser.add_argument('--replay_speed', help='Sending speed relative to real-time, 0 = as fast as the server takes it.', type=float, default=1.0)
+    parser.add_argument('--chunk_seconds', help='Audio per write (a satellite sending every 32 ms = 0.032).', type=float, default=0.1)
+    parser.add_argument('--user_id', help='SEPIA user sent in the header of every stream (triggers real remote actions!).', type=str)
+    parser.add_argument('--device', help='SEPIA device ID sent in the header of every stream.', type=str)
+    parser.add_argument('--secret', help='Shared secret of the ingest server (default: environment variable SEPIA_INGEST_SECRET).', type=str,
+        default=os.environ.get('SEPIA_INGEST_SECRET'))
+    args = parser.parse_args()
+
+    asyncio.run(run_load_test(args))
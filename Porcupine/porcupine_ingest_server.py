@@ -0,0 +1,393 @@
+#
+# S.E.P.I.A. network wake-word ingest server
+#
+
+import argparse
+import asyncio
+import hmac
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
+from porcupine import Porcupine
+
+import sepia.remote
+from wakeword.library import default_library_path, default_model_file_path
+
+MAX_HEADER_BYTES = 4096
+
+
+class IngestConnection(asyncio.BufferedProtocol):
+    """
+    One satellite connection. The client sends a JSON header line (e.g. '{"user_id": "uid1007", "device": "o1"}',
+    all keys optional, plus '"secret"' if the server has one) followed by raw 16 kHz 16-bit little-endian mono PCM.
+    Every detection is answered with a JSON line '{"keyword": 0, "time": 12.35}'.
+
+    The socket reads straight into one of two preallocated buffers (BufferedProtocol, no bytes objects per read).
+    While the detector works through the complete frames of one buffer in the thread pool the other one keeps
+    receiving. If it fills up before the detector is done reading is paused, so TCP flow control slows the client down
+    instead of the server queuing audio without bound.
+    """
+
+    def __init__(self, server):
+        self.server = server
+        self.frame_bytes = server.frame_length * 2
+        size = self.frame_bytes * server.buffer_frames
+        self._buffers = [bytearray(size), bytearray(size)]
+        self._views = [memoryview(buffer) for buffer in self._buffers]
+        self._active = 0        # buffer the socket reads into, the other one may be in use by the detector
+        self._fill = 0
+        self._busy = False
+        self._paused = False
+        self._closed = False
+        self._eof = False
+        self.transport = None
+        self.name = ""
+        self._header_read = False
+        self.target = None
+        self.porcupine = None
+        self.single_keyword = True
+        self.frames = 0
+        self.busy_seconds = 0.0
+        self.refractory_left = 0
+        self.pauses = 0
+
+    def connection_made(self, transport):
+        self.transport = transport
+        peer = transport.get_extra_info('peername')
+        self.name = "%s:%s" % peer[:2] if isinstance(peer, tuple) else str(peer)
+        self.server.connections.add(self)
+
+    def connection_lost(self, exc):
+        self._closed = True
+        self.server.connections.discard(self)
+        if self.porcupine is not None:
+            print("[%s] %s: disconnected after %.1fs of audio" % (str(datetime.now()), self.name, self.audio_seconds))
+            if not self._busy:
+                self._delete_detector()
+
+    def eof_received(self):
+        # the client is done sending: finish the buffered audio (and report its detections) before closing
+        self._eof = True
+        self._schedule()
+        return self._busy
+
+    @property
+    def audio_seconds(self):
+        return self.frames * self.server.frame_length / float(self.server.sample_rate)
+
+    def get_buffer(self, sizehint):
+        return self._views[self._active][self._fill:]
+
+    def buffer_updated(self, nbytes):
+        self._fill += nbytes
+        if not self._header_read and not self._read_header():
+            return
+        self._schedule()
+        if self._fill == len(self._buffers[self._active]):
+            # the detector is still busy with the other buffer: let TCP flow control hold back the client
+            self._paused = True
+            self.pauses += 1
+            self.transport.pause_reading()
+
+    def _read_header(self):
+        buffer = self._buffers[self._active]
+        end = buffer.find(b'\n', 0, self._fill)
+        if end < 0:
+            if self._fill >= min(len(buffer), MAX_HEADER_BYTES):
+                self._fail("header line too long")
+            return False
+        try:
+            header = json.loads(bytes(buffer[:end]).decode('utf-8') or '{}')
+            self.target = sepia.remote.RemoteTarget(
+                header.get('user_id', ""), header.get('device', ""), header.get('channel', ""),
+                header.get('language', ""))
+            sensitivity = header.get('sensitivity')
+            if sensitivity is not None:
+                sensitivity = float(sensitivity)
+        except (ValueError, AttributeError, TypeError) as e:
+            self._fail("invalid header - %s" % e)
+            return False
+        if not self.server.check_secret(header.get('secret')):
+            self._fail("wrong or missing secret")
+            return False
+        self._header_read = True
+        self.single_keyword = self.server.num_keywords == 1
+        if header.get('id'):
+            self.name = "%s (%s)" % (header['id'], self.name)
+        print("[%s] %s: connected, user: '%s', device: '%s'" % (
+            str(datetime.now()), self.name, self.target.user_id, self.target.device))
+        rest = self._fill - end - 1
+        buffer[:rest] = buffer[end + 1:self._fill]
+        self._fill = rest
+        # loading the model takes a while, it must not block the event loop (audio keeps arriving meanwhile)
+        self._busy = True
+        future = asyncio.get_running_loop().run_in_executor(self.server.executor, self.server.create_detector, sensitivity)
+        future.add_done_callback(self._detector_created)
+        return True
+
+    def _detector_created(self, future):
+        self._busy = False
+        try:
+            self.porcupine = future.result()
+        except Exception as e:
+            if not self._closed:
+                self._fail("detector failed - %s" % e)
+            return
+        if self._closed:
+            self._delete_detector()
+            return
+        self._continue()
+
+    def _fail(self, message):
+        print("[%s] %s: %s" % (str(datetime.now()), self.name, message))
+        self.transport.close()
+
+    def _schedule(self):
+        if self._busy or self._closed:
+            return
+        complete = self._fill - self._fill % self.frame_bytes
+        if not complete:
+            return
+        # hand the complete frames to the detector, the incomplete rest continues the other buffer
+        job = self._active
+        self._active = 1 - job
+        rest = self._fill - complete
+        self._buffers[self._active][:rest] = self._buffers[job][complete:self._fill]
+        self._fill = rest
+        self._busy = True
+        future = asyncio.get_running_loop().run_in_executor(self.server.executor, self._detect, self._views[job][:complete])
+        future.add_done_callback(self._detect_done)
+
+    def _detect(self, view):
+        """Runs in the thread pool (Porcupine releases the GIL). Returns a list of (keyword index, stream time)."""
+
+        detections = []
+        start = time.time()
+        for offset in range(0, len(view), self.frame_bytes):
+            result = self.porcupine.process_buffer(view[offset:offset + self.frame_bytes])
+            self.frames += 1
+            if self.single_keyword:
+                result = 0 if result else -1
+            if self.refractory_left:
+                self.refractory_left -= 1
+            elif result >= 0:
+                self.refractory_left = self.server.refractory_frames
+                detections.append((result, self.audio_seconds))
+        self.busy_seconds += time.time() - start
+        return detections
+
+    def _detect_done(self, future):
+        self._busy = False
+        if self._closed:
+            self._delete_detector()
+            return
+        try:
+            detections = future.result()
+        except Exception as e:
+            self._fail("detector failed - %s" % e)
+            return
+        for keyword_index, stream_time in detections:
+            self.server.on_detection(self, keyword_index, stream_time)
+            self.transport.write(('{"keyword": %d, "time": %.2f}\n' % (keyword_index, stream_time)).encode('utf-8'))
+        self._continue()
+
+    def _continue(self):
+        self._schedule()
+        if self._eof and not self._busy:
+            self.transport.close()
+        elif self._paused and self._fill < len(self._buffers[self._active]):
+            self._paused = False
+            self.transport.resume_reading()
+
+    def _delete_detector(self):
+        if self.porcupine is not None:
+            self.server.closed_seconds[0] += self.audio_seconds
+            self.server.closed_seconds[1] += self.busy_seconds
+            self.porcupine.delete()
+            self.porcupine = None
+
+
+class IngestServer():
+    """
+    asyncio TCP server that runs wake-word detection for many satellite microphones (e.g. a Pi Zero that is too weak for
+    the full model). Each connection gets its own Porcupine instance, detection runs in a thread pool and each
+    detection triggers the microphone of the SEPIA user/device given in the header of the connection.
+
+    Anyone who can connect can trigger actions for every user with a stored token, so listen on localhost only or set
+    a 'secret' that clients have to send in their header.
+    """
+
+    def __init__(
+            self,
+            library_path,
+            model_file_path,
+            keyword_file_paths,
+            sensitivity,
+            user_id=None,
+            host_address="",
+            workers=0,
+            buffer_seconds=0.5,
+            refractory_time=2.0,
+            stats_interval=0,
+            secret=None):
+        """
+        Constructor.
+
+        :param library_path: Absolute path to Porcupine's dynamic library.
+        :param model_file_path: Absolute path to the model parameter file.
+        :param keyword_file_paths: List of absolute paths to keyword files.
+        :param sensitivity: Default sensitivity for all keywords, clients can send their own.
+        :param user_id: Default SEPIA user for connections without 'user_id' (None = only report detections to the
+        clients unless they send a user ID).
+        :param host_address: Address of the SEPIA server (default: from the account storage).
+        :param workers: Number of detector threads (default: number of CPUs).
+        :param buffer_seconds: Audio each of the two receive buffers of a connection holds.
+        :param refractory_time: Seconds of audio after a detection during which a connection ignores further detections.
+        :param stats_interval: Seconds between statistics on the console (0 = off).
+        :param secret: Shared secret clients have to send as 'secret' in their header (None = no check).
+        """
+        self.library_path = library_path
+        self.model_file_path = model_file_path
+        self.keyword_file_paths = keyword_file_paths
+        self.num_keywords = len(keyword_file_paths)
+        self.sensitivity = sensitivity
+        self.user_id = user_id
+        self.host_address = host_address
+        self.stats_interval = stats_interval
+        self.secret = secret
+
+        # check the files and get frame length and sample rate once
+        porcupine = self.create_detector()
+        self.frame_length = porcupine.frame_length
+        self.sample_rate = porcupine.sample_rate
+        porcupine.delete()
+        self.buffer_frames = max(2, int(buffer_seconds * self.sample_rate / self.frame_length))
+        self.refractory_frames = max(1, int(round(refractory_time * self.sample_rate / self.frame_length)))
+
+        self.executor = ThreadPoolExecutor(max_workers=workers or multiprocessing.cpu_count())
+        self.connections = set()
+        self.remote = None
+        self.detections = 0
+        self.closed_seconds = [0.0, 0.0]    # audio and detector seconds of closed connections
+
+    def create_detector(self, sensitivity=None):
+        """New Porcupine instance with the keywords of the server."""
+
+        sensitivity = self.sensitivity if sensitivity is None else float(sensitivity)
+        return Porcupine(
+            library_path=self.library_path,
+            model_file_path=self.model_file_path,
+            keyword_file_paths=self.keyword_file_paths,
+            sensitivities=[sensitivity] * self.num_keywords)
+
+    def check_secret(self, secret):
+        """True if the secret of a client header is the one of the server (or the server has none)."""
+
+        if not self.secret:
+            return True
+        return isinstance(secret, str) and hmac.compare_digest(secret.encode('utf-8'), self.secret.encode('utf-8'))
+
+    def total_seconds(self):
+        """Returns (seconds of audio processed, seconds the detector threads were busy) of all connections."""
+
+        connections = list(self.connections)
+        return (self.closed_seconds[0] + sum(c.audio_seconds for c in connections),
+            self.closed_seconds[1] + sum(c.busy_seconds for c in connections))
+
+    def on_detection(self, connection, keyword_index, stream_time):
+        """Called on the event loop for each detection of a connection."""
+
+        self.detections += 1
+        print('[%s] %s: detected keyword #%d at %.2fs' % (str(datetime.now()), connection.name, keyword_index, stream_time))
+        target = connection.target
+        if not target.user_id and self.user_id:
+            target = target._replace(user_id=self.user_id)
+        if self.remote is not None and target.user_id:
+            asyncio.ensure_future(self._trigger_microphone(connection.name, target))
+
+    async def _trigger_microphone(self, name, target):
+        result = (await self.remote.trigger_microphone([target]))[0]
+        print("SEPIA remote (%s): %s" % (name, "triggered microphone" if result.success else "trigger failed - " + result.message))
+
+    def print_stats(self):
+        """Prints connections, audio processed and real-time factor of the detector threads."""
+
+        connections = list(self.connections)
+        audio_seconds, busy_seconds = self.total_seconds()
+        rtf = audio_seconds / busy_seconds if busy_seconds else 0.0
+        print("[%s] connections: %d, audio: %.1fs, detector: %.1fx real-time per thread, paused reads: %d, detections: %d" % (
+            str(datetime.now()), len(connections), audio_seconds, rtf, sum(c.pauses for c in connections), self.detections))
+
+    async def _print_stats_periodically(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            self.print_stats()
+
+    async def serve(self, host, port):
+        """Accepts connections on host:port until cancelled."""
+
+        # clients can send their own user ID, so the remote is needed even without a default user
+        try:
+            self.remote = sepia.remote.AsyncRemote(self.user_id, self.host_address)
+        except ValueError as e:
+            print("SEPIA remote: not available (%s), detections are only reported to the clients" % e)
+        if not self.secret and host not in ('127.0.0.1', '::1', 'localhost'):
+            print("Warning: listening on %s without --secret, anyone who can connect can trigger remote actions" % host)
+        server = await asyncio.get_running_loop().create_server(lambda: IngestConnection(self), host, port)
+        print("Listening on %s:%d for %d Hz 16-bit mono PCM, %d keyword(s), %d detector threads" % (
+            host, port, self.sample_rate, self.num_keywords, self.executor._max_workers))
+        stats_task = asyncio.ensure_future(self._print_stats_periodically()) if self.stats_interval else None
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if stats_task is not None:
+                stats_task.cancel()
+            for connection in list(self.connections):
+                connection.transport.close()
+            self.executor.shutdown(wait=True)
+            if self.remote is not None:
+                self.remote.close()
+            self.print_stats()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Wake-word detection for satellite microphones streaming PCM over TCP.')
+    parser.add_argument('--host', help='Address to listen on, e.g. 0.0.0.0 for all interfaces (use --secret then).', type=str, default='127.0.0.1')
+    parser.add_argument('--secret', help='Shared secret clients have to send in their header (default: environment variable SEPIA_INGEST_SECRET).', type=str,
+        default=os.environ.get('SEPIA_INGEST_SECRET'))
+    parser.add_argument('--port', help='Port to listen on.', type=int, default=20741)
+    parser.add_argument('--keyword_file_paths', help='Comma-separated absolute paths to keyword files.', type=str, default='porcupine/keyword_files/hey_sepia_windows.ppn')
+    parser.add_argument('--library_path', help='Path to Porcupine library (default: autodetect).', type=str)
+    parser.add_argument('--model_file_path', help='Path to model parameter file.', type=str, default=default_model_file_path())
+    parser.add_argument('--sensitivity', help='Default detection sensitivity [0, 1].', type=float, default=0.5)
+    parser.add_argument('--user_id', help='SEPIA user for connections that send no user ID (none = only report detections to the client).', type=str)
+    parser.add_argument('--sepia_host', help="Address of the SEPIA server, e.g. 'https://my.example.com/sepia' (default: from account storage).", type=str, default="")
+    parser.add_argument('--workers', help='Number of detector threads (default: number of CPUs).', type=int, default=0)
+    parser.add_argument('--buffer_seconds', help='Audio buffered per connection before reading pauses (x2).', type=float, default=0.5)
+    parser.add_argument('--refractory_time', help='Seconds of audio after a detection during which a connection ignores the wake-word.', type=float, default=2.0)
+    parser.add_argument('--stats_interval', help='Seconds between statistics on the console (0 = off).', type=float, default=10.0)
+    args = parser.parse_args()
+
+    ingest_server = IngestServer(
+        library_path=args.library_path if args.library_path is not None else default_library_path(),
+        model_file_path=args.model_file_path,
+        keyword_file_paths=[x.strip() for x in args.keyword_file_paths.split(',')],
+        sensitivity=args.sensitivity,
+        user_id=args.user_id,
+        host_address=args.sepia_host,
+        workers=args.workers,
+        buffer_seconds=args.buffer_seconds,
+        refractory_time=args.refractory_time,
+        stats_interval=args.stats_interval,
+        secret=args.secret)
+    try:
+        asyncio.run(ingest_server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print('\nstopping ...')
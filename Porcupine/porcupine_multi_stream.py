@@ -0,0 +1,266 @@
+#
+# S.E.P.I.A. multi-stream wake-word host
+#
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from datetime import datetime
+
+import sepia.remote
+from wakeword.dispatcher import ActionDispatcher
+from wakeword.library import default_library_path, default_model_file_path
+from wakeword.shared import SharedFrameRing
+from wakeword.sources import FileSource, UnixSocketSource
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
+
+FRAME_LENGTH = 512      # Porcupine's frame length, checked again in the workers
+SAMPLE_RATE = 16000
+
+
+def _run_worker(worker_id, library_path, streams, rings, wake_event, results, refractory_time, stats_interval):
+    """
+    Worker process: one Porcupine instance per assigned stream, frames come from shared-memory rings. Detections and
+    statistics (audio seconds processed, seconds busy) are sent back through the 'results' queue.
+    """
+    from porcupine import Porcupine
+
+    detectors = []
+    try:
+        for stream in streams:
+            porcupine = Porcupine(
+                library_path=library_path,
+                model_file_path=stream['model_file_path'],
+                keyword_file_paths=stream['keyword_file_paths'],
+                sensitivities=[stream['sensitivity']] * len(stream['keyword_file_paths']))
+            if porcupine.frame_length != FRAME_LENGTH or porcupine.sample_rate != SAMPLE_RATE:
+                raise ValueError('Unexpected frame length or sample rate of Porcupine')
+            detectors.append(porcupine)
+        refractory_frames = int(round(refractory_time * SAMPLE_RATE / FRAME_LENGTH))
+        refractory_left = [0] * len(streams)
+        single_keyword = [len(stream['keyword_file_paths']) == 1 for stream in streams]
+        frames = [0] * len(streams)
+        busy_seconds = 0.0
+        last_stats = time.time()
+
+        while True:
+            wake_event.clear()
+            start = time.time()
+            processed = 0
+            for i, ring in enumerate(rings):
+                frame = ring.read_frame()
+                while frame is not None:
+                    result = detectors[i].process_buffer(frame)
+                    ring.release_frame()
+                    frames[i] += 1
+                    processed += 1
+                    if single_keyword[i]:
+                        result = 0 if result else -1
+                    if refractory_left[i]:
+                        refractory_left[i] -= 1
+                    elif result >= 0:
+                        refractory_left[i] = refractory_frames
+                        results.put(('detection', streams[i]['id'], result, frames[i] * FRAME_LENGTH / float(SAMPLE_RATE)))
+                    frame = ring.read_frame()
+            if processed:
+                busy_seconds += time.time() - start
+            else:
+                wake_event.wait(0.05)
+            if time.time() - last_stats >= stats_interval:
+                last_stats = time.time()
+                results.put(('stats', worker_id, sum(frames) * FRAME_LENGTH / float(SAMPLE_RATE), busy_seconds,
+                    [ring.dropped for ring in rings]))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for porcupine in detectors:
+            porcupine.delete()
+
+
+class MultiStreamHost():
+    """
+    Hosts wake-word detection for many audio streams (e.g. satellite microphones) on one machine. Streams are assigned
+    round-robin to a pool of worker processes, each running several Porcupine instances. Audio moves from the sources
+    (in this process) to the workers through shared-memory rings. Detections are routed to the SEPIA user, device and
+    channel configured for each stream.
+    """
+
+    def __init__(
+            self,
+            streams,
+            library_path,
+            workers=0,
+            ring_seconds=2.0,
+            refractory_time=2.0,
+            stats_interval=10.0):
+        """
+        Constructor.
+
+        :param streams: List of stream dicts with the keys 'id', 'source' ('socket' with 'socket_path' or 'file' with
+        'audio_file' and optional 'replay_speed'), 'keyword_file_paths', optional 'model_file_path', 'sensitivity' and
+        the routing keys 'user_id', 'device', 'channel' (no 'user_id' = only print detections).
+        :param library_path: Absolute path to Porcupine's dynamic library.
+        :param workers: Number of worker processes (default: number of CPUs).
+        :param ring_seconds: Audio buffered per stream between source and worker.
+        :param refractory_time: Seconds of audio after a detection during which the stream ignores further detections.
+        :param stats_interval: Seconds between statistics reports of the workers.
+        """
+        self.streams = streams
+        self.library_path = library_path
+        self.workers = min(workers or multiprocessing.cpu_count(), len(streams))
+        self.ring_seconds = ring_seconds
+        self.refractory_time = refractory_time
+        self.stats_interval = stats_interval
+
+        self.worker_stats = {}
+        self.detections = 0
+        self._remote = None
+        self._dispatcher = ActionDispatcher(max_pending=64)
+
+    def _create_remote(self):
+        user_ids = [stream['user_id'] for stream in self.streams if stream.get('user_id')]
+        if user_ids:
+            self._remote = sepia.remote.AsyncRemote(user_id=user_ids[0])
+
+    def _trigger(self, stream):
+        target = sepia.remote.RemoteTarget(stream['user_id'], stream.get('device', ""), stream.get('channel', ""))
+        success, message = self._remote.post_action("hotkey", self._remote.microphone_action(target),
+            target.device, target.channel, target.user_id)
+        print("SEPIA remote (%s): %s" % (stream['id'], "triggered microphone" if success else "trigger failed - " + message))
+
+    def _on_detection(self, stream_id, keyword_index, stream_time):
+        self.detections += 1
+        stream = self._streams_by_id[stream_id]
+        print('[%s] %s: detected keyword #%d at %.2fs' % (str(datetime.now()), stream_id, keyword_index, stream_time))
+        if self._remote is not None and stream.get('user_id'):
+            self._dispatcher.submit(self._trigger, stream)
+
+    def _create_source(self, stream):
+        if stream['source'] == 'file':
+            return FileSource(stream['audio_file'], SAMPLE_RATE, FRAME_LENGTH * 8, speed=stream.get('replay_speed', 1.0))
+        elif stream['source'] == 'socket':
+            return UnixSocketSource(stream['socket_path'], SAMPLE_RATE, FRAME_LENGTH * 8)
+        raise ValueError("Unknown source '%s' of stream '%s'" % (stream['source'], stream['id']))
+
+    def print_stats(self):
+        """Prints real-time factor, streams per worker and dropped audio."""
+
+        for worker_id in sorted(self.worker_stats):
+            audio_seconds, busy_seconds, dropped, num_streams = self.worker_stats[worker_id]
+            rtf = audio_seconds / busy_seconds if busy_seconds else 0.0
+            print("Worker %d: %d streams, %.1fs audio, %.1fs busy, %.1fx real-time per core, dropped %d samples" % (
+                worker_id, num_streams, audio_seconds, busy_seconds, rtf, sum(dropped)))
+
+    def run(self):
+        """Starts workers and sources and routes detections until all sources have ended or CTRL+C."""
+
+        self._streams_by_id = dict((stream['id'], stream) for stream in self.streams)
+        self._create_remote()
+        ring_frames = max(2, int(self.ring_seconds * SAMPLE_RATE / FRAME_LENGTH))
+        results = multiprocessing.Queue()
+        processes = []
+        sources = []
+        rings = []
+        try:
+            for w in range(self.workers):
+                worker_streams = self.streams[w::self.workers]
+                worker_rings = [SharedFrameRing(FRAME_LENGTH, ring_frames) for _ in worker_streams]
+                rings.extend(worker_rings)
+                wake_event = multiprocessing.Event()
+                process = multiprocessing.Process(target=_run_worker, args=(w, self.library_path, worker_streams,
+                    worker_rings, wake_event, results, self.refractory_time, self.stats_interval))
+                process.daemon = True
+                process.start()
+                processes.append(process)
+                self.worker_stats[w] = (0.0, 0.0, [0], len(worker_streams))
+
+                for stream, ring in zip(worker_streams, worker_rings):
+                    source = self._create_source(stream)
+                    # file replays as fast as possible wait for the worker instead of losing audio
+                    def deliver(in_data, ring=ring, wake_event=wake_event, blocking=not source.realtime):
+                        while blocking and ring.free < len(in_data) // 2:
+                            wake_event.set()
+                            time.sleep(0.005)
+                        ring.write(in_data)
+                        wake_event.set()
+                    sources.append(source)
+                    source.start(deliver)
+
+            print("Started %d streams on %d worker processes" % (len(self.streams), self.workers))
+            start = time.time()
+            while any(source.is_active() for source in sources) or any(ring.available >= FRAME_LENGTH for ring in rings):
+                self._handle_results(results, timeout=0.1)
+            # collect the last statistics of the workers
+            deadline = time.time() + self.stats_interval + 1
+            while time.time() < deadline and any(stats[1] == 0.0 for stats in self.worker_stats.values()):
+                self._handle_results(results, timeout=0.1)
+            print("\nAll sources ended after %.1fs, %d detections" % (time.time() - start, self.detections))
+        except KeyboardInterrupt:
+            print('\nstopping ...')
+        finally:
+            for source in sources:
+                source.stop()
+            for process in processes:
+                process.terminate()
+                process.join()
+            for ring in rings:
+                ring.close()
+            self._dispatcher.stop(timeout=5)
+            self.print_stats()
+
+    def _handle_results(self, results, timeout):
+        try:
+            message = results.get(timeout=timeout)
+        except Exception:
+            return
+        if message[0] == 'detection':
+            self._on_detection(*message[1:])
+        elif message[0] == 'stats':
+            worker_id, audio_seconds, busy_seconds, dropped = message[1:]
+            self.worker_stats[worker_id] = (audio_seconds, busy_seconds, dropped, self.worker_stats[worker_id][3])
+
+
+def _stream_defaults(stream, args):
+    stream.setdefault('keyword_file_paths', [x.strip() for x in args.keyword_file_paths.split(',')])
+    stream.setdefault('model_file_path', args.model_file_path)
+    stream.setdefault('sensitivity', args.sensitivity)
+    return stream
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Wake-word detection for many audio streams on a pool of worker processes.')
+    parser.add_argument('--streams', help="JSON file with a list of streams, e.g. [{\"id\": \"kitchen\", \"source\": \"socket\", \"socket_path\": \"/tmp/kitchen.sock\", \"user_id\": \"uid1007\", \"device\": \"o1\"}]", type=str)
+    parser.add_argument('--benchmark_streams', help='Instead of --streams replay --audio_file on N streams (no remote actions) to measure streams per core.', type=int, default=0)
+    parser.add_argument('--audio_file', help='Audio file (16 kHz mono) for --benchmark_streams.', type=str)
+    parser.add_argument('--replay_speed', help='Replay speed of --benchmark_streams relative to real-time, 0 = as fast as possible.', type=float, default=1.0)
+    parser.add_argument('--keyword_file_paths', help='Default comma-separated keyword files of the streams.', type=str, default='porcupine/keyword_files/hey_sepia_windows.ppn')
+    parser.add_argument('--library_path', help='Path to Porcupine library (default: autodetect).', type=str)
+    parser.add_argument('--model_file_path', help='Default model parameter file of the streams.', type=str, default=default_model_file_path())
+    parser.add_argument('--sensitivity', help='Default detection sensitivity [0, 1] of the streams.', type=float, default=0.5)
+    parser.add_argument('--workers', help='Number of worker processes (default: number of CPUs).', type=int, default=0)
+    parser.add_argument('--refractory_time', help='Seconds of audio after a detection during which a stream ignores the wake-word.', type=float, default=2.0)
+    parser.add_argument('--stats_interval', help='Seconds between worker statistics.', type=float, default=10.0)
+    args = parser.parse_args()
+
+    if args.benchmark_streams:
+        if not args.audio_file:
+            raise ValueError('Missing --audio_file')
+        streams = [{'id': 'bench%d' % i, 'source': 'file', 'audio_file': args.audio_file, 'replay_speed': args.replay_speed}
+            for i in range(args.benchmark_streams)]
+    elif args.streams:
+        with open(args.streams) as streams_file:
+            streams = json.load(streams_file)
+    else:
+        raise ValueError('Missing --streams or --benchmark_streams')
+
+    MultiStreamHost(
+        streams=[_stream_defaults(stream, args) for stream in streams],
+        library_path=args.library_path if args.library_path is not None else default_library_path(),
+        workers=args.workers,
+        refractory_time=args.refractory_time,
+        stats_interval=args.stats_interval
+    ).run()
@@ -0,0 +1,173 @@
+#
+# S.E.P.I.A. offline wake-word scanner
+#
+
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import namedtuple
+
+import numpy as np
+import soundfile
+
+sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
+from porcupine import Porcupine
+
+from wakeword.library import default_library_path, default_model_file_path
+
+Detection = namedtuple('Detection', ['path', 'time', 'keyword_index'])
+
+
+class WakeWordScanner():
+    """
+    Runs Porcupine over recorded audio files. Files are streamed block by block into a preallocated buffer and split
+    into frames with numpy views, so memory stays bounded no matter how long a recording is.
+    """
+
+    def __init__(
+            self,
+            library_path,
+            model_file_path,
+            keyword_file_paths,
+            sensitivities,
+            block_frames=256):
+        """
+        Constructor.
+
+        :param library_path: Absolute path to Porcupine's dynamic library.
+        :param model_file_path: Absolute path to the model parameter file.
+        :param keyword_file_paths: List of absolute paths to keyword files.
+        :param sensitivities: List of sensitivities, one for each keyword file.
+        :param block_frames: Number of detector frames read from the file at once.
+        """
+        self._library_path = library_path
+        self._model_file_path = model_file_path
+        self._keyword_file_paths = keyword_file_paths
+        self._sensitivities = sensitivities
+        self._block_frames = block_frames
+
+        self.audio_seconds = 0.0
+        self.processing_seconds = 0.0
+
+    def _create_porcupine(self):
+        return Porcupine(
+            library_path=self._library_path,
+            model_file_path=self._model_file_path,
+            keyword_file_paths=self._keyword_file_paths,
+            sensitivities=self._sensitivities)
+
+    def scan(self, path, channel=0):
+        """
+        Yields a Detection for every occurrence of a keyword in the audio file at 'path'. The time of a detection is
+        the end of the frame (in seconds from the start of the file) in which it was reported.
+
+        :param path: Audio file with Porcupine's sample rate (16 kHz) in any format supported by soundfile.
+        :param channel: Channel to scan in multi-channel files.
+        """
+        porcupine = self._create_porcupine()
+        try:
+            frame_length = porcupine.frame_length
+            sample_rate = porcupine.sample_rate
+            single_keyword = len(self._keyword_file_paths) == 1
+            start = time.time()
+            frame_index = 0
+
+            for frame in read_frames(path, frame_length, sample_rate, channel, self._block_frames):
+                result = porcupine.process_buffer(frame)
+                frame_index += 1
+                if single_keyword:
+                    result = 0 if result else -1
+                if result >= 0:
+                    yield Detection(path, frame_index * frame_length / float(sample_rate), result)
+
+            self.audio_seconds += frame_index * frame_length / float(sample_rate)
+            self.processing_seconds += time.time() - start
+        finally:
+            porcupine.delete()
+
+
+def read_frames(path, frame_length, sample_rate, channel=0, block_frames=256):
+    """
+    Streams an audio file block by block into a preallocated buffer and yields consecutive int16 frames of
+    'frame_length' samples as numpy views of that buffer. A frame is only valid until the next one is requested.
+    Samples at the end of the file that don't fill a frame are skipped.
+
+    :param path: Audio file in any format supported by soundfile.
+    :param frame_length: Number of samples per frame.
+    :param sample_rate: Expected sample rate of the file.
+    :param channel: Channel to read in multi-channel files.
+    :param block_frames: Number of frames read from the file at once.
+    """
+    with soundfile.SoundFile(path) as audio_file:
+        if audio_file.samplerate != sample_rate:
+            raise ValueError("'%s' has a sample rate of %d Hz, Porcupine needs %d Hz" % (
+                path, audio_file.samplerate, sample_rate))
+        if channel >= audio_file.channels:
+            raise ValueError("'%s' has no channel %d" % (path, channel))
+
+        block_length = frame_length * block_frames
+        block = np.zeros((block_length, audio_file.channels), dtype=np.int16)
+        mono = block[:, 0] if audio_file.channels == 1 else np.zeros(block_length, dtype=np.int16)
+        while True:
+            length = len(audio_file.read(frames=block_length, dtype='int16', always_2d=True, out=block))
+            if audio_file.channels > 1:
+                np.copyto(mono, block[:, channel])
+            for offset in range(0, length - frame_length + 1, frame_length):
+                yield mono[offset:offset + frame_length]
+            if length < block_length:
+                break
+
+
+def _write_detections(detections, output, output_format):
+    if output_format == 'csv':
+        writer = csv.writer(output)
+        writer.writerow(Detection._fields)
+        for detection in detections:
+            writer.writerow([detection.path, '%.3f' % detection.time, detection.keyword_index])
+            output.flush()
+    else:
+        # one JSON object per line, so results can be consumed while a long file is still running
+        for detection in detections:
+            output.write(json.dumps({'path': detection.path, 'time': round(detection.time, 3),
+                'keyword_index': detection.keyword_index}) + '\n')
+            output.flush()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Scan audio files for wake-words and print detection timestamps.')
+    parser.add_argument('audio_files', help='Audio files (16 kHz) to scan.', nargs='+')
+    parser.add_argument('--keyword_file_paths', help='Comma-separated absolute paths to keyword files.', type=str, required=True)
+    parser.add_argument('--library_path', help='Path to Porcupine library (default: autodetect).', type=str)
+    parser.add_argument('--model_file_path', help='Path to model parameter file.', type=str, default=default_model_file_path())
+    parser.add_argument('--sensitivity', help='Detection sensitivity [0, 1]', type=float, default=0.5)
+    parser.add_argument('--channel', help='Channel to scan in multi-channel files.', type=int, default=0)
+    parser.add_argument('--block_frames', help='Number of detector frames read at once.', type=int, default=256)
+    parser.add_argument('--format', help="Output format: 'json' (one object per line) or 'csv'.", type=str, default='json', choices=['json', 'csv'])
+    parser.add_argument('--output_path', help='Write detections to this file instead of stdout.', type=str, default=None)
+    args = parser.parse_args()
+
+    keyword_file_paths = [x.strip() for x in args.keyword_file_paths.split(',')]
+    scanner = WakeWordScanner(
+        library_path=args.library_path if args.library_path is not None else default_library_path(),
+        model_file_path=args.model_file_path,
+        keyword_file_paths=keyword_file_paths,
+        sensitivities=[args.sensitivity] * len(keyword_file_paths),
+        block_frames=args.block_frames)
+
+    output = open(args.output_path, 'w', newline='') if args.output_path else sys.stdout
+    try:
+        def all_detections():
+            for path in args.audio_files:
+                for detection in scanner.scan(path, channel=args.channel):
+                    yield detection
+        _write_detections(all_detections(), output, args.format)
+    finally:
+        if args.output_path:
+            output.close()
+
+    if scanner.processing_seconds:
+        sys.stderr.write('Scanned %.1fs of audio in %.1fs (%.1fx real-time)\n' % (
+            scanner.audio_seconds, scanner.processing_seconds, scanner.audio_seconds / scanner.processing_seconds))
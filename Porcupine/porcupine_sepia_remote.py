@@ -14,26 +14,34 @@
 # limitations under the License.
 #
 
+import time
+STARTUP_TIME = time.time()    # before the other imports, so the startup phases include their import time
 import argparse
 import os
-import platform
-import struct
 import sys
-import time
+from collections import OrderedDict
 from datetime import datetime
-from threading import Thread
-
-import numpy as np
-import pyaudio
-import soundfile
-
-import requests
-
-import sepia.remote
+from threading import Event, Lock, Thread
+
+from sepia.targets import parse_targets
+
+# only what every run needs is imported here, the SEPIA remote (requests), recorders (soundfile), LEDs (SPI), cascade,
+# VAD and resampling front end are imported when they are used, see '_start_remote' and 'run'
+from wakeword.control import ControlServer
+from wakeword.dispatcher import ActionDispatcher
+from wakeword.frames import FrameQueue, FrameRingBuffer
+from wakeword.keywords import default_registry, keyword_name, keyword_platform, model_file_path_for
+from wakeword.library import audio_format, default_library_path, default_model_file_path, tiny_keyword_file_path
+from wakeword.metrics import MetricsRegistry, MetricsServer
+from wakeword.routes import RouteTable
+from wakeword.sources import FileSource, PyAudioSource, StreamSource, UnixSocketSource
+from wakeword.trace import LatencyTracer
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'porcupine/binding/python/'))
 from porcupine import Porcupine
 
+IMPORTED_TIME = time.time()
+
 
 class SepiaPorcupineRemote(Thread):
     """
@@ -52,7 +60,34 @@ class SepiaPorcupineRemote(Thread):
             sensitivity=0.5,
             input_device_index=None,
             output_path=None,
-            frame_length=0      # 0=auto
+            frame_length=0,     # 0=auto
+            queue_size=32,
+            stats_interval=0,
+            refractory_time=2.0,
+            keepalive_interval=0,
+            targets=None,
+            cascade=False,
+            gate_model_file_path=None,
+            output_max_seconds=3600,
+            output_max_bytes=0,
+            clips_path=None,
+            clip_pre_roll=3.0,
+            clip_post_roll=1.0,
+            audio_source='pyaudio',
+            audio_file=None,
+            replay_speed=1.0,
+            socket_path=None,
+            device_rate=0,
+            device_channels=1,
+            device_channel=-1,
+            vad=False,
+            metrics_port=0,
+            trace_path=None,
+            token_check_interval=3600,
+            token_expiry_margin=86400,
+            control_socket=None,
+            startup_benchmark=False,
+            routes=None
         ): 
         """
         Constructor.
@@ -64,7 +99,48 @@ class SepiaPorcupineRemote(Thread):
         same sensitivity value for all keywords.
         :param input_device_index: Optional argument. If provided, audio is recorded from this input device. Otherwise,
         the default audio input device is used.
-        :param output_path: If provided recorded audio will be stored in this location at the end of the run.
+        :param output_path: If provided recorded audio is streamed to files based on this path (see
+        'wakeword.recorder.StreamRecorder', use '.flac' for FLAC encoding).
+        :param frame_length: Number of samples per buffer delivered by the audio stream (0 = Porcupine's frame length).
+        :param queue_size: Number of audio buffers that can wait for the detector thread before new ones are dropped.
+        :param stats_interval: If set, frame queue counters are printed every 'stats_interval' seconds.
+        :param refractory_time: Seconds of audio after a detection during which further detections of the same keyword
+        are ignored (default cooldown of 'routes').
+        :param keepalive_interval: If set, the connection to the SEPIA server is kept open by pinging it after this many
+        seconds without requests.
+        :param targets: Optional list of 'sepia.remote.RemoteTarget' (devices, channels or users) that are all triggered
+        concurrently on detection. Default is any client of 'user_id'. Default targets of 'routes'.
+        :param cascade: If True, the '*_tiny.ppn' versions of the keyword files run on every frame and detections are
+        confirmed by the keyword files and model given above.
+        :param gate_model_file_path: Model parameter file of the tiny keyword files in cascade mode.
+        :param output_max_seconds: Start a new recording file after this many seconds (0 = no limit).
+        :param output_max_bytes: Start a new recording file when the current one gets bigger than this (0 = no limit).
+        :param clips_path: If provided a clip of the audio around each detection is saved in this folder.
+        :param clip_pre_roll: Seconds of audio before a detection in each clip.
+        :param clip_post_roll: Seconds of audio after a detection in each clip.
+        :param audio_source: 'pyaudio' (stream callback), 'pyaudio_blocking' (blocking reads), 'file' (replay of
+        'audio_file'), 'stdin' (raw 16-bit PCM) or 'socket' (raw 16-bit PCM on UNIX socket 'socket_path').
+        :param audio_file: Audio file for the 'file' source.
+        :param replay_speed: Replay speed of the 'file' source relative to real-time, 0 = as fast as possible.
+        :param socket_path: Path of the UNIX socket for the 'socket' source.
+        :param device_rate: Sample rate to open the audio device with (0 = Porcupine's sample rate). Other rates are
+        converted by 'wakeword.frontend.AudioFrontEnd' instead of an ALSA 'plug' device.
+        :param device_channels: Number of channels to open the audio device with.
+        :param device_channel: Channel to use if 'device_channels' > 1, -1 = average of all channels.
+        :param vad: If True, the detector is skipped during sustained silence (see 'wakeword.vad.GatedDetector').
+        :param metrics_port: If set, counters and histograms are served in Prometheus text format on
+        'http://127.0.0.1:<metrics_port>/metrics'.
+        :param trace_path: If provided the latency of every detection from audio capture to the answer of the SEPIA
+        server is appended to this file (JSON lines, see 'wakeword.trace.LatencyTracer').
+        :param token_check_interval: If set, the login token is checked with the server in the background every this
+        many seconds and new tokens in storage are picked up without a restart (see 'sepia.account.TokenValidator').
+        :param token_expiry_margin: Seconds before the login token expires at which its renewal is requested.
+        :param control_socket: If provided keywords and sensitivities can be changed while running by commands on this
+        UNIX socket (see 'reconfigure' and 'python -m wakeword.control').
+        :param startup_benchmark: If True, stop as soon as the detector listens and the SEPIA remote is ready, after
+        printing the duration of each startup phase.
+        :param routes: Optional 'wakeword.routes.RouteTable' with the action of each keyword (microphone trigger, any
+        remote action or none, targets, language and cooldown). Default is the microphone trigger for all keywords.
         """
 
         super(SepiaPorcupineRemote, self).__init__()
@@ -73,16 +149,107 @@ class SepiaPorcupineRemote(Thread):
         self._model_file_path = model_file_path
         self._keyword_file_paths = keyword_file_paths
         self._sensitivity = float(sensitivity)
+        self._sensitivities = [self._sensitivity] * len(keyword_file_paths)
         self._input_device_index = input_device_index
         self.frame_length = frame_length
+        self._queue_size = queue_size
+        self._stats_interval = stats_interval
+        self._frame_queue = None
+        self._detecting = False
+        self._refractory_time = float(refractory_time)
+        self._refractory_frames_left = 0    # frames until the LEDs go back to idle
+        self._frames_per_second = 0.0
 
         self._output_path = output_path
-        if self._output_path is not None:
-            self._recorded_frames = []
-
-        # SEPIA setup
+        self._output_max_seconds = output_max_seconds
+        self._output_max_bytes = output_max_bytes
+        self._recorder = None
+        self._clips_path = clips_path
+        self._clip_pre_roll = float(clip_pre_roll)
+        self._clip_post_roll = float(clip_post_roll)
+        self._clip_recorder = None
+        self._audio_source = audio_source
+        self._audio_file = audio_file
+        self._replay_speed = float(replay_speed)
+        self._socket_path = socket_path
+        self._device_rate = device_rate
+        self._device_channels = device_channels
+        self._device_channel = device_channel
+        self._front_end = None
+
+        # SEPIA setup, the remote is created on the dispatcher thread while the detector loads (see '_start_remote')
         self.state = 0  # 0: inactive, 1: listening, 2: waiting
-        self.sepia_remote = sepia.remote.Remote(user_id = user_id)
+        self.sepia_remote = None
+        self._user_id = user_id
+        self._keepalive_interval = keepalive_interval
+        self._remote_ready = Event()
+        self._remote_error = None
+        self.detector_error = None      # exception that stopped the detector thread, the main loop stops on it
+        self._token_check_interval = token_check_interval
+        self._token_expiry_margin = token_expiry_margin
+        self._route_table = routes or RouteTable(user_id=user_id, targets=targets, cooldown=refractory_time)
+        self._keyword_routes = None     # route and cooldown in frames of each keyword index, see '_resolve_routes'
+        self._cascade = cascade
+        self._gate_model_file_path = gate_model_file_path or default_model_file_path(tiny=True)
+        self._cascade_detector = None
+        self._vad = vad
+        self._gated_detector = None
+        self._dispatcher = ActionDispatcher()
+        self._audio_source_instance = None
+        self._block_source = False
+        self._metrics_port = metrics_port
+        self._metrics_server = None
+        self._tracer = LatencyTracer(trace_path)
+        self._create_metrics()
+        self._keyword_labels = [self._detections.label_index(keyword_name(x)) for x in keyword_file_paths]
+        self._num_keywords = len(keyword_file_paths)
+        self._control_socket = control_socket
+        self._control_server = None
+        self._next_detector = None      # (detector, number of keywords, keyword labels, routes) waiting for the detector thread
+        self._detector = None           # detector the detector thread uses, deleted at shutdown
+        self._old_detector = None
+        self._detector_swapped = Event()
+        self._swap_lock = Lock()
+        self._reconfigure_lock = Lock()
+        self._startup_benchmark = startup_benchmark
+        self._audio_source_error = None
+        # phase -> (start, end) in seconds since the process started
+        self.startup_phases = OrderedDict([('imports', (0.0, IMPORTED_TIME - STARTUP_TIME))])
+
+    def _create_metrics(self):
+        """
+        Creates all counters and histograms. Each one is written by one thread only (audio callback, detector or
+        dispatcher), so updates take no locks, everything else is read when the metrics are scraped.
+        """
+        metrics = self.metrics = MetricsRegistry('sepia_wakeword_')
+        metrics.callback('audio_input_overflows_total', 'Audio buffers the device reported as overflowed (PyAudio callback mode).',
+            lambda: self._audio_source_instance.overflows, 'counter')
+        metrics.callback('audio_buffers_received_total', 'Audio buffers delivered by the audio source.',
+            lambda: self._frame_queue.received, 'counter')
+        metrics.callback('audio_buffers_dropped_total', 'Audio buffers dropped because the detector queue was full.',
+            lambda: self._frame_queue.dropped, 'counter')
+        metrics.callback('frame_queue_depth', 'Audio buffers waiting for the detector thread.',
+            lambda: self._frame_queue.depth)
+        metrics.callback('frame_queue_max_depth', 'Highest number of audio buffers that waited for the detector thread.',
+            lambda: self._frame_queue.max_depth)
+        self._detector_seconds = metrics.histogram('detector_frame_seconds', 'Detector time per frame.',
+            [0.0001, 0.00025, 0.0005, 0.001, 0.002, 0.004, 0.008, 0.016, 0.032])
+        self._detections = metrics.counter('detections_total', 'Detected keywords (including ones ignored in their cooldown).',
+            'keyword', [])
+        self._trigger_seconds = metrics.histogram('trigger_seconds', 'Duration of the remote actions of detected keywords.',
+            [0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0])
+        self._latency_seconds = metrics.histogram('detection_latency_seconds',
+            'Time from capturing the end of a keyword to the answer of the SEPIA server.',
+            [0.05, 0.1, 0.15, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0])
+        self._trigger_failures = metrics.counter('trigger_failures_total', 'Failed remote actions of detected keywords.')
+        metrics.callback('dispatcher_pending', 'Remote actions and LED state changes waiting for the dispatcher thread.',
+            lambda: self._dispatcher.pending)
+        metrics.callback('dispatcher_dropped_total', 'Remote actions and LED state changes dropped because the dispatcher queue was full.',
+            lambda: self._dispatcher.dropped, 'counter')
+        metrics.callback('recorder_dropped_total', 'Audio buffers the stream recorder could not write in time.',
+            lambda: self._recorder.dropped, 'counter')
+        metrics.callback('vad_skipped_frames_total', 'Frames the detector did not process because of the VAD gate.',
+            lambda: self._gated_detector.skipped - self._gated_detector.replayed, 'counter')
 
     def run(self):
         """
@@ -92,97 +259,542 @@ class SepiaPorcupineRemote(Thread):
          """
         num_keywords = len(self._keyword_file_paths)
         self.state = 0   
-        self.sepia_remote.set_state(self.sepia_remote.LOADING)
-		
-        def _audio_callback(in_data, frame_count, time_info, status):
-            if frame_count >= porcupine.frame_length:
-                pcm = struct.unpack_from("h" * porcupine.frame_length, in_data)
-                result = porcupine.process(pcm)
-                if self.state == 1:
-                    if num_keywords == 1 and result:
-                        print('[%s] detected keyword' % str(datetime.now()))
-                        self.state = 2
-                        if self.sepia_remote.trigger_microphone(): 	# TODO: optionally add device and channel ID here
-                            print('SEPIA remote: triggered microphone')
-                        else:
-                            print('SEPIA remote: trigger failed')
-                        time.sleep(2)
-                        self.sepia_remote.set_state(self.sepia_remote.IDLE)
-                        self.state = 1
-                    elif num_keywords > 1 and result >= 0:
-                        print('[%s] detected keyword #%d' % (str(datetime.now()), result))
-            
-            return (None, pyaudio.paContinue)
+        # the remote connects to the server while we load, triggers queue up behind it on the dispatcher
+        self._dispatcher.submit_always(self._start_remote)
 
         porcupine = None
-        pa = None
-        audio_stream = None
+        self._detector = None
+        audio_source = None
+        audio_opener = None
+        detector_thread = None
         try:
-            porcupine = Porcupine(
-                library_path=self._library_path,
-                model_file_path=self._model_file_path,
-                keyword_file_paths=self._keyword_file_paths,
-                sensitivities=[self._sensitivity] * num_keywords)
-
-            pa = pyaudio.PyAudio()
-            sample_rate = porcupine.sample_rate
-            num_channels = 1
-            audio_format = pyaudio.paInt16
+            # the format is known before Porcupine is initialized, so the device opens while the model loads
+            detector_rate, detector_frame_length = audio_format(self._library_path)
+            sample_rate = self._device_rate or detector_rate
+            num_channels = self._device_channels
             if not self.frame_length:
-                frame_length = porcupine.frame_length   # frame_length = 4096
+                frame_length = detector_frame_length * sample_rate // detector_rate   # frame_length = 4096
             else:
                 frame_length = self.frame_length
-            audio_stream = pa.open(
-                rate=sample_rate,
-                channels=num_channels,
-                format=audio_format,
-                input=True,
-                frames_per_buffer=frame_length,
-                input_device_index=self._input_device_index,
-				stream_callback=_audio_callback)
-
-            audio_stream.start_stream()
+            audio_opener = Thread(target=self._open_audio_source, args=(sample_rate, frame_length, num_channels),
+                name='sepia-audio-open')
+            audio_opener.daemon = True
+            audio_opener.start()
+
+            start = time.time() - STARTUP_TIME
+            porcupine = self._detector = self._create_detector(self._model_file_path, self._keyword_file_paths, self._sensitivities)
+            self.startup_phases['detector'] = (start, time.time() - STARTUP_TIME)
+            self._cascade_detector = porcupine if self._cascade else None
+            if self._vad:
+                from wakeword.vad import GatedDetector
+
+                # no detector work in silence, the pre-roll is replayed when the gate opens
+                porcupine = self._detector = GatedDetector(porcupine, num_keywords)
+            self._gated_detector = porcupine if self._vad else None
+            self._frame_buffer = FrameRingBuffer(porcupine.frame_length)
+            self._frames_per_second = porcupine.sample_rate / float(porcupine.frame_length)
+            self._keyword_routes = self._resolve_routes(self._keyword_file_paths)
+            self._refractory_frames_left = 0
+
+            if sample_rate != porcupine.sample_rate or num_channels != 1:
+                from wakeword.frontend import AudioFrontEnd
+
+                # device in its native format, conversion happens on the detector thread
+                self._front_end = AudioFrontEnd(sample_rate, num_channels, porcupine.sample_rate,
+                    channel=self._device_channel, max_input_frames=frame_length)
+
+            audio_opener.join()
+            audio_opener = None
+            audio_source = self._audio_source_instance
+            if self._audio_source_error is not None:
+                raise self._audio_source_error
+            # sources that are not live (files, pipes) wait for the detector instead of losing audio
+            self._block_source = not audio_source.realtime
+
+            self._frame_queue = FrameQueue(self._queue_size, audio_source.buffer_size)
+            self._detecting = True
+            detector_thread = Thread(target=self._detect, args=(porcupine, num_keywords))
+            detector_thread.daemon = True
+            detector_thread.start()
+
+            if self._clips_path is not None:
+                from wakeword.recorder import ClipRecorder
+
+                self._clip_recorder = ClipRecorder(
+                    output_folder=self._clips_path,
+                    sample_rate=porcupine.sample_rate,
+                    pre_roll_seconds=self._clip_pre_roll,
+                    post_roll_seconds=self._clip_post_roll)
+                self._clip_recorder.start()
+
+            if self._output_path is not None:
+                from wakeword.recorder import StreamRecorder
+
+                self._recorder = StreamRecorder(
+                    output_path=self._output_path,
+                    sample_rate=sample_rate,
+                    buffer_size=audio_source.buffer_size,
+                    channels=num_channels,
+                    max_seconds=self._output_max_seconds,
+                    max_bytes=self._output_max_bytes)
+                self._recorder.start()
+
+            if self._metrics_port:
+                self._metrics_server = MetricsServer(self.metrics, self._metrics_port)
+                self._metrics_server.start()
+
+            if self._control_socket:
+                self._control_server = ControlServer(self._control_socket, self._handle_command)
+                self._control_server.start()
+
+            start_time = time.time()
+            audio_source.start(self._audio_callback)
             self.state = 1
+            self.startup_phases['listening'] = (0.0, time.time() - STARTUP_TIME)
 
             print("\nStarted porcupine with following settings:")
-            if self._input_device_index:
-                print("Input device: %d (check with --show_audio_devices_info)" % self._input_device_index)
-            else:
-                print("Input device: default (check with --show_audio_devices_info)")
+            print("Audio source: %s" % audio_source.describe())
             print("Sample-rate: %d" % sample_rate)
             print("Channels: %d" % num_channels)
-            print("Format: %d" % audio_format)
+            if self._front_end is not None:
+                print("Front end: %s to %d Hz mono (filter delay %.1f ms)" % (
+                    "average of all channels" if self._device_channel < 0 else "channel %d" % self._device_channel,
+                    porcupine.sample_rate, self._front_end.latency * 1000))
+            print("Format: 16-bit PCM")
             print("Frame-length: %d" % frame_length)
+            print("Queue-size: %d" % self._queue_size)
             print("Keyword file(s): %s" % self._keyword_file_paths)
+            print("Keyword actions:\n  %s" % "\n  ".join(self._route_table.describe(self._keyword_file_paths)))
+            if self._metrics_server is not None:
+                print("Metrics: http://%s:%d/metrics" % self._metrics_server.address[:2])
+            if self._control_server is not None:
+                print("Control socket: %s" % self._control_socket)
+            print("Listening %.2fs after start (imports %.2fs, detector %.2fs, audio open %.2fs)" % (
+                self.startup_phases['listening'][1], self.startup_phases['imports'][1],
+                self._phase_seconds('detector'), self._phase_seconds('audio open')))
             print("Waiting for keywords ...\n")
             
-            self.sepia_remote.set_state(self.sepia_remote.IDLE)
+            self._dispatcher.submit_always(self._set_remote_state, 'IDLE')
+
+            if self._startup_benchmark:
+                self._remote_ready.wait(30)
+                self._dispatcher.stop(timeout=30)
+                self.print_startup_phases()
+                return
 
-            while True:
+            last_stats = time.time()
+            while audio_source.is_active():
                 time.sleep(0.1)
+                if self._remote_error is not None:
+                    print("SEPIA remote: failed to start - %s" % self._remote_error)
+                    break
+                if self.detector_error is not None:
+                    print("Wake-word detection has stopped, exiting")
+                    break
+                if self._stats_interval and time.time() - last_stats >= self._stats_interval:
+                    last_stats = time.time()
+                    self.print_queue_stats()
+
+            # source has ended (e.g. end of file), let the detector finish what is queued
+            while self._frame_queue.depth and self.detector_error is None:
+                time.sleep(0.01)
+            audio_seconds = audio_source.samples_delivered / float(sample_rate)
+            processing_seconds = time.time() - start_time
+            if self.detector_error is None:
+                print("\nAudio source ended: %.1fs of audio in %.1fs (%.1fx real-time)" % (
+                    audio_seconds, processing_seconds, audio_seconds / max(processing_seconds, 1e-6)))
 
         except KeyboardInterrupt:
             print('\nstopping ...')
         finally:
-            if audio_stream is not None:
-                audio_stream.stop_stream()
-                audio_stream.close()
-
-            if pa is not None:
-                pa.terminate()
+            if self._control_server is not None:
+                self._control_server.stop()
+
+            if audio_opener is not None:
+                audio_opener.join()
+                audio_source = self._audio_source_instance
+            if audio_source is not None:
+                audio_source.stop()
+
+            if detector_thread is not None:
+                self._detecting = False
+                self._frame_queue.close()
+                detector_thread.join()
+                self.print_queue_stats()
+
+            self._dispatcher.stop(timeout=5)
+            if self.sepia_remote is not None:
+                self.sepia_remote.stop_keepalive()
+                self.sepia_remote.stop_token_validation()
+
+            if self._metrics_server is not None:
+                self._metrics_server.stop()
+            self._tracer.close()
 				
-            if porcupine is not None:
+            # the current detector, the one created here may have been replaced (and deleted) by 'reconfigure'
+            if self._detector is not None:
+                self._detector.delete()
+                self._detector = None
+
+            if self._clip_recorder is not None:
+                self._clip_recorder.stop()
+                print("Clip recorder: saved %d clips in %s" % (self._clip_recorder.saved, self._clips_path))
+
+            if self._recorder is not None:
+                self._recorder.stop()
+                print("Recorder: dropped %d buffers, index: %s" % (self._recorder.dropped, self._recorder.index_path))
+
+    def _open_audio_source(self, sample_rate, frame_length, num_channels):
+        """Audio opener thread: creates and opens the audio source while the detector is created."""
+
+        start = time.time() - STARTUP_TIME
+        try:
+            self._audio_source_instance = self._create_audio_source(sample_rate, frame_length, num_channels)
+            self._audio_source_instance.open()
+        except Exception as e:
+            self._audio_source_error = e
+        self.startup_phases['audio open'] = (start, time.time() - STARTUP_TIME)
+
+    def _start_remote(self):
+        """
+        Dispatcher thread: imports and creates the SEPIA remote and opens the server connection, so the first trigger
+        doesn't pay for the handshake. Runs while the detector loads, actions submitted later wait for it.
+        """
+        start = time.time() - STARTUP_TIME
+        try:
+            import sepia.remote
+
+            self.sepia_remote = sepia.remote.Remote(user_id=self._user_id, keepalive_interval=self._keepalive_interval)
+            self.sepia_remote.set_state(self.sepia_remote.LOADING)
+            self.startup_phases['remote'] = (start, time.time() - STARTUP_TIME)
+            start = time.time() - STARTUP_TIME
+            self.sepia_remote.warm_up()
+            self.startup_phases['warm-up'] = (start, time.time() - STARTUP_TIME)
+            self.sepia_remote.start_keepalive()
+            if self._token_check_interval:
+                self.sepia_remote.start_token_validation(self._token_check_interval, self._token_expiry_margin)
+        except (Exception, SystemExit) as e:
+            # e.g. no token stored yet, the main thread stops
+            self._remote_error = e
+        finally:
+            self._remote_ready.set()
+
+    def _set_remote_state(self, state_name):
+        """Dispatcher thread: sets the LED state of the remote (if it started)."""
+
+        if self.sepia_remote is not None:
+            self.sepia_remote.set_state(getattr(self.sepia_remote, state_name))
+
+    def _phase_seconds(self, phase):
+        start, end = self.startup_phases.get(phase, (0.0, 0.0))
+        return end - start
+
+    def print_startup_phases(self):
+        """Prints start and end of each startup phase in seconds since the process started."""
+
+        print("Startup phases (seconds since start):")
+        for phase, (start, end) in sorted(self.startup_phases.items(), key=lambda x: x[1][1]):
+            print("  %-10s %6.3f - %6.3f (%.3fs)" % (phase, start, end, end - start))
+        if self._remote_error is not None:
+            print("  SEPIA remote failed - %s" % self._remote_error)
+
+    def _create_detector(self, model_file_path, keyword_file_paths, sensitivities):
+        """Creates the detector for the given keywords (Porcupine or, in cascade mode, a 'CascadeDetector')."""
+
+        porcupine = Porcupine(
+            library_path=self._library_path,
+            model_file_path=model_file_path,
+            keyword_file_paths=keyword_file_paths,
+            sensitivities=sensitivities)
+        if self._cascade:
+            from wakeword.cascade import CascadeDetector
+
+            # tiny model on every frame, the model above only confirms what the tiny one found
+            try:
+                gate = Porcupine(
+                    library_path=self._library_path,
+                    model_file_path=self._gate_model_file_path,
+                    keyword_file_paths=[tiny_keyword_file_path(x) for x in keyword_file_paths],
+                    sensitivities=sensitivities)
+            except Exception:
                 porcupine.delete()
+                raise
+            porcupine = CascadeDetector(gate=gate, confirm=porcupine, num_keywords=len(keyword_file_paths))
+        return porcupine
 
-            if self._output_path is not None and len(self._recorded_frames) > 0:
-                recorded_audio = np.concatenate(self._recorded_frames, axis=0).astype(np.int16)
-                soundfile.write(self._output_path, recorded_audio, samplerate=sample_rate, subtype='PCM_16')
+    def reconfigure(self, keyword_file_paths=None, sensitivities=None, model_file_path=None, timeout=10):
+        """
+        Changes keywords and/or sensitivities while running. The new detector is created on the calling thread while
+        the old one keeps processing audio. The detector thread swaps them between two frames and the old detector
+        is deleted afterwards, so no audio frame is missed. Returns the seconds it took until the new detector was
+        used. Raises an exception (and keeps the old detector) if the new one can't be created.
+
+        :param keyword_file_paths: New list of keyword files, default is the current one.
+        :param sensitivities: Sensitivity of each keyword (or one value for all), default is the current one of each
+        keyword file ('sensitivity' of the constructor for new ones).
+        :param model_file_path: Model parameter file, default is the current one or, with new keyword files, the one
+        that goes with them.
+        """
+        with self._reconfigure_lock:
+            start = time.time()
+            if keyword_file_paths is None:
+                keyword_file_paths = self._keyword_file_paths
+                model_file_path = model_file_path or self._model_file_path
+            else:
+                model_file_path = model_file_path or model_file_path_for(keyword_file_paths)
+            if sensitivities is None:
+                current = dict(zip(self._keyword_file_paths, self._sensitivities))
+                sensitivities = [current.get(x, self._sensitivity) for x in keyword_file_paths]
+            sensitivities = [float(x) for x in sensitivities]
+            if len(sensitivities) == 1:
+                sensitivities = sensitivities * len(keyword_file_paths)
+            if len(sensitivities) != len(keyword_file_paths):
+                raise ValueError("Got %d sensitivities for %d keywords" % (len(sensitivities), len(keyword_file_paths)))
+
+            detector = self._create_detector(model_file_path, keyword_file_paths, sensitivities)
+            labels = [self._detections.label_index(keyword_name(x)) for x in keyword_file_paths]
+            routes = self._resolve_routes(keyword_file_paths)
+            if not self._detecting:
+                detector.delete()
+                raise ValueError("Detector is not running")
+            self._detector_swapped.clear()
+            self._next_detector = (detector, len(keyword_file_paths), labels, routes)
+            if not self._detector_swapped.wait(timeout):
+                # the detector thread did not pick it up (e.g. no audio), take it back unless it was swapped just now
+                with self._swap_lock:
+                    taken_back = self._next_detector is not None
+                    self._next_detector = None
+                if taken_back:
+                    detector.delete()
+                    raise ValueError("Detector thread did not take the new detector within %ds" % timeout)
+                # the detector thread is swapping right now, it sets the old detector before the event
+                self._detector_swapped.wait()
+            self._old_detector.delete()
+            self._old_detector = None
+
+            self._keyword_file_paths = keyword_file_paths
+            self._sensitivities = sensitivities
+            self._model_file_path = model_file_path
+            print("Reconfigured in %.2fs, keyword file(s): %s, sensitivities: %s" % (
+                time.time() - start, keyword_file_paths, sensitivities))
+            return time.time() - start
+
+    def _swap_detector(self, porcupine):
+        """Detector thread: takes over the detector prepared by 'reconfigure', between two frames."""
+
+        with self._swap_lock:
+            if self._next_detector is None:
+                # taken back by 'reconfigure' in the meantime
+                return (porcupine, self._num_keywords, self._keyword_labels, self._keyword_routes)
+            detector, num_keywords, labels, routes = self._next_detector
+            self._next_detector = None
+        if self._gated_detector is not None:
+            # keep the state of the gate (noise floor, pre-roll), only the detector behind it changes
+            self._old_detector = self._gated_detector.replace_detector(detector, num_keywords)
+        else:
+            self._old_detector = porcupine
+            porcupine = self._detector = detector
+        self._cascade_detector = detector if self._cascade else None
+        self._num_keywords = num_keywords
+        self._keyword_labels = labels
+        self._keyword_routes = routes
+        self._detector_swapped.set()
+        return (porcupine, num_keywords, labels, routes)
+
+    def _handle_command(self, command):
+        """Control thread: handles a command of the control socket (see 'wakeword.control')."""
+
+        action = command.get('action')
+        if action == 'reconfigure':
+            keyword_file_paths = command.get('keyword_file_paths')
+            if command.get('keywords'):
+                keyword_file_paths = [default_registry().resolve(x, tiny=command.get('tiny', False)) for x in command['keywords']]
+            seconds = self.reconfigure(keyword_file_paths, command.get('sensitivities'), command.get('model_file_path'))
+            return {'result': 'success', 'seconds': seconds, 'keyword_file_paths': self._keyword_file_paths,
+                'sensitivities': self._sensitivities}
+        elif action == 'status':
+            return {'result': 'success', 'keyword_file_paths': self._keyword_file_paths,
+                'sensitivities': self._sensitivities, 'model_file_path': self._model_file_path,
+                'actions': self._route_table.describe(self._keyword_file_paths)}
+        return {'result': 'fail', 'error': "Unknown action '%s'" % action}
+
+    def _create_audio_source(self, sample_rate, frame_length, num_channels):
+        """Creates the audio source selected in the constructor."""
+
+        if self._audio_source == 'file':
+            return FileSource(self._audio_file, sample_rate, frame_length, num_channels, speed=self._replay_speed)
+        elif self._audio_source == 'stdin':
+            return StreamSource(sample_rate, frame_length, num_channels)
+        elif self._audio_source == 'socket':
+            return UnixSocketSource(self._socket_path, sample_rate, frame_length, num_channels)
+        elif self._audio_source in ('pyaudio', 'pyaudio_blocking'):
+            return PyAudioSource(sample_rate, frame_length, num_channels, input_device_index=self._input_device_index,
+                blocking=(self._audio_source == 'pyaudio_blocking'))
+        raise ValueError("Unknown audio source '%s'" % self._audio_source)
+
+    def _audio_callback(self, in_data):
+        """
+        Audio thread: only hands the buffer over, detection and recording run on their own threads.
+        """
+        self._frame_queue.put(in_data, self._audio_source_instance.capture_time, block=self._block_source)
+        if self._recorder is not None:
+            self._recorder.write(in_data)
+
+    def _detect(self, porcupine, num_keywords):
+        """
+        Detector thread: runs '_detect_frames'. If it fails the error is kept for the main loop, which stops instead of
+        reporting that it is still listening, and the queue is closed so a blocking source does not wait for it.
+        """
+        try:
+            self._detect_frames(porcupine, num_keywords)
+        except Exception as e:
+            print("Detector thread: stopped by %s - %s" % (type(e).__name__, e))
+            self.detector_error = e
+            self.state = 0
+            self._frame_queue.close()
+
+    def _detect_frames(self, porcupine, num_keywords):
+        """
+        Drains the frame queue, splits buffers into detector frames and handles detections.
+        The native Porcupine call releases the GIL, so capture and detection can run on different cores.
+        """
+        timer = time.perf_counter
+        detector_seconds = self._detector_seconds
+        detections = self._detections
+        labels = self._keyword_labels
+        routes = self._keyword_routes
+        ready_at = [0] * num_keywords   # frame from which on each keyword acts again (end of its cooldown)
+        frame_index = 0
+        frame_length = porcupine.frame_length
+        sample_period = 1.0 / porcupine.sample_rate
+        while self._detecting:
+            in_data = self._frame_queue.get(timeout=0.5)
+            if in_data is None:
+                continue
+            try:
+                capture_time = self._frame_queue.timestamp
+                if self._front_end is not None:
+                    in_data = self._front_end.process(in_data)
+                pending = self._frame_buffer.pending
+                # split the buffer into all complete detector frames, the rest is kept for the next buffer
+                for i, frame in enumerate(self._frame_buffer.push(in_data)):
+                    if self._clip_recorder is not None:
+                        self._clip_recorder.write(frame)
+                    if self._next_detector is not None:
+                        porcupine, num_keywords, labels, routes = self._swap_detector(porcupine)
+                        ready_at = [0] * num_keywords
+                    start = timer()
+                    result = porcupine.process_buffer(frame)
+                    end = timer()
+                    detector_seconds.observe(end - start)
+                    frame_index += 1
+                    if self._refractory_frames_left:
+                        self._refractory_frames_left -= 1
+                        if not self._refractory_frames_left:
+                            # re-armed here, only the LEDs wait for the dispatcher (and never get dropped)
+                            self.state = 1
+                            self._dispatcher.submit_always(self._end_refractory_period)
+                    if num_keywords == 1:
+                        index = 0 if result else -1
+                    else:
+                        index = result
+                    if index < 0:
+                        continue
+                    detections.inc(labels[index])
+                    # each keyword is ignored for a while after it acted (counted in frames, we never sleep here)
+                    if not self.state or frame_index < ready_at[index]:
+                        continue
+                    route, cooldown_frames = routes[index]
+                    ready_at[index] = frame_index + cooldown_frames
+                    if num_keywords == 1:
+                        print('[%s] detected keyword' % str(datetime.now()))
+                    else:
+                        print('[%s] detected keyword #%d' % (str(datetime.now()), index))
+                    if self._clip_recorder is not None:
+                        self._clip_recorder.trigger(index)
+                    trace = self._trace(labels[index], capture_time, (i + 1) * frame_length - pending, sample_period, end)
+                    if route.action == 'none':
+                        self._dispatcher.submit(self._record_trace, trace)
+                    else:
+                        # LEDs show the result until the longest running cooldown is over
+                        self.state = 2
+                        self._refractory_frames_left = max(self._refractory_frames_left, cooldown_frames, 1)
+                        self._dispatcher.submit(self._run_route, route, trace)
+            finally:
+                self._frame_queue.release()
+
+    def _trace(self, keyword_label, capture_time, end_sample, sample_period, detected_time):
+        """
+        Detector thread: starts the latency trace of a detection. The keyword ended with sample 'end_sample' of the
+        current buffer, which was captured from 'capture_time' on.
+        """
+        return {
+            'keyword': self._detections.label_values[keyword_label],
+            'capture': capture_time + end_sample * sample_period,
+            'enqueue': self._frame_queue.enqueue_time,
+            'detected': detected_time}
+
+    def _resolve_routes(self, keyword_file_paths):
+        """Route and cooldown in detector frames of each keyword index, looked up by the detector thread."""
+
+        return [(route, int(round(route.cooldown * self._frames_per_second)))
+            for route in self._route_table.resolve(keyword_file_paths)]
+
+    def _run_route(self, route, trace):
+        """Dispatcher thread: runs the remote action of a detected keyword (see 'wakeword.routes')."""
+
+        remote = self.sepia_remote
+        if route.action == 'microphone':
+            success = remote.trigger_microphone(language=route.language, targets=route.targets)
+        elif route.targets:
+            success = all(x.success for x in remote.send_action_to_targets(route.action_type, route.payload, route.targets))
+        else:
+            success = remote.send_action(route.action_type, route.payload)
+        trace['send'] = remote.last_send_time
+        trace['ack'] = remote.last_ack_time
+        trace['success'] = success
+        self._trigger_seconds.observe(trace['ack'] - trace['send'])
+        name = "triggered microphone" if route.action == 'microphone' else "sent '%s' action" % route.action_type
+        if success:
+            print('SEPIA remote: %s (%s)' % (name, trace['keyword']))
+        else:
+            self._trigger_failures.inc()
+            print('SEPIA remote: %s failed (%s)' % ("trigger" if route.action == 'microphone' else "'%s' action" % route.action_type, trace['keyword']))
+        self._record_trace(trace)
+
+    def _record_trace(self, trace):
+        """Dispatcher thread: logs a latency trace."""
+
+        durations = self._tracer.record(trace)
+        if 'total' in durations:
+            self._latency_seconds.observe(durations['total'])
+
+    def _end_refractory_period(self):
+        """Dispatcher thread: runs after the remote actions are done and their cooldowns are over."""
+
+        self._set_remote_state('IDLE')
+
+    def print_queue_stats(self):
+        """Prints counters of the frame queue between audio callback and detector thread (and of the optional stages)."""
+
+        queue = self._frame_queue
+        print("Frame queue: depth %d (max. %d of %d), received %d, dropped %d" % (
+            queue.depth, queue.max_depth, queue.capacity, queue.received, queue.dropped))
+        if self._cascade_detector is not None:
+            print(self._cascade_detector.stats())
+        if self._gated_detector is not None:
+            print(self._gated_detector.stats())
+        if self._front_end is not None:
+            print("Front end: %.2f%% CPU (of one core)" % (self._front_end.cpu_load * 100))
+        if self._tracer.traces:
+            print(self._tracer.stats())
 
     _AUDIO_DEVICE_INFO_KEYS = ['index', 'name', 'defaultSampleRate', 'maxInputChannels']
 
     @classmethod
     def show_audio_devices_info(cls):
         """ Provides information regarding different audio devices available. """
+        import pyaudio
 
         pa = pyaudio.PyAudio()
 
@@ -192,24 +804,6 @@ class SepiaPorcupineRemote(Thread):
 
         pa.terminate()
 
-def _default_library_path():
-    system = platform.system()
-    machine = platform.machine()
-
-    if system == 'Darwin':
-        return os.path.join(os.path.dirname(__file__), 'porcupine/lib/mac/%s/libpv_porcupine.dylib' % machine)
-    elif system == 'Linux':
-        if machine == 'x86_64' or machine == 'i386':
-            return os.path.join(os.path.dirname(__file__), 'porcupine/lib/linux/%s/libpv_porcupine.so' % machine)
-        else:
-            raise Exception('Cannot autodetect library. Please use e.g.: --library_path="porcupine/lib/raspberry-pi/arm11/libpv_porcupine.so" (Pi Zero with ARM11 CPU).')
-    elif system == 'Windows':
-        if platform.architecture()[0] == '32bit':
-            return os.path.join(os.path.dirname(__file__), 'porcupine\\lib\\windows\\i686\\libpv_porcupine.dll')
-        else:
-            return os.path.join(os.path.dirname(__file__), 'porcupine\\lib\\windows\\amd64\\libpv_porcupine.dll')
-    raise NotImplementedError('Porcupine is not supported on %s/%s yet!' % (system, machine))
-
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -217,40 +811,127 @@ if __name__ == '__main__':
         type=str, default='porcupine/keyword_files/hey_sepia_windows.ppn')
     parser.add_argument('--library_path', help='Path to Porcupine library, e.g.: --library_path="porcupine/lib/raspberry-pi/arm11/libpv_porcupine.so" (Pi Zero with ARM11 CPU).',
         type=str)
-    parser.add_argument('--model_file_path', help='Path to model parameter file.',
-        type=str, default=os.path.join(os.path.dirname(__file__), 'porcupine/lib/common/porcupine_params.pv'))
+    parser.add_argument('--keywords', help="Comma-separated keyword names, e.g. 'hey_sepia,alexa' (instead of --keyword_file_paths, the files of this platform are used, see --show_keywords).",
+        type=str, default=None)
+    parser.add_argument('--tiny', help='Use the tiny versions of --keywords (and the tiny model).', action='store_true')
+    parser.add_argument('--keyword_folder', help='Additional folder with (custom) keyword files for --keywords.', type=str, default=None)
+    parser.add_argument('--show_keywords', help='Show the keywords available for --keywords on this platform.', action='store_true')
+    parser.add_argument('--model_file_path', help='Path to model parameter file (default: the one that goes with the keyword files).',
+        type=str, default=None)
     parser.add_argument('--sensitivity', help='Detection sensitivity [0, 1]', default=0.5)
     parser.add_argument('--input_audio_device_index', help='Index of input audio device (same as --input_device).', type=int, default=None)   # we keep this for compatability
     parser.add_argument('--input_device', help='Index of input audio device (check with --show_audio_devices_info).', type=int, default=None)
-    parser.add_argument('--frame_length', help='Frame length setting for audio buffer. On Pi Zero you might want to try --frame_length=4096.', type=int, default=0)
-    parser.add_argument('--output_path', help='Path to where recorded audio will be stored. If not set, it will be bypassed.',
+    parser.add_argument('--frame_length', help='Frame length setting for audio buffer (any size, buffers are split into detector frames). On Pi Zero you might want to try --frame_length=4096.', type=int, default=0)
+    parser.add_argument('--queue_size', help='Number of audio buffers that can wait for the detector before new ones are dropped.', type=int, default=32)
+    parser.add_argument('--stats_interval', help='Print frame queue depth and dropped buffers every N seconds (0 = only at shutdown).', type=float, default=0)
+    parser.add_argument('--refractory_time', help='Seconds of audio after a detection during which the keyword is ignored (default cooldown of --routes).', type=float, default=2.0)
+    parser.add_argument('--routes', help='JSON file with the action of each keyword: microphone trigger, any remote action or none, targets, language and cooldown (see wakeword/routes.py). Default: all keywords trigger the microphone.', type=str, default=None)
+    parser.add_argument('--keepalive_interval', help='Ping the SEPIA server after N seconds without requests to keep the connection open (0 = off).', type=float, default=0)
+    parser.add_argument('--targets', help="Comma-separated targets '[user_id]/[device]/[channel]' to trigger concurrently, e.g. 'uid1007/o1,uid1007/o2'. Default: any client of --user_id.", type=str, default=None)
+    parser.add_argument('--cascade', help="Run the '*_tiny.ppn' keyword files on every frame and confirm detections with --keyword_file_paths and --model_file_path.", action='store_true')
+    parser.add_argument('--vad', help='Skip the detector during sustained silence (energy/zero-crossing gate, the last second is replayed when sound starts).', action='store_true')
+    parser.add_argument('--gate_model_file_path', help='Model parameter file of the tiny keyword files in cascade mode.', type=str, default=default_model_file_path(tiny=True))
+    parser.add_argument('--output_path', help='Base path of recorded audio files, e.g. "recordings/mic.wav" or "recordings/mic.flac" (FLAC). If not set, it will be bypassed.',
         type=str, default=None)
+    parser.add_argument('--output_max_seconds', help='Start a new recording file after N seconds (0 = no limit).', type=float, default=3600)
+    parser.add_argument('--output_max_bytes', help='Start a new recording file when the current one gets bigger than N bytes (0 = no limit).', type=int, default=0)
+    parser.add_argument('--clips_path', help='Folder to save a clip of the audio around each detection in (e.g. to review false alarms). If not set, it will be bypassed.', type=str, default=None)
+    parser.add_argument('--clip_pre_roll', help='Seconds of audio before a detection in each clip.', type=float, default=3.0)
+    parser.add_argument('--clip_post_roll', help='Seconds of audio after a detection in each clip.', type=float, default=1.0)
+    parser.add_argument('--audio_source', help="Where audio comes from: 'pyaudio' (default), 'pyaudio_blocking', 'file' (see --audio_file), 'stdin' (raw 16-bit PCM) or 'socket' (raw 16-bit PCM, see --socket_path).",
+        type=str, default='pyaudio', choices=['pyaudio', 'pyaudio_blocking', 'file', 'stdin', 'socket'])
+    parser.add_argument('--audio_file', help='Audio file for --audio_source=file (16 kHz mono or the format of --device_rate and --device_channels).', type=str, default=None)
+    parser.add_argument('--replay_speed', help='Replay speed of --audio_source=file relative to real-time, 0 = as fast as possible.', type=float, default=1.0)
+    parser.add_argument('--socket_path', help='UNIX socket path for --audio_source=socket.', type=str, default='/tmp/sepia_wakeword.sock')
+    parser.add_argument('--device_rate', help='Open the audio device at this sample rate (e.g. 48000, see --show_audio_devices_info) and resample in our front end instead of ALSA (0 = 16000).', type=int, default=0)
+    parser.add_argument('--device_channels', help='Open the audio device with this many channels (e.g. 2 for ReSpeaker 2-Mic-HAT).', type=int, default=1)
+    parser.add_argument('--device_channel', help='Channel to use with --device_channels > 1, -1 = average of all channels.', type=int, default=-1)
+    parser.add_argument('--metrics_port', help='Serve counters and histograms in Prometheus text format on http://127.0.0.1:<port>/metrics (0 = off).', type=int, default=0)
+    parser.add_argument('--trace_path', help='Append the latency of every detection (capture, queue, detector, dispatcher, server answer) to this file as JSON lines.', type=str, default=None)
+    parser.add_argument('--token_check_interval', help='Check the login token with the SEPIA server every N seconds in the background and pick up new tokens from storage (0 = off).', type=float, default=3600)
+    parser.add_argument('--token_expiry_margin', help='Ask to renew the login token this many seconds before it expires (if the server told us when).', type=float, default=86400)
+    parser.add_argument('--control_socket', help="UNIX socket to change keywords and sensitivities while running, e.g. '/tmp/sepia_wakeword_control.sock' (see python -m wakeword.control).", type=str, default=None)
+    parser.add_argument('--startup_benchmark', help='Print the duration of each startup phase (imports, detector, audio open, SEPIA remote, warm-up) and exit once listening.', action='store_true')
     parser.add_argument('--show_audio_devices_info', help='Show a list of devices to be used with --input_device.', action='store_true')
     parser.add_argument('--user_id', help='User ID of SEPIA user to trigger remote action for.', type=str)
 
     args = parser.parse_args()
 
+    registry = None
+    if args.keywords or args.show_keywords:
+        registry = default_registry()
+        if args.keyword_folder:
+            registry.add_folder(args.keyword_folder)
+
     if args.show_audio_devices_info:
         SepiaPorcupineRemote.show_audio_devices_info()
+    elif args.show_keywords:
+        target_platform = keyword_platform()
+        for keyword in registry.keywords:
+            versions = [name for name, tiny in [('full', False), ('tiny', True)]
+                if target_platform in registry.platforms(keyword, tiny) or None in registry.platforms(keyword, tiny)]
+            if versions:
+                print("%s (%s)" % (keyword, ", ".join(versions)))
     else:
-        if not args.keyword_file_paths:
+        if args.keywords:
+            keyword_file_paths, model_file_path = registry.resolve_all([x.strip() for x in args.keywords.split(',')], tiny=args.tiny)
+        elif args.keyword_file_paths:
+            keyword_file_paths = [x.strip() for x in args.keyword_file_paths.split(',')]
+            model_file_path = model_file_path_for(keyword_file_paths)
+        else:
             raise ValueError('Keyword file paths are missing')
+        if args.audio_source == 'file' and not args.audio_file:
+            raise ValueError('Missing --audio_file')
         if not args.user_id:
             raise ValueError('Missing user ID')
 
+        targets = parse_targets(args.targets, args.user_id) if args.targets else None
+        routes = RouteTable.load(args.routes, args.user_id, targets, args.refractory_time) if args.routes else None
+
         input_device = None     # default
         if args.input_audio_device_index:
             input_device = args.input_audio_device_index
         elif args.input_device:
             input_device = args.input_device
 
-        SepiaPorcupineRemote(
-            library_path=args.library_path if args.library_path is not None else _default_library_path(),
-            model_file_path=args.model_file_path,
-            keyword_file_paths=[x.strip() for x in args.keyword_file_paths.split(',')],
+        sepia_porcupine = SepiaPorcupineRemote(
+            library_path=args.library_path if args.library_path is not None else default_library_path(),
+            model_file_path=args.model_file_path or model_file_path,
+            keyword_file_paths=keyword_file_paths,
             sensitivity=args.sensitivity,
             output_path=args.output_path,
             input_device_index=input_device,
             frame_length=args.frame_length,
+            queue_size=args.queue_size,
+            stats_interval=args.stats_interval,
+            refractory_time=args.refractory_time,
+            keepalive_interval=args.keepalive_interval,
+            targets=targets,
+            cascade=args.cascade,
+            gate_model_file_path=args.gate_model_file_path,
+            output_max_seconds=args.output_max_seconds,
+            output_max_bytes=args.output_max_bytes,
+            clips_path=args.clips_path,
+            clip_pre_roll=args.clip_pre_roll,
+            clip_post_roll=args.clip_post_roll,
+            audio_source=args.audio_source,
+            audio_file=args.audio_file,
+            replay_speed=args.replay_speed,
+            socket_path=args.socket_path,
+            device_rate=args.device_rate,
+            device_channels=args.device_channels,
+            device_channel=args.device_channel,
+            vad=args.vad,
+            metrics_port=args.metrics_port,
+            trace_path=args.trace_path,
+            token_check_interval=args.token_check_interval,
+            token_expiry_margin=args.token_expiry_margin,
+            control_socket=args.control_socket,
+            startup_benchmark=args.startup_benchmark,
+            routes=routes,
             user_id = args.user_id
-        ).run()
+        )
+        sepia_porcupine.run()
+        # non-zero, so a supervisor (e.g. systemd) restarts us
+        if sepia_porcupine.detector_error is not None:
+            sys.exit(1)
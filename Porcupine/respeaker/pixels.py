@@ -130,10 +130,9 @@ class Pixels:
         self.dev.show()
 
 
-pixels = Pixels()
-
-
 if __name__ == '__main__':
+    # created here and not at import, it opens the SPI device and starts a thread
+    pixels = Pixels()
     while True:
 
         try:
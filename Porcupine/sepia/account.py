@@ -4,16 +4,174 @@
 #
 
 import sys
-import requests
 import json
+import time
 import getpass
 import argparse
+import threading
+import requests
 
 try:
     from .storage import Storage
+    from .connection import create_session, CONNECT_TIMEOUT, READ_TIMEOUT
 except ValueError:
     raise ValueError("Please use 'python -m sepia.account' (from outside the 'account.py' folder) to start the main function of this module.")
 
+def check_token(session, host_address, user_id, token, client_info="wakeword_tool", timeout=(CONNECT_TIMEOUT, READ_TIMEOUT)):
+    """
+    Send the authentication 'check' request for a login token. Returns a tuple (valid, response data), 'valid' is None
+    if the server could not be reached or did not answer properly.
+    """
+    url = host_address + "/assist/authentication"
+    payload = {
+        'action' : "check",
+        'client' : client_info,
+        'KEY' : (user_id + ";" + token)
+    }
+    headers = {
+        'Content-Type': "application/json"
+    }
+    try:
+        response = session.post(url, json=payload, headers=headers, timeout=timeout)
+        res = json.loads(response.text)
+    except (requests.exceptions.RequestException, ValueError):
+        return (None, None)
+    if not isinstance(res, dict) or not "result" in res:
+        return (None, res)
+    return (res["result"] == "success", res)
+
+def token_expiry(res):
+    """
+    Expiry time of the login token (seconds since the epoch) in a login or check answer of the server ('validUntil' in
+    milliseconds), None if the answer has none.
+    """
+    valid_until = res.get("validUntil") if isinstance(res, dict) else None
+    try:
+        return float(valid_until) / 1000.0 if valid_until else None
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenValidator():
+    """
+    Checks the login tokens of an 'AsyncRemote' in the background with the authentication 'check' action (over the
+    pooled connection of the remote). Tokens written to storage by another process (e.g. 'python -m sepia.account') are
+    picked up and checked right away. Rejected tokens are reported and remembered by the remote, so remote actions
+    fail fast instead of sending a request with stale credentials.
+    If the expiry of a token is known (stored at login or in the answer of a check) a renewal is requested
+    'expiry_margin' seconds before it, and the token is checked again as soon as it expired. The password is not
+    stored, so a new token can only come from 'python -m sepia.account' (picked up without a restart).
+    """
+
+    def __init__(self, remote, interval=3600, poll_interval=1.0, on_invalid=None, expiry_margin=86400,
+            on_expiring=None, clock=time.time):
+        """
+        Constructor.
+
+        :param remote: 'sepia.remote.AsyncRemote' whose users are checked.
+        :param interval: seconds between two checks of the same token.
+        :param poll_interval: seconds between two looks at the storage for new tokens (cheap, see 'Storage').
+        :param on_invalid: optional function 'on_invalid(user_id)' called when the server rejected a token.
+        :param expiry_margin: seconds before the expiry of a token at which its renewal is requested.
+        :param on_expiring: optional function 'on_expiring(user_id, seconds_left)' called once per token when it is
+        about to expire.
+        :param clock: function returning the current time in seconds since the epoch.
+        """
+        self.remote = remote
+        self.interval = interval
+        self.poll_interval = poll_interval
+        self.on_invalid = on_invalid
+        self.expiry_margin = expiry_margin
+        self.on_expiring = on_expiring
+        self._clock = clock
+        self.status = {}    # user ID -> (valid, time of the check), 'valid' is None if the check failed
+        self.expiry = {}    # user ID -> (token, expiry time) from the last check
+        self._warned = set()    # tokens whose renewal was requested already
+        self._stop = threading.Event()
+        self._thread = None
+
+    def is_valid(self, user_id):
+        """
+        Result of the last check of this user's token: True, False or None (not checked yet or no answer).
+        """
+        return self.status.get(user_id, (None, 0))[0]
+
+    def check(self, user_id):
+        """
+        Check the current token of a user now. Returns True, False or None (no answer).
+        """
+        user_data = self.remote.get_user_data(user_id)
+        valid, res = check_token(self.remote.session, self.remote.host_address, user_id, user_data["token"],
+            self.remote.client_info, self.remote.timeout)
+        self.status[user_id] = (valid, self._clock())
+        if valid:
+            self.remote.invalid_tokens.discard(user_data["token"])
+            expiry = token_expiry(res)
+            if expiry:
+                self.expiry[user_id] = (user_data["token"], expiry)
+        elif valid is False:
+            self.remote.invalid_tokens.add(user_data["token"])
+            print("SEPIA remote: Login token of '%s' was rejected, please renew it (python -m sepia.account --id=%s)." % (user_id, user_id))
+            if self.on_invalid:
+                self.on_invalid(user_id)
+        return valid
+
+    def check_expiry(self, user_id):
+        """
+        Request the renewal of a user's token (once per token) if it expires within 'expiry_margin' seconds and check
+        it with the server as soon as it expired. Returns the seconds left or None if the expiry is unknown.
+        """
+        user_data = self.remote.get_user_data(user_id)
+        token = user_data["token"]
+        expiry = user_data.get("valid_until")
+        checked = self.expiry.get(user_id)
+        if checked and checked[0] == token:
+            expiry = checked[1]
+        if not expiry:
+            return None
+        seconds_left = expiry - self._clock()
+        if seconds_left <= self.expiry_margin and token not in self._warned:
+            self._warned.add(token)
+            print("SEPIA remote: Login token of '%s' expires in %.1f hours, please renew it (python -m sepia.account --id=%s)." % (
+                user_id, max(0.0, seconds_left) / 3600.0, user_id))
+            if self.on_expiring:
+                self.on_expiring(user_id, seconds_left)
+        if seconds_left <= 0 and self.status.get(user_id, (None, 0))[1] < expiry:
+            # expired since the last check: find out now, not with the next remote action
+            self.check(user_id)
+        return seconds_left
+
+    def start(self):
+        """
+        Start the background thread, the first check runs right away.
+        """
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sepia-token-validator")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stop the background thread.
+        """
+        self._stop.set()
+
+    def _run(self):
+        while True:
+            for user_id in self.remote.user_ids():
+                try:
+                    changed = self.remote.refresh_user_data(user_id)
+                    last_check = self.status.get(user_id, (None, 0))[1]
+                    if changed or self._clock() - last_check >= self.interval:
+                        self.check(user_id)
+                    self.check_expiry(user_id)
+                except Exception as e:
+                    print("SEPIA remote: Token check failed - " + str(e))
+                    self.status[user_id] = (None, self._clock())
+            if self._stop.wait(self.poll_interval):
+                break
+
+
 class Account():
     """
     Class to handle SEPIA accounts.
@@ -40,6 +198,8 @@ class Account():
         self.storage = Storage()
         self.client_info = client_info
         self.user_id = user_id
+        self.session = create_session(pool_size=1)
+        self.timeout = (CONNECT_TIMEOUT, READ_TIMEOUT)
 
     
     def authenticate(self, password):
@@ -57,7 +217,7 @@ class Account():
         headers = {
             'Content-Type': "application/json"
         }
-        response = requests.request("POST", url, json=payload, headers=headers)
+        response = self.session.post(url, json=payload, headers=headers, timeout=self.timeout)
         try:
             res = json.loads(response.text)
         except NameError:
@@ -65,10 +225,13 @@ class Account():
 
         if res and res["result"] and res["result"] == "success":
             # store result - overwrite any previous entries with same user ID
-            self.storage.write_user_data(self.user_id, {
+            user_data = {
                 "language" : res["user_lang_code"],
                 "token" : res["keyToken"]
-            })
+            }
+            if token_expiry(res):
+                user_data["valid_until"] = token_expiry(res)
+            self.storage.write_user_data(self.user_id, user_data)
             name = res["user_name"]["nick"] or res["user_name"]["first"]
             print("SEPIA account: Success - " + name + ", your login token has been stored. Hf :-)")
             # store default host
@@ -87,23 +250,9 @@ class Account():
             sys.exit("SEPIA account: No user data found! Please generate a token first (python -m sepia.account --id=[sepia-user-id] --host=[sepia-server-url]).")
 
         # check token
-        token = user_data["token"]
-        url = self.host_address + "/assist/authentication"
-        payload = {
-            'action' : "check",
-            'client' : self.client_info,
-            'KEY' : (self.user_id + ";" + token)
-        }
-        headers = {
-            'Content-Type': "application/json"
-        }
-        response = requests.request("POST", url, json=payload, headers=headers)
-        try:
-            res = json.loads(response.text)
-        except NameError:
-            res = None
+        valid, res = check_token(self.session, self.host_address, self.user_id, user_data["token"], self.client_info, self.timeout)
 
-        if res["result"] and res["result"] == "success":
+        if valid:
             name = res["user_name"]["nick"] or res["user_name"]["first"]
             print("SEPIA account: Success - Wb " + name + ", your login token is still valid.")
         else:
@@ -0,0 +1,23 @@
+#
+# S.E.P.I.A. HTTP connection handling
+#
+
+import requests
+from requests.adapters import HTTPAdapter
+
+CONNECT_TIMEOUT = 3.05
+READ_TIMEOUT = 10
+
+
+def create_session(pool_size=4):
+    """
+    Create a keep-alive session with its own connection pool, so consecutive calls to a SEPIA server reuse an already
+    open TCP/TLS connection instead of doing a new handshake each time.
+
+    :param pool_size: Maximum number of connections kept open per host.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
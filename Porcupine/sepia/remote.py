@@ -5,37 +5,65 @@
 
 import sys
 import os
+import time
+import threading
+import asyncio
 import requests
 import json
 import argparse
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 
 try:
     from .storage import Storage
+    from .connection import create_session, CONNECT_TIMEOUT, READ_TIMEOUT
+    from .account import TokenValidator
+    from .targets import RemoteTarget, parse_targets
 except ValueError:
     raise ValueError("Please use 'python -m sepia.remote' (from outside the 'renote.py' folder) to start the main function of this module.")
 
-try:
-    sys.path.append(os.path.join(os.path.dirname(__file__), '/../respeaker/'))
-    import respeaker.pixels
-except ImportError:
-    print("SEPIA remote: No LED supported.")
+RemoteResult = namedtuple("RemoteResult", ["target", "success", "message"])
 
-class Remote():
+
+def create_led():
+    """
+    LEDs of a ReSpeaker HAT if available, else None. Imported only here, it opens the SPI device and starts a thread.
     """
-    Class to do remote action calls to a SEPIA server.
+    try:
+        import respeaker.pixels
+    except ImportError:
+        print("SEPIA remote: No LED supported.")
+        return None
+    return respeaker.pixels.Pixels()
+
+
+class AsyncRemote():
+    """
+    Class to do remote action calls to a SEPIA server with asyncio. One action can be sent to many targets (devices,
+    channels or users) concurrently over the same pool of keep-alive connections.
+    The HTTP requests themselves are blocking 'requests' calls on a thread pool (one thread per connection): 'requests'
+    is the only HTTP client we depend on and its pooled session is shared with the connection warm-up, keepalive and
+    token checks. The event loop only waits for them, with a timeout per target.
     """
 
     def __init__(
             self,
             user_id,
             host_address = "",
-            client_info = "wakeword_tool"):
+            client_info = "wakeword_tool",
+            connect_timeout = CONNECT_TIMEOUT,
+            read_timeout = READ_TIMEOUT,
+            max_connections = 8):
         """
         Constructor.
 
         :param host_address: address of a SEPIA server, e.g. 'https://my.example.com:20726/sepia'.
-        :param user_id: ID of a user to call server remote actions (needs to be authenticated).
+        :param user_id: ID of the default user to call server remote actions (needs to be authenticated). None = no
+        default user, every action needs a target with a user ID.
         :param client_info: client name, e.g. wakeword_tool or python_app
+        :param connect_timeout: seconds to wait for a connection to the server.
+        :param read_timeout: seconds to wait for the server to answer a request.
+        :param max_connections: maximum number of requests in flight (and pooled connections).
         """
         self.storage = Storage()
         if not host_address:
@@ -51,18 +79,198 @@ class Remote():
 
         self.client_info = client_info
         self.user_id = user_id
-        self.user_data = self.storage.get_user_data(self.user_id)
-        if not "token" in self.user_data:
-            sys.exit("SEPIA remote: No user data found! Please generate a token first (python -m sepia.account --id=[sepia-user-id] --host=[sepia-server-url]).")
-        if not "language" in self.user_data:
-            self.user_data["language"] = "en"
+        self._users = {}
+        self.user_data = {}
+        if user_id:
+            self.user_data = self.storage.get_user_data(self.user_id)
+            if not "token" in self.user_data:
+                sys.exit("SEPIA remote: No user data found! Please generate a token first (python -m sepia.account --id=[sepia-user-id] --host=[sepia-server-url]).")
+            if not "language" in self.user_data:
+                self.user_data["language"] = "en"
+            self._users[user_id] = self.user_data
+        self.invalid_tokens = set()     # tokens the server rejected (see 'sepia.account.TokenValidator')
 
-        self.state = "idle"
+        self.timeout = (connect_timeout, read_timeout)
+        self.session = create_session(pool_size=max_connections)
+        self._executor = ThreadPoolExecutor(max_workers=max_connections)
+
+    def get_user_data(self, user_id):
+        """
+        Get (cached) user data of an authenticated user. Raises ValueError if there is no token for this user.
+        """
+        user_data = self._users.get(user_id)
+        if user_data is None:
+            user_data = self.storage.get_user_data(user_id)
+            if not "token" in user_data:
+                raise ValueError("No token for user '%s' (python -m sepia.account --id=%s)" % (user_id, user_id))
+            if not "language" in user_data:
+                user_data["language"] = "en"
+            self._users[user_id] = user_data
+        return user_data
+
+    def user_ids(self):
+        """
+        IDs of all users with cached user data.
+        """
+        return list(self._users)
+
+    def refresh_user_data(self, user_id):
+        """
+        Take over a new token of a user from storage (e.g. written by another process). Returns True if it changed.
+        """
+        cached = self._users.get(user_id)
+        user_data = self.storage.get_user_data(user_id)
+        if not "token" in user_data or (cached and cached.get("token") == user_data["token"]):
+            return False
+        if not "language" in user_data:
+            user_data["language"] = "en"
+        self._users[user_id] = user_data
+        if user_id == self.user_id:
+            self.user_data = user_data
+        return True
+
+    def post_action(self, action_type, action, device="", channel="", user_id=""):
+        """
+        Send remote action to server and wait for the answer (blocking). Returns a tuple (success, message).
+        """
+        user_id = user_id or self.user_id
         try:
-            self.led = respeaker.pixels.Pixels()
-        except NameError:
-            self.led = None
+            user_data = self.get_user_data(user_id)
+        except ValueError as e:
+            return (False, str(e))
+        if user_data["token"] in self.invalid_tokens:
+            # the server already rejected this token, don't spend a round-trip on it unless there is a new one
+            self.refresh_user_data(user_id)
+            user_data = self._users[user_id]
+            if user_data["token"] in self.invalid_tokens:
+                return (False, "Login token of '%s' was rejected, please renew it (python -m sepia.account --id=%s)" % (user_id, user_id))
+        url = self.host_address + "/assist/remote-action"
+        payload = {
+            'type' : action_type,
+            'action' : action,
+            'client' : self.client_info,
+            'targetChannelId' : channel,
+            'targetDeviceId' : device,
+            'KEY' : (user_id + ";" + user_data["token"])
+        }
+        headers = {
+            'Content-Type': "application/x-www-form-urlencoded"
+        }
+        try:
+            response = self.session.post(url, data=payload, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            return (False, "Request failed - " + str(e))
+        # print(response.text)    # DEBUG
+        try:
+            res = json.loads(response.text)
+        except ValueError:
+            res = None
+        return (isinstance(res, dict) and res.get("result") == "success", response.text)
+
+    async def send_action(self, action_type, action, target=None, timeout=None):
+        """
+        Send remote action to one target. Returns a RemoteResult.
+
+        :param target: RemoteTarget, default is the default user without specific device or channel.
+        :param timeout: seconds to wait for the result, overwritten by the timeout of the target.
+        """
+        target = target or RemoteTarget(self.user_id)
+        timeout = target.timeout or timeout or (self.timeout[0] + self.timeout[1])
+        if callable(action):
+            try:
+                action = action(target)
+            except ValueError as e:
+                return RemoteResult(target, False, str(e))
+        future = asyncio.get_running_loop().run_in_executor(self._executor, self.post_action,
+            action_type, action, target.device, target.channel, target.user_id)
+        try:
+            success, message = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            success, message = (False, "Timeout after %.2fs" % timeout)
+        return RemoteResult(target, success, message)
+
+    async def send_action_to_targets(self, action_type, action, targets, timeout=None):
+        """
+        Send remote action to all targets concurrently. Returns a list of RemoteResult in the order of 'targets'.
+
+        :param action: action string or function that creates the action string for a given RemoteTarget.
+        """
+        return await asyncio.gather(*[self.send_action(action_type, action, t, timeout) for t in targets])
+
+    def microphone_action(self, target):
+        """
+        Create the action string of 'trigger microphone' for a target.
+        """
+        language = target.language or self.get_user_data(target.user_id or self.user_id)["language"]
+        return json.dumps({
+            "key": "F4", 
+            "language": language
+        })  # note: we convert action to string
+
+    async def trigger_microphone(self, targets=None, timeout=None):
+        """
+        Send remote action 'trigger microphone' (on/off) to all targets concurrently.
+        """
+        return await self.send_action_to_targets("hotkey", self.microphone_action,
+            targets or [RemoteTarget(self.user_id)], timeout)
+
+    def close(self):
+        """
+        Release worker threads and pooled connections.
+        """
+        self._executor.shutdown(wait=False)
+        self.session.close()
+
+
+class Remote():
+    """
+    Class to do remote action calls to a SEPIA server (synchronous wrapper of AsyncRemote with LED feedback).
+    All actions run on one event loop that lives as long as the remote (started on a background thread on first use).
+    """
+
+    def __init__(
+            self,
+            user_id,
+            host_address = "",
+            client_info = "wakeword_tool",
+            connect_timeout = CONNECT_TIMEOUT,
+            read_timeout = READ_TIMEOUT,
+            keepalive_interval = 0):
+        """
+        Constructor.
+
+        :param host_address: address of a SEPIA server, e.g. 'https://my.example.com:20726/sepia'.
+        :param user_id: ID of a user to call server remote actions (needs to be authenticated).
+        :param client_info: client name, e.g. wakeword_tool or python_app
+        :param connect_timeout: seconds to wait for a connection to the server.
+        :param read_timeout: seconds to wait for the server to answer a request.
+        :param keepalive_interval: if set, ping the server after this many seconds without requests to keep the pooled
+        connection open (see 'start_keepalive').
+        """
+        self.async_remote = AsyncRemote(user_id, host_address, client_info, connect_timeout, read_timeout)
+        self.storage = self.async_remote.storage
+        self.host_address = self.async_remote.host_address
+        self.client_info = client_info
+        self.user_id = user_id
+
+        self.timeout = self.async_remote.timeout
+        self.session = self.async_remote.session
+        self.last_request_time = 0
+        self.last_send_time = 0.0   # 'time.perf_counter()' when the last remote action was sent
+        self.last_ack_time = 0.0    # ... and when the server(s) answered it
+        self.keepalive_interval = keepalive_interval
+        self._keepalive_stop = threading.Event()
+        self.token_validator = None
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+        self.state = "idle"
+        self.led = create_led()
         
+    @property
+    def user_data(self):
+        return self.async_remote.user_data
+
     SENDING = "sending"
     LOADING = "loading"
     IDLE = "idle"
@@ -92,47 +300,116 @@ class Remote():
         # print(self.state)
 
 
+    def warm_up(self):
+        """
+        Open the pooled connection to the server (TCP + TLS handshake) with a cheap 'ping' request, so the next
+        remote action goes out over an already open connection. Returns True if the server answered.
+        """
+        try:
+            self.session.get(self.host_address + "/assist/ping", timeout=self.timeout)
+            self.last_request_time = time.time()
+            return True
+        except requests.exceptions.RequestException as e:
+            print("SEPIA remote: Connection warm-up failed - " + str(e))
+            return False
+
+    def start_keepalive(self, interval=0):
+        """
+        Start a background thread that calls 'warm_up' whenever the connection was unused for 'interval' seconds
+        (default: 'keepalive_interval' of the constructor), so servers and proxies don't close it. After a failed
+        warm-up the next attempt waits twice as long as the last one.
+        """
+        interval = interval or self.keepalive_interval
+        if not interval:
+            return
+        self._keepalive_stop.clear()
+
+        def keepalive():
+            last_attempt = 0.0
+            retry_delay = interval
+            while not self._keepalive_stop.wait(min(interval, 1.0)):
+                now = time.time()
+                if now - self.last_request_time >= interval and now - last_attempt >= retry_delay:
+                    last_attempt = now
+                    if self.warm_up():
+                        retry_delay = interval
+                    else:
+                        # server unreachable: try less and less often (up to every 10 minutes) instead of every second
+                        retry_delay = min(retry_delay * 2, max(interval, 600))
+
+        thread = threading.Thread(target=keepalive, name="sepia-keepalive")
+        thread.daemon = True
+        thread.start()
+
+    def stop_keepalive(self):
+        """
+        Stop the keepalive thread.
+        """
+        self._keepalive_stop.set()
+
+    def start_token_validation(self, interval=3600, expiry_margin=86400):
+        """
+        Check the login token every 'interval' seconds and whenever a new one is written to storage, in the background
+        (see 'sepia.account.TokenValidator'), so a trigger is never the first request to find out the token expired.
+        A renewal is requested 'expiry_margin' seconds before the token expires.
+        """
+        self.token_validator = TokenValidator(self.async_remote, interval, expiry_margin=expiry_margin)
+        self.token_validator.start()
+
+    def stop_token_validation(self):
+        """
+        Stop the token validation thread.
+        """
+        if self.token_validator is not None:
+            self.token_validator.stop()
+
+    def _run(self, coroutine):
+        """
+        Run a coroutine of the async remote on the event loop of this remote and wait for its result.
+        """
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=self._loop.run_forever, name="sepia-remote-loop")
+                thread.daemon = True
+                thread.start()
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
     def send_action(self, action_type, action, device="", channel=""):
         """
-        Send remote action to server.
+        Send remote action to server (default user, optionally a specific device and channel). Returns True on success.
+        """
+        results = self.send_action_to_targets(action_type, action, [RemoteTarget(self.user_id, device, channel)])
+        return results[0].success
+
+    def send_action_to_targets(self, action_type, action, targets, timeout=None):
+        """
+        Send remote action to all targets concurrently and wait for all results. Returns a list of RemoteResult.
         """
-        url = self.host_address + "/assist/remote-action"
-        payload = {
-            'type' : action_type,
-            'action' : action,
-            'client' : self.client_info,
-            'targetChannelId' : channel,
-            'targetDeviceId' : device,
-            'KEY' : (self.user_id + ";" + self.user_data["token"])
-        }
-        headers = {
-            'Content-Type': "application/x-www-form-urlencoded"
-        }
         self.set_state(Remote.SENDING)
-        response = requests.request("POST", url, data=payload, headers=headers)
-        # print(response.text)    # DEBUG
-        try:
-            res = json.loads(response.text)
-        except NameError:
-            res = None
-        if res and res["result"] and res["result"] == "success":
+        self.last_send_time = time.perf_counter()
+        results = self._run(self.async_remote.send_action_to_targets(action_type, action, targets, timeout))
+        self.last_ack_time = time.perf_counter()
+        self.last_request_time = time.time()
+        for result in results:
+            if not result.success:
+                print("SEPIA remote msg (%s): %s" % ("/".join(result.target[:3]), result.message))
+        if all(result.success for result in results):
             self.set_state(Remote.RECEIVED_SUCCESS)
-            return True
         else:
-            print("SEPIA remote msg: " + response.text)
             self.set_state(Remote.RECEIVED_FAIL)
-            return False
+        return results
 
-    def trigger_microphone(self, language="", device="", channel=""):
+    def trigger_microphone(self, language="", device="", channel="", targets=None):
         """
-        Send remote action: trigger microphone (on/off)
+        Send remote action: trigger microphone (on/off). If a list of RemoteTarget is given the action is sent to all
+        of them concurrently and True is returned if all succeeded.
         """
-        action_type = "hotkey"
-        action = {
-            "key": "F4", 
-            "language": (language or self.user_data["language"])
-        }
-        return self.send_action(action_type, json.dumps(action), device, channel)  # note: we convert action to string
+        if targets:
+            results = self.send_action_to_targets("hotkey", self.async_remote.microphone_action, targets)
+            return all(result.success for result in results)
+        action = self.async_remote.microphone_action(RemoteTarget(self.user_id, language=language))
+        return self.send_action("hotkey", action, device, channel)
 
 
 if __name__ == '__main__':
@@ -140,6 +417,7 @@ if __name__ == '__main__':
     parser.add_argument('--id', help='ID of user that wants to trigger a remote action', type=str)
     parser.add_argument('--action', help="Name of a pre-defined action, e.g. 'mic'", type=str)
     parser.add_argument('--host', help="Host address of SEPIA server, e.g. 'https://my.example.com/sepia'", type=str)
+    parser.add_argument('--targets', help="Optional comma-separated list of targets '[user_id]/[device]/[channel]' to send the action to concurrently, e.g. 'uid1007/o1,uid1008/a1'", type=str)
     args = parser.parse_args()
 
     if not args.id:
@@ -153,6 +431,10 @@ if __name__ == '__main__':
         remote = Remote(host_address=args.host, user_id=args.id)
 
     if args.action == "mic":
-        remote.trigger_microphone()
+        if args.targets:
+            for result in remote.send_action_to_targets("hotkey", remote.async_remote.microphone_action, parse_targets(args.targets, args.id)):
+                print("%s: %s" % ("/".join(result.target[:3]), "success" if result.success else "failed"))
+        else:
+            remote.trigger_microphone()
     else:
         print("Action '" + args.action + "' not supported (yet?!)")
\ No newline at end of file
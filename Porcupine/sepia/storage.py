@@ -4,12 +4,27 @@
 #
 
 import pickle
+import os
+import sys
 import os.path
 import argparse
+import copy
+import stat
+import tempfile
+import time
+from contextlib import contextmanager
+try:
+    import fcntl
+except ImportError:
+    fcntl = None    # Windows: no advisory locks, writes are still atomic
 
 class Storage():
     """
     Class to store and load SEPIA related data (like localStorage in Javascript).
+    The file is shared by several processes (e.g. wake-word and button tool). Its content is cached in memory and only
+    loaded again when the file changed (modification time, size or inode). Writes take an advisory lock on
+    '<storage_path>.lock', apply the change to the latest content and replace the file atomically (temporary file plus
+    rename), so readers never see a half-written file and concurrent writers don't lose each other's changes.
     """
 
     def __init__(
@@ -21,55 +36,131 @@ class Storage():
         :param storage_path: path to the file that is used to store data.
         """
         self.storage_path = storage_path
-        
+        self.lock_path = storage_path + ".lock"
+        self.data = {}
+        self.loads = 0      # number of times the file was actually read
+        self._file_key = None
+
         # create file if not exists
         if not os.path.isfile(self.storage_path):
-            with open(self.storage_path, 'wb') as handle:
-                pickle.dump({}, handle)
+            with self._locked():
+                if not os.path.isfile(self.storage_path):
+                    self._replace({})
 
-        self.data = {}
+    def _stat_key(self):
+        try:
+            info = os.stat(self.storage_path)
+        except OSError:
+            return None
+        return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+    @staticmethod
+    def _stat_key_of(handle):
+        info = os.fstat(handle.fileno())
+        return (info.st_mtime_ns, info.st_size, info.st_ino)
+
+    def _load(self):
+        # reload the file if it changed since we read or wrote it last
+        key = self._stat_key()
+        if key is not None and key == self._file_key:
+            return self.data
+        with open(self.storage_path, 'rb') as handle:
+            data = pickle.loads(handle.read())
+            key = self._stat_key_of(handle)
+        self.data = data or {}
+        self._file_key = key
+        self.loads += 1
+        return self.data
+
+    def _file_mode(self):
+        # permissions of the current file, a new file gets what 'open' would have given it (0666 minus umask)
+        try:
+            return stat.S_IMODE(os.stat(self.storage_path).st_mode)
+        except OSError:
+            umask = os.umask(0)
+            os.umask(umask)
+            return 0o666 & ~umask
+
+    def _replace(self, data):
+        # write to a temporary file in the same folder and rename it over the old one
+        folder = os.path.dirname(os.path.abspath(self.storage_path))
+        mode = self._file_mode()
+        fd, temp_path = tempfile.mkstemp(prefix=".sepia_localstorage.", dir=folder)
+        try:
+            # 'mkstemp' creates the file owner-only, keep the permissions of the shared file
+            os.chmod(temp_path, mode)
+            with os.fdopen(fd, 'wb') as handle:
+                pickle.dump(data, handle)
+                handle.flush()
+                os.fsync(handle.fileno())
+                key = self._stat_key_of(handle)
+            os.replace(temp_path, self.storage_path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+        self.data = data
+        self._file_key = key
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+        # read-only is enough for 'flock', so a lock file created by another user (same mode as the storage) works too
+        lock_fd = os.open(self.lock_path, os.O_RDONLY | os.O_CREAT, self._file_mode())
+        try:
+            fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_fd, fcntl.LOCK_UN)
+        finally:
+            os.close(lock_fd)
 
     def read(self, index):
         """
-        Read data from storage.
+        Read data from storage. Returns a copy, changing it has no effect until it is written back.
         """
-        with open(self.storage_path, 'rb') as handle:
-            self.data = pickle.loads(handle.read())
-            if self.data and index in self.data:
-                return self.data[index]
-            elif not self.data:
-                self.data = {}
-                return {}
-            else:
-                return {}
+        data = self._load()
+        if index in data:
+            return copy.deepcopy(data[index])
+        return {}
+
+    def update(self, index, func):
+        """
+        Replace the data at 'index' with 'func(current data)' in one locked read-modify-write, so changes of other
+        processes made in the meantime are not overwritten. Returns the new data.
+        """
+        with self._locked():
+            data = dict(self._load())
+            data[index] = func(copy.deepcopy(data[index]) if index in data else {})
+            self._replace(data)
+            return data[index]
 
     def write(self, index, data):
         """
         Write data to storage.
         """
-        self.read(index)   # refresh self.data (aka full_data)
-        self.data[index] = data
-            
-        with open(self.storage_path, 'wb') as handle:
-            pickle.dump(self.data, handle)
+        self.update(index, lambda _: data)
 
     def get_user_data(self, user_id):
         """
         Get user data for user ID from index 'users'.
         """
-        users = self.read("users")
+        users = self._load().get("users") or {}
         if not user_id in users:
             return {}
         else:
-            return users[user_id]
+            return dict(users[user_id])     # flat dict of strings, a shallow copy is enough
     
     def write_user_data(self, user_id, user_data):
         """
         Write user data for user ID to index 'users'.
         """
-        users = self.read("users")
-        users[user_id] = user_data
-        self.write('users', users)
+        def set_user(users):
+            users[user_id] = user_data
+            return users
+        self.update("users", set_user)
 
     def write_default_host(self, host_address):
         """
@@ -84,15 +175,62 @@ class Storage():
         return self.read("host")
 
 
+def _benchmark_worker(storage_path, worker_id, seconds, write_every, results):
+    storage = Storage(storage_path)
+    reads = writes = 0
+    end = time.time() + seconds
+    while time.time() < end:
+        storage.get_user_data("bench_user")
+        reads += 1
+        if reads % write_every == 0:
+            storage.update("bench", lambda counters: dict(counters, **{str(worker_id): counters.get(str(worker_id), 0) + 1}))
+            writes += 1
+    results.put((worker_id, reads, writes, storage.loads))
+
+
+def benchmark(storage_path, processes=4, seconds=3.0, write_every=1000):
+    """
+    Runs 'processes' processes that look up user data as fast as they can and update a counter of their own every
+    'write_every' reads. Prints reads and writes per second and checks that no update was lost.
+    """
+    import multiprocessing
+
+    storage = Storage(storage_path)
+    storage.write("bench", {})
+    storage.write_user_data("bench_user", {"token": "x" * 64, "language": "en"})
+    results = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_benchmark_worker, args=(storage_path, i, seconds, write_every, results))
+        for i in range(processes)]
+    for worker in workers:
+        worker.start()
+    totals = [results.get() for _ in workers]
+    for worker in workers:
+        worker.join()
+
+    reads = sum(x[1] for x in totals)
+    writes = sum(x[2] for x in totals)
+    counters = storage.read("bench")
+    lost = sum(x[2] - counters.get(str(x[0]), 0) for x in totals)
+    print("%d processes: %.0f reads/s, %.0f writes/s, file loaded %d times, %d lost updates" % (
+        processes, reads / seconds, writes / seconds, sum(x[3] for x in totals), lost))
+    return lost == 0
+
+
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument('--f', help="File that is used as storage (path and name)", type=str, default="sepia_localstorage")
-    parser.add_argument('--o', help="Operation: 'read' or 'write'", type=str, default="read")
+    parser.add_argument('--o', help="Operation: 'read', 'write' or 'benchmark' (concurrent processes on a copy)", type=str, default="read")
     parser.add_argument('--i', help="User-defined index to read from or write to, e.g. 'users'", type=str)
     parser.add_argument('--k', help="If you specify a key the data will be written to or read from this field inside the index", type=str)
     parser.add_argument('--d', help="Data to write. String will be evaluated", type=str)
+    parser.add_argument('--processes', help="Operation 'benchmark': number of concurrent processes", type=int, default=4)
+    parser.add_argument('--seconds', help="Operation 'benchmark': duration", type=float, default=3.0)
     args = parser.parse_args()
 
+    if args.o == "benchmark":
+        # uses its own file, never the real storage
+        sys.exit(0 if benchmark(args.f + ".benchmark", args.processes, args.seconds) else 1)
+
     if not args.i:
         raise ValueError('Missing index')
 
@@ -0,0 +1,31 @@
+#
+# S.E.P.I.A. remote action targets
+#
+
+from collections import namedtuple
+
+
+class RemoteTarget(namedtuple("RemoteTarget", ["user_id", "device", "channel", "language", "timeout"])):
+    """
+    Receiver of a remote action: a user and optionally one device/channel of this user.
+    Empty fields fall back to the defaults of the remote (user ID, user language, timeout of the call).
+    """
+    __slots__ = ()
+
+    def __new__(cls, user_id="", device="", channel="", language="", timeout=None):
+        return super(RemoteTarget, cls).__new__(cls, user_id, device, channel, language, timeout)
+
+
+def parse_targets(targets_string, user_id=""):
+    """
+    Parse a comma-separated list of targets in the form '[user_id]/[device]/[channel]', e.g. 'uid1007/o1,uid1008/a1'.
+    Missing user IDs are replaced by 'user_id'.
+    """
+    targets = []
+    for entry in targets_string.split(","):
+        parts = [x.strip() for x in entry.split("/")]
+        if not any(parts):
+            continue
+        parts += [""] * (3 - len(parts))
+        targets.append(RemoteTarget(user_id=(parts[0] or user_id), device=parts[1], channel=parts[2]))
+    return targets
@@ -0,0 +1,84 @@
+import unittest
+
+from sepia import account
+from sepia.account import TokenValidator
+
+
+class FakeRemote():
+    """The parts of 'AsyncRemote' the validator uses, with one user."""
+
+    session = None
+    host_address = "http://localhost"
+    client_info = "test"
+    timeout = (1, 1)
+
+    def __init__(self, user_data):
+        self.user_data = user_data
+        self.invalid_tokens = set()
+
+    def get_user_data(self, user_id):
+        return self.user_data
+
+    def user_ids(self):
+        return ["u1"]
+
+    def refresh_user_data(self, user_id):
+        return False
+
+
+class TokenValidatorTestCase(unittest.TestCase):
+    def setUp(self):
+        self.now = 1000000.0
+        self.answers = []
+        self.checked = []
+        self._check_token = account.check_token
+
+        def check_token(session, host_address, user_id, token, client_info, timeout):
+            self.checked.append((self.now, token))
+            return self.answers.pop(0)
+
+        account.check_token = check_token
+
+    def tearDown(self):
+        account.check_token = self._check_token
+
+    def test_renewal_is_requested_once_before_the_stored_expiry(self):
+        expiring = []
+        remote = FakeRemote({"token": "a", "valid_until": self.now + 3 * 3600})
+        validator = TokenValidator(remote, expiry_margin=3600, on_expiring=lambda *args: expiring.append(args),
+            clock=lambda: self.now)
+
+        self.assertEqual(validator.check_expiry("u1"), 3 * 3600)
+        self.assertEqual(expiring, [])
+        self.now += 2.5 * 3600
+        validator.check_expiry("u1")
+        self.now += 60
+        validator.check_expiry("u1")
+        self.assertEqual(expiring, [("u1", 0.5 * 3600)])
+        self.assertEqual(self.checked, [])
+
+    def test_expired_token_is_checked_before_the_next_action(self):
+        remote = FakeRemote({"token": "a"})
+        invalid = []
+        validator = TokenValidator(remote, expiry_margin=60, on_invalid=invalid.append, clock=lambda: self.now)
+
+        # unknown expiry until the server tells us in the answer of a check
+        self.assertIsNone(validator.check_expiry("u1"))
+        self.answers.append((True, {"result": "success", "validUntil": (self.now + 600) * 1000}))
+        self.assertTrue(validator.check("u1"))
+        self.assertEqual(validator.check_expiry("u1"), 600)
+
+        self.now += 601
+        self.answers.append((False, {"result": "fail"}))
+        validator.check_expiry("u1")
+        self.assertEqual(self.checked, [(self.now - 601, "a"), (self.now, "a")])
+        self.assertEqual(invalid, ["u1"])
+        self.assertIn("a", remote.invalid_tokens)
+
+        # checked once, not on every poll
+        validator.check_expiry("u1")
+        self.assertEqual(len(self.checked), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
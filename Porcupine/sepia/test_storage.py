@@ -0,0 +1,50 @@
+import os
+import stat
+import tempfile
+import unittest
+
+from sepia.storage import Storage
+
+
+class StorageTestCase(unittest.TestCase):
+    def test_cache_and_changes_of_other_instances(self):
+        path = os.path.join(tempfile.mkdtemp(), 'sepia_localstorage')
+        first = Storage(path)
+        second = Storage(path)    # e.g. another process
+
+        first.write_user_data('u1', {'token': 'a'})
+        self.assertEqual(second.get_user_data('u1'), {'token': 'a'})
+        loads = second.loads
+        for _ in range(10):
+            second.get_user_data('u1')
+        self.assertEqual(second.loads, loads)
+
+        # both instances update the same index, neither change is lost
+        second.write_user_data('u2', {'token': 'b'})
+        first.write_user_data('u1', {'token': 'c'})
+        self.assertEqual(second.read('users'), {'u1': {'token': 'c'}, 'u2': {'token': 'b'}})
+
+        # returned data is a copy
+        second.get_user_data('u1')['token'] = 'changed'
+        self.assertEqual(second.get_user_data('u1'), {'token': 'c'})
+        self.assertEqual([x for x in os.listdir(os.path.dirname(path)) if not x.startswith('sepia_localstorage')], [])
+
+    @unittest.skipIf(os.name != 'posix', "file modes and umask are POSIX only")
+    def test_writes_keep_the_file_mode(self):
+        path = os.path.join(tempfile.mkdtemp(), 'sepia_localstorage')
+        umask = os.umask(0o022)
+        try:
+            storage = Storage(path)
+        finally:
+            os.umask(umask)
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o644)
+
+        # e.g. shared with the group of another daemon
+        os.chmod(path, 0o664)
+        storage.write_user_data('u1', {'token': 'a'})
+        self.assertEqual(stat.S_IMODE(os.stat(path).st_mode), 0o664)
+        self.assertEqual(stat.S_IMODE(os.stat(path + '.lock').st_mode) & 0o444, 0o444)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,159 @@
+#
+# S.E.P.I.A. two-stage wake-word detection
+#
+
+import math
+import time
+
+import numpy as np
+
+from .keywords import keyword_name
+
+
+class CascadeDetector():
+    """
+    Two-stage wake-word detector: a cheap 'gate' Porcupine instance (e.g. tiny model) runs on every frame and only
+    when it fires the expensive 'confirm' instance (e.g. full model) is run over the last audio from a history buffer.
+    A detection is reported only if both stages agree. Works as a drop-in replacement of a Porcupine instance.
+    The gate also processes the frames of the follow-up (see below), so its state is never stale.
+
+    The confirm instance keeps its state between gate events and Porcupine cannot reset it. Frames it has already
+    processed (e.g. during the follow-up of the last gate event) are therefore never replayed again, after a gap the
+    whole history is replayed so the stale state of the last event is pushed out before the keyword can end. The replay
+    runs synchronously on the caller's thread, 'replay_seconds_max' is the longest stall it caused (about 50 ms for the
+    default 47 frames of the full model on a desktop CPU), so the frame queue has to hold a few frames more.
+    """
+
+    def __init__(self, gate, confirm, num_keywords, history_seconds=1.5, follow_up_seconds=0.3):
+        """
+        Constructor.
+
+        :param gate: Porcupine instance that processes every frame.
+        :param confirm: Porcupine instance with the same keywords (in the same order, e.g. the tiny and full versions of
+        the same keyword files) that confirms detections.
+        :param num_keywords: Number of keywords of both instances.
+        :param history_seconds: Seconds of audio before a gate detection that the confirm stage gets to see.
+        :param follow_up_seconds: If the confirm stage did not fire on the history, it keeps processing live frames for
+        this many seconds before the detection is rejected.
+        """
+        if gate.frame_length != confirm.frame_length or gate.sample_rate != confirm.sample_rate:
+            raise ValueError("Gate and confirm detector need the same frame length and sample rate")
+        # a different order would report the keyword index of the gate for a detection of another keyword
+        gate_keywords = [keyword_name(x) for x in gate.keyword_file_paths]
+        confirm_keywords = [keyword_name(x) for x in confirm.keyword_file_paths]
+        if gate_keywords != confirm_keywords or len(confirm_keywords) != num_keywords:
+            raise ValueError("Gate and confirm detector need the same %d keywords in the same order, got %s and %s" % (
+                num_keywords, ", ".join(gate_keywords), ", ".join(confirm_keywords)))
+        self._gate = gate
+        self._confirm = confirm
+        self._single_keyword = num_keywords == 1
+
+        frames_per_second = self.sample_rate / float(self.frame_length)
+        self._history = np.zeros((max(1, int(math.ceil(history_seconds * frames_per_second))), self.frame_length),
+            dtype=np.int16)
+        self._history_index = 0
+        self._history_count = 0
+        self._follow_up_frames = int(round(follow_up_seconds * frames_per_second))
+        self._follow_up_left = 0
+        self._confirm_until = 0         # value of 'frames' at the last frame the confirm stage processed
+
+        self.frames = 0                 # frames processed by the gate
+        self.gate_detections = 0        # times the gate fired
+        self.confirmed = 0              # detections confirmed by the second stage
+        self.confirm_frames = 0         # frames processed by the second stage
+        self.replay_seconds = 0.0       # time spent replaying the history
+        self.replay_seconds_max = 0.0   # longest single replay
+
+    @property
+    def sample_rate(self):
+        """Audio sample rate accepted by Porcupine library."""
+
+        return self._gate.sample_rate
+
+    @property
+    def frame_length(self):
+        """Number of audio samples per frame expected by C library."""
+
+        return self._gate.frame_length
+
+    @property
+    def keyword_file_paths(self):
+        """Keyword files of the confirm stage in the order of the keyword indices."""
+
+        return self._confirm.keyword_file_paths
+
+    @property
+    def confirm_ratio(self):
+        """Fraction of frames that were processed by the second stage."""
+
+        return self.confirm_frames / float(self.frames) if self.frames else 0.0
+
+    def process_buffer(self, pcm):
+        """
+        Same as 'Porcupine.process_buffer', 'pcm' is a frame of 'frame_length' int16 samples.
+        """
+        frame = self._history[self._history_index]
+        np.copyto(frame, np.frombuffer(pcm, dtype=np.int16, count=self.frame_length))
+        self._history_index = (self._history_index + 1) % len(self._history)
+        if self._history_count < len(self._history):
+            self._history_count += 1
+        self.frames += 1
+
+        if self._follow_up_left:
+            # the gate only keeps up with the audio here, the current gate event is still being decided
+            self._gate.process_buffer(frame)
+            self._follow_up_left -= 1
+            self.confirm_frames += 1
+            self._confirm_until = self.frames
+            result = self._keyword_index(self._confirm.process_buffer(frame))
+            if result >= 0:
+                self._follow_up_left = 0
+                self.confirmed += 1
+            return self._result(result)
+
+        if self._keyword_index(self._gate.process_buffer(frame)) < 0:
+            return self._result(-1)
+
+        # gate fired: run the second stage over the history it has not seen yet, oldest frame first
+        self.gate_detections += 1
+        result = -1
+        count = min(self._history_count, self.frames - self._confirm_until)
+        start = (self._history_index - count) % len(self._history)
+        replay_start = time.perf_counter()
+        for i in range(count):
+            confirm_result = self._keyword_index(self._confirm.process_buffer(self._history[(start + i) % len(self._history)]))
+            if result < 0:
+                result = confirm_result
+        replay_seconds = time.perf_counter() - replay_start
+        self.replay_seconds += replay_seconds
+        self.replay_seconds_max = max(self.replay_seconds_max, replay_seconds)
+        self.confirm_frames += count
+        self._confirm_until = self.frames
+        if result >= 0:
+            self.confirmed += 1
+        else:
+            self._follow_up_left = self._follow_up_frames
+        return self._result(result)
+
+    def stats(self):
+        """Summary of how often the second stage was needed."""
+
+        return ("Cascade: gate fired %d times, confirmed %d, second stage ran on %d of %d frames (%.2f%%), "
+            "longest replay %.1f ms") % (self.gate_detections, self.confirmed, self.confirm_frames, self.frames,
+            100 * self.confirm_ratio, 1000 * self.replay_seconds_max)
+
+    def delete(self):
+        """Releases both Porcupine instances."""
+
+        self._gate.delete()
+        self._confirm.delete()
+
+    def _keyword_index(self, result):
+        if self._single_keyword:
+            return 0 if result else -1
+        return result
+
+    def _result(self, keyword_index):
+        if self._single_keyword:
+            return keyword_index == 0
+        return keyword_index
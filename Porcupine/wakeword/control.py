@@ -0,0 +1,118 @@
+#
+# S.E.P.I.A. wake-word control socket
+#
+
+import argparse
+import json
+import os
+import socket
+import threading
+
+from .sources import remove_stale_socket
+
+DEFAULT_SOCKET_PATH = '/tmp/sepia_wakeword_control.sock'
+
+
+class ControlServer():
+    """
+    Local control socket of a running wake-word tool. Clients send one JSON command per line and get one JSON line back
+    (see 'send_command'). Commands are handled one after another on the server thread by 'handler(command)', which
+    returns the answer as a dict.
+    """
+
+    def __init__(self, socket_path, handler):
+        """
+        Constructor.
+
+        :param socket_path: File system path of the UNIX socket.
+        :param handler: Function 'handler(command)' for each command (dict), returns the answer (dict).
+        """
+        self.socket_path = socket_path
+        self.handler = handler
+        self._server = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        remove_stale_socket(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(4)
+        self._server.settimeout(0.5)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='sepia-control')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(2)
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _run(self):
+        while self._running:
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            try:
+                connection.settimeout(10)
+                with connection.makefile('rwb') as stream:
+                    for line in stream:
+                        if not line.strip():
+                            continue
+                        try:
+                            answer = self.handler(json.loads(line.decode('utf-8')))
+                        except Exception as e:
+                            answer = {'result': 'fail', 'error': str(e)}
+                        stream.write((json.dumps(answer) + '\n').encode('utf-8'))
+                        stream.flush()
+            except (socket.error, ValueError) as e:
+                print("Control: connection failed - %s" % e)
+            finally:
+                connection.close()
+
+
+def send_command(command, socket_path=DEFAULT_SOCKET_PATH, timeout=60):
+    """
+    Sends one command (dict) to a running wake-word tool and returns its answer (dict).
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.settimeout(timeout)
+    try:
+        client.connect(socket_path)
+        with client.makefile('rwb') as stream:
+            stream.write((json.dumps(command) + '\n').encode('utf-8'))
+            stream.flush()
+            return json.loads(stream.readline().decode('utf-8'))
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Change keywords and sensitivities of a running porcupine_sepia_remote.py (see --control_socket).')
+    parser.add_argument('--socket_path', help='Control socket of the wake-word tool.', type=str, default=DEFAULT_SOCKET_PATH)
+    parser.add_argument('--keywords', help="Comma-separated keyword names, e.g. 'hey_sepia,alexa'.", type=str, default=None)
+    parser.add_argument('--tiny', help='Use the tiny versions of --keywords.', action='store_true')
+    parser.add_argument('--keyword_file_paths', help='Comma-separated paths to keyword files (instead of --keywords).', type=str, default=None)
+    parser.add_argument('--sensitivity', help='Sensitivity [0, 1] of all keywords, or comma-separated one per keyword.', type=str, default=None)
+    parser.add_argument('--status', help='Only show the current keywords and sensitivities.', action='store_true')
+    args = parser.parse_args()
+
+    if args.status:
+        command = {'action': 'status'}
+    else:
+        command = {'action': 'reconfigure'}
+        if args.keywords:
+            command['keywords'] = [x.strip() for x in args.keywords.split(',')]
+            command['tiny'] = args.tiny
+        elif args.keyword_file_paths:
+            command['keyword_file_paths'] = [x.strip() for x in args.keyword_file_paths.split(',')]
+        if args.sensitivity:
+            command['sensitivities'] = [float(x) for x in args.sensitivity.split(',')]
+    print(json.dumps(send_command(command, args.socket_path), indent=2))
@@ -0,0 +1,72 @@
+#
+# S.E.P.I.A. wake-word action dispatcher
+#
+
+import threading
+try:
+    import queue as Queue
+except ImportError:
+    import Queue as Queue
+
+
+class ActionDispatcher():
+    """
+    Runs remote actions and LED state changes on a worker thread, one after another in submission order.
+    'submit' never blocks, so the audio and detector threads never wait for the network.
+    """
+
+    def __init__(self, max_pending=16, name="sepia-dispatcher"):
+        """
+        Constructor.
+
+        :param max_pending: Maximum number of actions waiting for the worker. Further actions are dropped and counted.
+        :param name: Name of the worker thread.
+        """
+        self.dropped = 0
+        self.failed = 0
+        self.max_pending = max_pending
+        # unbounded, 'submit' enforces 'max_pending' itself so 'submit_always' can go beyond it
+        self._queue = Queue.Queue()
+        self._thread = threading.Thread(target=self._run, name=name)
+        self._thread.daemon = True
+        self._thread.start()
+
+    @property
+    def pending(self):
+        """Number of actions waiting for the worker."""
+
+        return self._queue.qsize()
+
+    def submit(self, func, *args):
+        """
+        Queues 'func(*args)' for the worker thread. Returns False if the action had to be dropped.
+        """
+        if self._queue.qsize() >= self.max_pending:
+            self.dropped += 1
+            return False
+        self._queue.put_nowait((func, args))
+        return True
+
+    def submit_always(self, func, *args):
+        """
+        Queues 'func(*args)' even if 'max_pending' actions are waiting, in order with the others. For the few actions
+        that must not get lost (e.g. LEDs back to idle), not for anything a detection can submit over and over.
+        """
+        self._queue.put_nowait((func, args))
+
+    def stop(self, timeout=None):
+        """Lets the worker finish all queued actions and waits for it to end."""
+
+        self._queue.put((None, None))
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            func, args = self._queue.get()
+            if func is None:
+                break
+            try:
+                func(*args)
+            except Exception as e:
+                self.failed += 1
+                print("Dispatcher: action failed - %s" % e)
@@ -0,0 +1,181 @@
+#
+# S.E.P.I.A. wake-word audio frame handling
+#
+
+import threading
+import time
+
+import numpy as np
+
+
+class FrameRingBuffer():
+    """
+    Splits audio buffers of arbitrary size into consecutive detector frames of fixed length.
+    Samples that do not fill a complete frame are kept in a preallocated int16 buffer and prepended to the next push,
+    so no audio is dropped no matter which 'frames_per_buffer' the audio stream uses.
+    """
+
+    def __init__(self, frame_length):
+        """
+        Constructor.
+
+        :param frame_length: Number of samples per detector frame (e.g. 'Porcupine.frame_length').
+        """
+        self.frame_length = frame_length
+        self._carry = np.zeros(frame_length, dtype=np.int16)
+        self._carry_length = 0
+
+    @property
+    def pending(self):
+        """Number of samples waiting for the next push to complete a frame."""
+
+        return self._carry_length
+
+    def push(self, in_data):
+        """
+        Adds a buffer of 16-bit mono samples and yields every frame that is complete afterwards.
+        Frames are int16 numpy views into 'in_data' or the internal buffer. They are only valid until the next frame is
+        requested, so process them right away (e.g. with 'Porcupine.process_buffer').
+
+        :param in_data: Object supporting the buffer protocol (e.g. bytes from PyAudio) or an int16 numpy array.
+        """
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        available = len(samples)
+        offset = 0
+
+        if self._carry_length:
+            needed = self.frame_length - self._carry_length
+            if available < needed:
+                self._carry[self._carry_length:self._carry_length + available] = samples
+                self._carry_length += available
+                return
+            self._carry[self._carry_length:] = samples[:needed]
+            self._carry_length = 0
+            offset = needed
+            yield self._carry
+
+        while available - offset >= self.frame_length:
+            yield samples[offset:offset + self.frame_length]
+            offset += self.frame_length
+
+        remaining = available - offset
+        if remaining:
+            self._carry[:remaining] = samples[offset:]
+            self._carry_length = remaining
+
+    def reset(self):
+        """Discards samples of an incomplete frame."""
+
+        self._carry_length = 0
+
+
+class FrameQueue():
+    """
+    Bounded single-producer/single-consumer queue of raw audio buffers with preallocated slots.
+    The producer (e.g. a PortAudio stream callback) only copies its buffer into a free slot and never blocks. If all slots
+    are taken the buffer is dropped and counted, so a slow consumer can't stall audio capture.
+    There is no lock: the producer only advances the 'written' counter and the consumer only the 'read' counter (plain
+    int assignments, atomic in CPython), a slot is published by advancing 'written' after it was filled. The consumer
+    is woken up with an event that the producer only sets if it is not set already.
+    """
+
+    def __init__(self, capacity, slot_size):
+        """
+        Constructor.
+
+        :param capacity: Maximum number of buffers waiting in the queue.
+        :param slot_size: Maximum size of a buffer in bytes, e.g. 'frames_per_buffer * 2' for 16-bit mono audio.
+        """
+        self.capacity = capacity
+        self.slot_size = slot_size
+        self._slots = [bytearray(slot_size) for _ in range(capacity)]
+        self._views = [memoryview(slot) for slot in self._slots]
+        self._lengths = [0] * capacity
+        self._timestamps = [0.0] * capacity
+        self._enqueue_times = [0.0] * capacity
+        self._written = 0   # buffers put so far, only changed by the producer
+        self._read = 0      # buffers released so far, only changed by the consumer
+        self._data_ready = threading.Event()
+        self._space_ready = threading.Event()
+        self._closed = False
+
+        self.received = 0
+        self.dropped = 0
+        self.max_depth = 0
+
+    @property
+    def depth(self):
+        """Number of buffers currently waiting for the consumer."""
+
+        return self._written - self._read
+
+    def put(self, data, timestamp=0.0, block=False):
+        """
+        Copies 'data' into a free slot. Returns False if the buffer had to be dropped.
+
+        :param timestamp: Optional time (e.g. capture time) stored with the buffer, see 'timestamp'.
+        :param block: Wait for a free slot instead of dropping the buffer. Only for sources that can be slowed down
+        (e.g. file replay), never from a live audio callback.
+        """
+        self.received += 1
+        size = len(data)
+        while block and self._written - self._read >= self.capacity and not self._closed:
+            self._space_ready.clear()
+            if self._written - self._read >= self.capacity and not self._closed:
+                self._space_ready.wait(0.1)
+        depth = self._written - self._read
+        if depth >= self.capacity or size > self.slot_size:
+            self.dropped += 1
+            return False
+        tail = self._written % self.capacity
+        self._views[tail][:size] = data
+        self._lengths[tail] = size
+        self._timestamps[tail] = timestamp
+        self._enqueue_times[tail] = time.perf_counter()
+        self._written += 1
+        if depth + 1 > self.max_depth:
+            self.max_depth = depth + 1
+        if not self._data_ready.is_set():
+            self._data_ready.set()
+        return True
+
+    def get(self, timeout=None):
+        """
+        Waits for the next buffer and returns a memoryview of its slot or None on timeout or if the queue was closed.
+        The slot stays reserved until 'release' is called, so handle one buffer at a time.
+        """
+        if self._written == self._read and not self._closed:
+            self._data_ready.clear()
+            # checked again after clearing, a buffer put in between would have been missed
+            if self._written == self._read and not self._closed:
+                self._data_ready.wait(timeout)
+        if self._written == self._read:
+            return None
+        head = self._read % self.capacity
+        return self._views[head][:self._lengths[head]]
+
+    @property
+    def timestamp(self):
+        """Timestamp given to 'put' for the buffer returned by the last 'get'."""
+
+        return self._timestamps[self._read % self.capacity]
+
+    @property
+    def enqueue_time(self):
+        """'time.perf_counter()' time at which the buffer returned by the last 'get' was queued."""
+
+        return self._enqueue_times[self._read % self.capacity]
+
+    def release(self):
+        """Frees the slot of the buffer returned by the last 'get'."""
+
+        self._read += 1
+        if not self._space_ready.is_set():
+            self._space_ready.set()
+
+    def close(self):
+        """Wakes up a waiting consumer (and producer). Following calls to 'get' return None once the queue is empty."""
+
+        self._closed = True
+        self._data_ready.set()
+        self._space_ready.set()
@@ -0,0 +1,186 @@
+#
+# S.E.P.I.A. wake-word audio front end (channel down-mix and resampling)
+#
+
+import argparse
+import time
+from fractions import Fraction
+
+import numpy as np
+
+
+def design_filter(up, down, half_taps=10, beta=5.0):
+    """
+    Kaiser-windowed sinc low-pass for resampling by up/down (cut-off at the lower of both Nyquist frequencies, gain
+    'up' to make up for the zeros that upsampling inserts). The filter has about 2 * half_taps * max(up, down) taps.
+    """
+    cutoff = 1.0 / max(up, down)
+    half_length = half_taps * max(up, down)
+    n = np.arange(-half_length, half_length + 1)
+    return (up * cutoff * np.sinc(cutoff * n) * np.kaiser(len(n), beta)).astype(np.float32)
+
+
+class AudioFrontEnd():
+    """
+    Converts buffers from an audio device opened at its native format (e.g. 48 kHz on 2 channels) into mono 16-bit PCM
+    at the rate of the detector, instead of letting an ALSA 'plug' device convert them.
+
+    Channels are selected or averaged, then resampled with a polyphase FIR filter: the filter is split into 'up' phases
+    and each output sample only computes the taps of its phase, so no zeros are inserted and no samples computed that
+    are thrown away. The input indices and coefficients of one period of the pattern ('up' outputs for 'down' inputs)
+    are tabulated once for the largest expected buffer, so each buffer is one gather, one multiply and one sum into
+    preallocated arrays.
+    """
+
+    def __init__(self, input_rate, input_channels=1, output_rate=16000, channel=-1, max_input_frames=8192,
+            half_taps=10):
+        """
+        Constructor.
+
+        :param input_rate: Sample rate of the device.
+        :param input_channels: Number of interleaved channels of the device.
+        :param output_rate: Sample rate of the detector.
+        :param channel: Channel to use, -1 = average of all channels.
+        :param max_input_frames: Largest buffer (samples per channel) passed to 'process'.
+        :param half_taps: Filter length in input samples on each side (quality vs. CPU, see 'design_filter').
+        """
+        if channel >= input_channels:
+            raise ValueError("Channel %d not available, the device has %d channel(s)" % (channel, input_channels))
+        self.input_rate = input_rate
+        self.input_channels = input_channels
+        self.output_rate = output_rate
+        self.channel = channel
+        self.max_input_frames = max_input_frames
+        ratio = Fraction(output_rate, input_rate)
+        self.up = ratio.numerator
+        self.down = ratio.denominator
+        self.seconds = 0.0  # processing time, see 'cpu_load'
+        self.samples = 0    # input samples per channel
+        self._carry = b''   # bytes of an incomplete frame (not all channels) at the end of the last buffer
+        # one frame more than 'max_input_frames', the carried part may complete it
+        max_input_frames += 1
+        self._max_frames = max_input_frames
+
+        self._mono = np.zeros(max_input_frames, dtype=np.float32)
+        self._output = np.zeros((max_input_frames // self.down + 2) * self.up, dtype=np.int16)
+        if self.up == self.down:
+            return
+
+        taps = design_filter(self.up, self.down, half_taps)
+        self.taps_per_phase = -(-len(taps) // self.up)
+        taps = np.concatenate([taps, np.zeros(self.taps_per_phase * self.up - len(taps), dtype=np.float32)])
+        self._history = self.taps_per_phase - 1
+
+        # output r of a period reads input r * down // up - k (k = 0 .. taps_per_phase - 1) of that period with
+        # coefficient taps[r * down % up + k * up]
+        r = np.arange(self.up)
+        k = np.arange(self.taps_per_phase)
+        period_index = (r * self.down // self.up)[:, None] - k[None, :]
+        period_coefficients = taps[(r * self.down % self.up)[:, None] + k[None, :] * self.up]
+
+        periods = max_input_frames // self.down + 2
+        outputs = periods * self.up
+        self._index = (period_index[None, :, :] + self._history +
+            (np.arange(periods) * self.down)[:, None, None]).reshape(outputs, self.taps_per_phase).astype(np.intp)
+        self._coefficients = np.tile(period_coefficients, (periods, 1))
+        self._gathered = np.zeros((outputs, self.taps_per_phase), dtype=np.float32)
+        self._resampled = np.zeros(outputs, dtype=np.float32)
+        # two input buffers (history + new samples), the rest of one continues in the other: no overlapping copies
+        size = self._history + max_input_frames + self.down
+        self._inputs = [np.zeros(size, dtype=np.float32), np.zeros(size, dtype=np.float32)]
+        self._active = 0
+        self._fill = self._history
+
+    @property
+    def latency(self):
+        """Delay of the filter in seconds."""
+
+        return 0.0 if self.up == self.down else (self.taps_per_phase * self.up // 2) / float(self.up * self.input_rate)
+
+    @property
+    def cpu_load(self):
+        """Processing time per second of audio so far (0.01 = 1% of one core)."""
+
+        return self.seconds * self.input_rate / self.samples if self.samples else 0.0
+
+    def process(self, in_data):
+        """
+        Converts one buffer of interleaved 16-bit samples. Returns int16 mono samples at the output rate as a view
+        of an internal buffer that is valid until the next call (its length varies if the rates are not multiples).
+        Buffers may end within a frame (e.g. reads from a socket), the rest is kept for the next one so the channels
+        stay in place.
+        """
+        start = time.time()
+        frame_bytes = 2 * self.input_channels
+        if self._carry or memoryview(in_data).nbytes % frame_bytes:
+            in_data = self._carry + memoryview(in_data).tobytes()
+            end = len(in_data) - len(in_data) % frame_bytes
+            self._carry = in_data[end:]
+            in_data = in_data[:end]
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        frames = len(samples) // self.input_channels
+        if frames > self._max_frames:
+            raise ValueError("Buffer of %d frames is larger than max_input_frames" % frames)
+        samples = samples.reshape(frames, self.input_channels)
+        if self.up == self.down:
+            mono = self._mono[:frames]
+        else:
+            mono = self._inputs[self._active][self._fill:self._fill + frames]
+
+        if self.input_channels == 1:
+            np.copyto(mono, samples[:, 0], casting='unsafe')
+        elif self.channel >= 0:
+            np.copyto(mono, samples[:, self.channel], casting='unsafe')
+        else:
+            np.sum(samples, axis=1, dtype=np.float32, out=mono)
+            mono *= 1.0 / self.input_channels
+
+        if self.up == self.down:
+            output = self._output[:frames]
+            np.copyto(output, mono, casting='unsafe')
+        else:
+            output = self._resample(frames)
+        self.samples += frames
+        self.seconds += time.time() - start
+        return output
+
+    def _resample(self, frames):
+        work = self._inputs[self._active]
+        self._fill += frames
+        periods = (self._fill - self._history) // self.down
+        outputs = periods * self.up
+        if outputs:
+            gathered = self._gathered[:outputs]
+            np.take(work, self._index[:outputs], out=gathered)
+            np.multiply(gathered, self._coefficients[:outputs], out=gathered)
+            resampled = self._resampled[:outputs]
+            np.sum(gathered, axis=1, out=resampled)
+            np.rint(resampled, out=resampled)
+            np.clip(resampled, -32768, 32767, out=resampled)
+            np.copyto(self._output[:outputs], resampled, casting='unsafe')
+        # keep the history and the samples of the incomplete period
+        used = periods * self.down
+        rest = self._fill - used
+        self._active = 1 - self._active
+        self._inputs[self._active][:rest] = work[used:self._fill]
+        self._fill = rest
+        return self._output[:outputs]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Measure the CPU load of the audio front end.')
+    parser.add_argument('--input_rates', help='Comma-separated device sample rates.', type=str, default='16000,44100,48000')
+    parser.add_argument('--input_channels', help='Comma-separated device channel counts.', type=str, default='1,2,4')
+    parser.add_argument('--frames_per_buffer', help='Samples per channel in each device buffer.', type=int, default=1024)
+    parser.add_argument('--seconds', help='Seconds of audio to convert per setting.', type=float, default=60.0)
+    args = parser.parse_args()
+
+    print('%6s %8s %8s %10s %10s' % ('rate', 'channels', 'taps', 'cpu load', 'latency'))
+    for input_rate in [int(x) for x in args.input_rates.split(',')]:
+        for input_channels in [int(x) for x in args.input_channels.split(',')]:
+            front_end = AudioFrontEnd(input_rate, input_channels, max_input_frames=args.frames_per_buffer)
+            noise = (np.random.randn(args.frames_per_buffer * input_channels) * 3000).astype(np.int16).tobytes()
+            for _ in range(int(args.seconds * input_rate / args.frames_per_buffer)):
+                front_end.process(noise)
+            print('%6d %8d %8d %9.2f%% %8.1fms' % (input_rate, input_channels, getattr(front_end, 'taps_per_phase', 0),
+                front_end.cpu_load * 100, front_end.latency * 1000))
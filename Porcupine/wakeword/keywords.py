@@ -0,0 +1,160 @@
+#
+# S.E.P.I.A. wake-word keyword file registry
+#
+
+import os
+import platform
+
+from wakeword.library import PORCUPINE_FOLDER, default_model_file_path
+
+KEYWORD_FOLDER = os.path.join(PORCUPINE_FOLDER, 'keyword_files')
+
+# platform suffixes of the keyword files, '<keyword>_<platform>[_tiny].ppn'
+PLATFORMS = ['android', 'armlinux', 'ios', 'linux', 'mac', 'raspberrypi', 'windows']
+
+
+_platform = None
+
+
+def keyword_platform():
+    """
+    Keyword file platform of the running machine. Keyword files only work on the platform they were made for.
+    """
+    global _platform
+    if _platform is None:
+        _platform = _detect_platform()
+    return _platform
+
+
+def _detect_platform():
+    system = platform.system()
+    machine = platform.machine()
+
+    if system == 'Darwin':
+        return 'mac'
+    elif system == 'Windows':
+        return 'windows'
+    elif system == 'Linux':
+        if machine in ('x86_64', 'i386', 'i686'):
+            return 'linux'
+        try:
+            with open('/proc/device-tree/model') as model:
+                if 'Raspberry Pi' in model.read():
+                    return 'raspberrypi'
+        except IOError:
+            pass
+        return 'armlinux'
+    raise NotImplementedError('Porcupine is not supported on %s/%s yet!' % (system, machine))
+
+
+def parse_keyword_file_name(path):
+    """
+    Splits a keyword file name '<keyword>_<platform>[_tiny].ppn' into (keyword, platform, tiny). 'platform' is None for
+    names without a known platform suffix (e.g. custom keywords).
+    """
+    name = os.path.splitext(os.path.basename(path))[0]
+    tiny = name.endswith('_tiny')
+    if tiny:
+        name = name[:-len('_tiny')]
+    keyword, _, suffix = name.rpartition('_')
+    if keyword and suffix in PLATFORMS:
+        return (keyword, suffix, tiny)
+    return (name, None, tiny)
+
+
+def keyword_name(path):
+    """Name of the keyword of a keyword file, e.g. 'hey_sepia' for '.../hey_sepia_raspberrypi_tiny.ppn'."""
+
+    return parse_keyword_file_name(path)[0]
+
+
+class KeywordRegistry():
+    """
+    Index of keyword files by keyword, platform and tiny/full, built from one directory listing per folder (no file is
+    opened or stat'ed). Lookups are dictionary accesses, so adding folders with custom keywords keeps them cheap.
+    Custom keyword files without a platform suffix match every platform.
+    """
+
+    def __init__(self, folders=None):
+        """
+        Constructor.
+
+        :param folders: Folders with keyword files, default is the bundled 'porcupine/keyword_files'.
+        """
+        self._index = {}    # keyword -> {(platform, tiny): path}
+        for folder in (folders if folders is not None else [KEYWORD_FOLDER]):
+            self.add_folder(folder)
+
+    def add_folder(self, folder):
+        """Adds all '*.ppn' files of a folder, files added later replace ones with the same keyword/platform/tiny."""
+
+        for entry in os.listdir(folder):
+            if entry.endswith('.ppn'):
+                self.add_file(os.path.join(folder, entry))
+
+    def add_file(self, path):
+        """Adds one keyword file."""
+
+        keyword, file_platform, tiny = parse_keyword_file_name(path)
+        self._index.setdefault(keyword, {})[(file_platform, tiny)] = path
+
+    @property
+    def keywords(self):
+        """Sorted names of all keywords."""
+
+        return sorted(self._index)
+
+    def platforms(self, keyword, tiny=False):
+        """Sorted platforms a keyword is available for (None = any platform)."""
+
+        return sorted((p for p, t in self._index.get(keyword, {}) if t == tiny), key=str)
+
+    def resolve(self, keyword, tiny=False, target_platform=None):
+        """
+        Returns the path of the keyword file of 'keyword' for the running platform (or 'target_platform'). Raises
+        ValueError if there is none.
+
+        :param keyword: Keyword name, e.g. 'hey_sepia'. A trailing '_tiny' selects the tiny version.
+        :param tiny: Select the version for the tiny model.
+        """
+        if keyword.endswith('_tiny'):
+            keyword, tiny = keyword[:-len('_tiny')], True
+        files = self._index.get(keyword)
+        if files is None:
+            raise ValueError("Unknown keyword '%s', available: %s" % (keyword, ", ".join(self.keywords)))
+        target_platform = target_platform or keyword_platform()
+        path = files.get((target_platform, tiny)) or files.get((None, tiny))
+        if path is None:
+            raise ValueError("No %skeyword file of '%s' for platform '%s', available for: %s" % (
+                "tiny " if tiny else "", keyword, target_platform, ", ".join(str(x) for x in self.platforms(keyword, tiny)) or "-"))
+        return path
+
+    def resolve_all(self, keywords, tiny=False, target_platform=None):
+        """
+        Resolves a list of keywords (see 'resolve'). Returns (keyword file paths, path of the model file they need).
+        Tiny and full keyword files can't be mixed, they need different model files.
+        """
+        paths = [self.resolve(x, tiny, target_platform) for x in keywords]
+        tiny_files = set(parse_keyword_file_name(x)[2] for x in paths)
+        if len(tiny_files) > 1:
+            raise ValueError("Tiny and full keywords can't be mixed (they need different model files): %s" % ", ".join(keywords))
+        return (paths, model_file_path_for(paths))
+
+
+def model_file_path_for(keyword_file_paths):
+    """Model parameter file that goes with the keyword files ('porcupine_tiny_params.pv' for '*_tiny.ppn')."""
+
+    return default_model_file_path(tiny=bool(keyword_file_paths) and all(
+        parse_keyword_file_name(x)[2] for x in keyword_file_paths))
+
+
+_default_registry = None
+
+
+def default_registry():
+    """Registry of the bundled keyword files, built on first use."""
+
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = KeywordRegistry()
+    return _default_registry
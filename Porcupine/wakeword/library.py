@@ -0,0 +1,59 @@
+#
+# S.E.P.I.A. wake-word library paths
+#
+
+import os
+import platform
+
+PORCUPINE_FOLDER = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'porcupine')
+
+
+def default_library_path():
+    """
+    Path to the Porcupine library of the running platform.
+    """
+    system = platform.system()
+    machine = platform.machine()
+
+    if system == 'Darwin':
+        return os.path.join(PORCUPINE_FOLDER, 'lib/mac/%s/libpv_porcupine.dylib' % machine)
+    elif system == 'Linux':
+        if machine == 'x86_64' or machine == 'i386':
+            return os.path.join(PORCUPINE_FOLDER, 'lib/linux/%s/libpv_porcupine.so' % machine)
+        else:
+            raise Exception('Cannot autodetect library. Please use e.g.: --library_path="porcupine/lib/raspberry-pi/arm11/libpv_porcupine.so" (Pi Zero with ARM11 CPU).')
+    elif system == 'Windows':
+        if platform.architecture()[0] == '32bit':
+            return os.path.join(PORCUPINE_FOLDER, 'lib\\windows\\i686\\libpv_porcupine.dll')
+        else:
+            return os.path.join(PORCUPINE_FOLDER, 'lib\\windows\\amd64\\libpv_porcupine.dll')
+    raise NotImplementedError('Porcupine is not supported on %s/%s yet!' % (system, machine))
+
+
+def audio_format(library_path):
+    """
+    (sample rate, frame length) expected by the Porcupine library, without creating a Porcupine instance.
+    """
+    from ctypes import cdll
+
+    library = cdll.LoadLibrary(library_path)
+    return (library.pv_sample_rate(), library.pv_porcupine_frame_length())
+
+
+def default_model_file_path(tiny=False):
+    """
+    Path to the model parameter file, 'tiny' is the one for '*_tiny.ppn' keyword files.
+    """
+    if tiny:
+        return os.path.join(PORCUPINE_FOLDER, 'lib/common/porcupine_tiny_params.pv')
+    return os.path.join(PORCUPINE_FOLDER, 'lib/common/porcupine_params.pv')
+
+
+def tiny_keyword_file_path(keyword_file_path):
+    """
+    Path of the '*_tiny.ppn' version of a keyword file (to be used with the tiny model).
+    """
+    root, extension = os.path.splitext(keyword_file_path)
+    if root.endswith('_tiny'):
+        return keyword_file_path
+    return root + '_tiny' + extension
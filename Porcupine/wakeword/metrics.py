@@ -0,0 +1,193 @@
+#
+# S.E.P.I.A. wake-word metrics (Prometheus text format)
+#
+
+import bisect
+import threading
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+
+
+class Counter():
+    """
+    Monotonic counter, optionally with one label whose values are fixed up front (e.g. one per keyword). Each counter
+    must only be updated from one thread: updates are a plain increment of a preallocated slot, no lock is taken and
+    no container grows.
+    """
+
+    type = 'counter'
+
+    def __init__(self, name, help_text, label=None, label_values=None):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.label_values = list(label_values) if label else [None]
+        self.values = [0] * len(self.label_values)
+
+    def label_index(self, label_value):
+        """Position of a label value, new values are added (not from the thread that updates the counter)."""
+
+        if label_value not in self.label_values:
+            self.values.append(0)
+            self.label_values.append(label_value)
+        return self.label_values.index(label_value)
+
+    def inc(self, index=0, amount=1):
+        """Adds 'amount' to the counter (of the label value at position 'index')."""
+
+        self.values[index] += amount
+
+    def samples(self):
+        for label_value, value in zip(self.label_values, self.values):
+            yield (self.name, [(self.label, label_value)] if self.label else [], value)
+
+
+class Histogram():
+    """
+    Distribution of observed values (e.g. seconds) in fixed buckets. 'observe' is one binary search and two additions
+    on preallocated slots, single writer only (see 'Counter').
+    """
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, buckets):
+        """
+        :param buckets: Sorted upper bounds of the buckets, a '+Inf' bucket is added.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self):
+        cumulative = 0
+        for bound, count in zip(self.buckets + [float('inf')], list(self.counts)):
+            cumulative += count
+            yield (self.name + '_bucket', [('le', _format_value(float(bound)))], cumulative)
+        yield (self.name + '_sum', [], self.sum)
+        yield (self.name + '_count', [], cumulative)
+
+
+class CallbackMetric():
+    """Gauge or counter whose value is read from 'func' when the metrics are scraped (e.g. a queue depth)."""
+
+    def __init__(self, name, help_text, func, metric_type='gauge'):
+        self.name = name
+        self.help_text = help_text
+        self.type = metric_type
+        self.func = func
+
+    def samples(self):
+        value = self.func()
+        if value is not None:
+            yield (self.name, [], value)
+
+
+class MetricsRegistry():
+    """Collection of metrics rendered together in the Prometheus text exposition format."""
+
+    def __init__(self, prefix=''):
+        self.prefix = prefix
+        self._metrics = []
+
+    def add(self, metric):
+        """Registers a metric and returns it."""
+
+        metric.name = self.prefix + metric.name
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, label=None, label_values=None):
+        return self.add(Counter(name, help_text, label, label_values))
+
+    def histogram(self, name, help_text, buckets):
+        return self.add(Histogram(name, help_text, buckets))
+
+    def callback(self, name, help_text, func, metric_type='gauge'):
+        return self.add(CallbackMetric(name, help_text, func, metric_type))
+
+    def render(self):
+        """Returns all metrics as text."""
+
+        lines = []
+        for metric in self._metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception:
+                # a callback of a component that is gone or not started yet, leave it out
+                continue
+            lines.append('# HELP %s %s' % (metric.name, metric.help_text))
+            lines.append('# TYPE %s %s' % (metric.name, metric.type))
+            for name, labels, value in samples:
+                lines.append('%s%s %s' % (name, _format_labels(labels), _format_value(value)))
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsServer():
+    """Serves the metrics of a registry on 'http://host:port/metrics' from a background thread."""
+
+    def __init__(self, registry, port, host='127.0.0.1'):
+        """
+        Constructor.
+
+        :param registry: MetricsRegistry to serve.
+        :param port: TCP port.
+        :param host: Address to listen on, default is localhost only.
+        """
+        # imported only when metrics are served, it takes a while on small devices
+        try:
+            from http.server import BaseHTTPRequestHandler, HTTPServer
+            from socketserver import ThreadingMixIn
+        except ImportError:
+            from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+            from SocketServer import ThreadingMixIn
+        self.registry = registry
+
+        class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+            daemon_threads = True
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split('?')[0] not in ('/metrics', '/'):
+                    handler.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                handler.send_response(200)
+                handler.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                handler.send_header('Content-Length', str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='sepia-metrics')
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
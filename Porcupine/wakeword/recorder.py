@@ -0,0 +1,271 @@
+#
+# S.E.P.I.A. wake-word audio recorder
+#
+
+import os
+import threading
+import time
+from collections import deque
+try:
+    import queue as Queue
+except ImportError:
+    import Queue as Queue
+
+import numpy as np
+import soundfile
+
+from .frames import FrameQueue
+
+
+class StreamRecorder():
+    """
+    Streams captured 16-bit PCM to disk on a background thread. Buffers are handed over through a bounded FrameQueue,
+    so a stalling disk drops audio from the recording (counted in 'dropped') instead of blocking capture.
+    Files are rotated by duration and/or size and each new file is added to a CSV index with its start time.
+    """
+
+    def __init__(
+            self,
+            output_path,
+            sample_rate,
+            buffer_size,
+            channels=1,
+            max_seconds=3600,
+            max_bytes=0,
+            queue_size=64):
+        """
+        Constructor.
+
+        :param output_path: Base path of the recordings, e.g. 'recordings/mic.wav'. Files are named
+        'mic_<start time>_<number>.wav', the index is 'mic_index.csv'. Use the extension '.flac' for FLAC encoding.
+        :param sample_rate: Sample rate of the audio.
+        :param buffer_size: Maximum size in bytes of the buffers passed to 'write'.
+        :param channels: Number of interleaved channels.
+        :param max_seconds: Start a new file after this many seconds of audio (0 = no limit).
+        :param max_bytes: Start a new file when the current one gets bigger than this (0 = no limit).
+        :param queue_size: Number of buffers that can wait for the disk before new ones are dropped.
+        """
+        self._root, self._extension = os.path.splitext(output_path)
+        self._extension = self._extension or '.wav'
+        self._format = 'FLAC' if self._extension.lower() == '.flac' else 'WAV'
+        self.index_path = self._root + '_index.csv'
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self._max_samples = int(max_seconds * sample_rate)
+        self._max_bytes = max_bytes
+        self._frame_queue = FrameQueue(queue_size, buffer_size)
+
+        self._file = None
+        self._file_path = None
+        self._file_samples = 0
+        self._file_number = 0
+        self._running = False
+        self._thread = None
+
+    @property
+    def dropped(self):
+        """Number of buffers that were not recorded because the writer was too slow."""
+
+        return self._frame_queue.dropped
+
+    def start(self):
+        """Starts the writer thread."""
+
+        folder = os.path.dirname(self._root)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name="sepia-recorder")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, in_data):
+        """
+        Hands a buffer of captured audio to the writer thread. Never blocks, returns False if it had to be dropped.
+        """
+        return self._frame_queue.put(in_data, time.time())
+
+    def stop(self):
+        """Writes all pending buffers, closes the current file and stops the writer thread."""
+
+        self._running = False
+        self._frame_queue.close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        bytes_per_sample = 2 * self.channels
+        try:
+            while True:
+                in_data = self._frame_queue.get(timeout=0.5)
+                if in_data is None:
+                    if not self._running:
+                        break
+                    continue
+                try:
+                    samples = len(in_data) // bytes_per_sample
+                    if self._file is None or self._rotation_due():
+                        # the buffer was queued right after capture, so its first sample is 'samples' older
+                        self._open_next_file(self._frame_queue.timestamp - samples / float(self.sample_rate))
+                    self._file.buffer_write(in_data, dtype='int16')
+                    self._file_samples += samples
+                finally:
+                    self._frame_queue.release()
+        finally:
+            self._close_file()
+
+    def _rotation_due(self):
+        if self._max_samples and self._file_samples >= self._max_samples:
+            return True
+        if self._max_bytes and self._file_samples * 2 * self.channels >= self._max_bytes:
+            # estimate is exact for WAV and an upper bound for FLAC, so check the real size before rotating
+            return os.path.getsize(self._file_path) >= self._max_bytes
+        return False
+
+    def _open_next_file(self, start_time):
+        self._close_file()
+        self._file_number += 1
+        self._file_path = '%s_%s_%04d%s' % (self._root, time.strftime('%Y%m%d-%H%M%S', time.localtime(start_time)),
+            self._file_number, self._extension)
+        self._file = soundfile.SoundFile(self._file_path, mode='w', samplerate=self.sample_rate,
+            channels=self.channels, format=self._format, subtype='PCM_16')
+        self._file_samples = 0
+
+        write_header = not os.path.isfile(self.index_path)
+        with open(self.index_path, 'a') as index:
+            if write_header:
+                index.write('file,start_time,start_date\n')
+            index.write('%s,%.3f,%s\n' % (os.path.basename(self._file_path), start_time,
+                time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(start_time))))
+
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class ClipRecorder():
+    """
+    Keeps the last seconds of audio in a fixed-size, preallocated int16 ring buffer and saves a clip from 'pre roll'
+    before to 'post roll' after each detection. When the post roll of a clip is complete 'write' copies it into one of
+    a few preallocated clip buffers, before the ring can overwrite it, and the clip is written to disk on a background
+    thread. So memory stays constant, and clips are complete also when audio comes in faster than real time.
+    """
+
+    def __init__(
+            self,
+            output_folder,
+            sample_rate,
+            pre_roll_seconds=3.0,
+            post_roll_seconds=1.0,
+            file_format='WAV'):
+        """
+        Constructor.
+
+        :param output_folder: Folder for the clips, named 'detection_<time>.<milliseconds>_<label>.wav'.
+        :param sample_rate: Sample rate of the (mono) audio.
+        :param pre_roll_seconds: Seconds of audio before the detection in each clip.
+        :param post_roll_seconds: Seconds of audio after the detection in each clip.
+        :param file_format: 'WAV' or 'FLAC'.
+        """
+        self.output_folder = output_folder
+        self.sample_rate = sample_rate
+        self._pre_roll = int(pre_roll_seconds * sample_rate)
+        self._post_roll = int(post_roll_seconds * sample_rate)
+        self._format = file_format.upper()
+        self._ring = np.zeros(max(1, self._pre_roll + self._post_roll), dtype=np.int16)
+        self._position = 0      # number of samples written since start
+        self._pending = deque()
+        self._clips = Queue.Queue()
+        # clip buffers the writer thread gives back after writing, only if it can't keep up a new one is allocated
+        self._free_buffers = deque(np.zeros(len(self._ring), dtype=np.int16) for _ in range(2))
+        self._thread = None
+
+        self.saved = 0
+
+    def start(self):
+        """Starts the clip writer thread."""
+
+        if not os.path.isdir(self.output_folder):
+            os.makedirs(self.output_folder)
+        self._thread = threading.Thread(target=self._run, name="sepia-clips")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def write(self, samples):
+        """
+        Copies int16 samples (e.g. a detector frame) into the ring buffer and hands finished clips to the writer.
+        """
+        offset = 0
+        while offset < len(samples):
+            size = len(samples) - offset
+            if self._pending:
+                # stop at the end of the next clip, it is copied before the following samples can overwrite it
+                size = min(size, self._pending[0][1] - self._position)
+            self._write_ring(samples[offset:offset + size])
+            offset += size
+            while self._pending and self._pending[0][1] <= self._position:
+                self._clips.put(self._copy_clip(*self._pending.popleft()))
+
+    def _write_ring(self, samples):
+        size = len(samples)
+        capacity = len(self._ring)
+        index = self._position % capacity
+        first = min(size, capacity - index)
+        np.copyto(self._ring[index:index + first], samples[:first])
+        if size > first:
+            np.copyto(self._ring[:size - first], samples[first:])
+        self._position += size
+
+    def _copy_clip(self, start, end, detection_time, label):
+        # the ring still holds all samples of the clip, copy them into a buffer that belongs to the writer thread
+        buffer = self._free_buffers.popleft() if self._free_buffers else np.zeros(len(self._ring), dtype=np.int16)
+        capacity = len(self._ring)
+        first = min(end - start, capacity - start % capacity)
+        buffer[:first] = self._ring[start % capacity:start % capacity + first]
+        buffer[first:end - start] = self._ring[:end - start - first]
+        return (buffer, end - start, detection_time, label)
+
+    def trigger(self, label):
+        """
+        Saves a clip around the current position once the post roll has been written.
+
+        :param label: Added to the file name, e.g. the keyword index.
+        """
+        start = max(0, self._position - self._pre_roll)
+        self._pending.append((start, self._position + self._post_roll, time.time(), label))
+
+    def stop(self):
+        """Writes clips of pending detections with the audio available so far and stops the writer thread."""
+
+        while self._pending:
+            start, end, detection_time, label = self._pending.popleft()
+            self._clips.put(self._copy_clip(start, min(end, self._position), detection_time, label))
+        self._clips.put(None)
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while True:
+            clip = self._clips.get()
+            if clip is None:
+                break
+            buffer, size, detection_time, label = clip
+            path = self._clip_path(detection_time, label)
+            try:
+                soundfile.write(path, buffer[:size], samplerate=self.sample_rate, format=self._format, subtype='PCM_16')
+                self.saved += 1
+            except Exception as e:
+                print("Clip recorder: failed to write '%s' - %s" % (path, e))
+            self._free_buffers.append(buffer)
+
+    def _clip_path(self, detection_time, label):
+        # milliseconds and, for clips of the same millisecond (e.g. a file replayed at full speed), a counter
+        name = 'detection_%s.%03d_%s' % (time.strftime('%Y%m%d-%H%M%S', time.localtime(detection_time)),
+            int(detection_time * 1000) % 1000, label)
+        path = os.path.join(self.output_folder, '%s.%s' % (name, self._format.lower()))
+        count = 1
+        while os.path.exists(path):
+            count += 1
+            path = os.path.join(self.output_folder, '%s_%d.%s' % (name, count, self._format.lower()))
+        return path
@@ -0,0 +1,132 @@
+#
+# S.E.P.I.A. wake-word keyword action routing
+#
+
+import json
+from collections import namedtuple
+
+from sepia.targets import parse_targets
+from wakeword.keywords import keyword_name
+
+# what a detection does: trigger the microphone of the SEPIA clients, send any remote action or nothing (only logged)
+ACTIONS = ['microphone', 'send', 'none']
+
+ROUTE_KEYS = ['action', 'type', 'payload', 'targets', 'language', 'cooldown']
+
+# route of keywords without an entry in the table
+DEFAULT_ROUTE = '*'
+
+
+class KeywordRoute(namedtuple("KeywordRoute", ["keyword", "action", "action_type", "payload", "targets", "language", "cooldown"])):
+    """
+    Resolved action of one keyword. 'payload' is the action string sent to the server, 'targets' a list of
+    'sepia.targets.RemoteTarget' or None for the default user of the remote, 'cooldown' the seconds of audio after a
+    detection during which the keyword is ignored.
+    """
+    __slots__ = ()
+
+
+class RouteTable():
+    """
+    Declarative table of what happens when a keyword is detected, usually loaded from a JSON file (see 'load'):
+
+        {"hey_sepia": {"action": "microphone"},
+         "computer": {"action": "microphone", "targets": "uid1007/o1", "language": "de", "cooldown": 5},
+         "lights_off": {"action": "send", "type": "sync", "payload": {"events": "timeEvents"}, "targets": "uid1007//chat"},
+         "*": {"action": "none"}}
+
+    Keys are keyword names (see 'wakeword.keywords.keyword_name'), '*' applies to all other keywords (default: trigger
+    the microphone). Routes are validated when the table is created and resolved once per keyword index ('resolve'),
+    so a detection only looks up a list.
+    """
+
+    def __init__(self, routes=None, user_id="", targets=None, cooldown=2.0):
+        """
+        Constructor.
+
+        :param routes: Dict keyword name -> route dict with the keys 'action' ('microphone', 'send' or 'none'), for
+        'send' the remote action 'type' and 'payload' (string or JSON object), optional 'targets' (comma-separated
+        '[user_id]/[device]/[channel]'), 'language' and 'cooldown' (seconds).
+        :param user_id: User of targets without a user ID.
+        :param targets: Targets of routes without 'targets' (list of RemoteTarget), default is the user of the remote.
+        :param cooldown: Cooldown of routes without 'cooldown'.
+        """
+        self.user_id = user_id
+        self.targets = targets
+        self.cooldown = float(cooldown)
+        self.routes = {}
+        for keyword, route in (routes or {}).items():
+            self.routes[keyword] = self._parse(keyword, route)
+        if DEFAULT_ROUTE not in self.routes:
+            self.routes[DEFAULT_ROUTE] = self._parse(DEFAULT_ROUTE, {})
+
+    @classmethod
+    def load(cls, path, user_id="", targets=None, cooldown=2.0):
+        """Creates the table from a JSON file (see the class description)."""
+
+        with open(path) as routes_file:
+            routes = json.load(routes_file)
+        if not isinstance(routes, dict):
+            raise ValueError("Routes in '%s' must be a JSON object with keyword names as keys" % path)
+        return cls(routes, user_id, targets, cooldown)
+
+    def _parse(self, keyword, route):
+        if not isinstance(route, dict):
+            raise ValueError("Route of '%s' must be a JSON object" % keyword)
+        unknown = sorted(set(route) - set(ROUTE_KEYS))
+        if unknown:
+            raise ValueError("Unknown key(s) %s in route of '%s', known: %s" % (", ".join(unknown), keyword, ", ".join(ROUTE_KEYS)))
+        action = route.get('action', 'microphone')
+        if action not in ACTIONS:
+            raise ValueError("Unknown action '%s' in route of '%s', known: %s" % (action, keyword, ", ".join(ACTIONS)))
+
+        action_type = route.get('type')
+        payload = route.get('payload', "")
+        if action == 'microphone':
+            action_type = "hotkey"
+            payload = None      # created per target (see 'sepia.remote.AsyncRemote.microphone_action')
+        elif action == 'send':
+            if not action_type:
+                raise ValueError("Route of '%s' needs the remote action 'type'" % keyword)
+            if not isinstance(payload, str):
+                payload = json.dumps(payload)
+
+        language = route.get('language', "")
+        targets = route.get('targets')
+        if targets is not None:
+            if isinstance(targets, list):
+                targets = ",".join(targets)
+            targets = parse_targets(targets, self.user_id)
+        else:
+            targets = self.targets
+        if targets and language:
+            targets = [x if x.language else x._replace(language=language) for x in targets]
+
+        cooldown = float(route.get('cooldown', self.cooldown))
+        if cooldown < 0:
+            raise ValueError("Cooldown of '%s' must not be negative" % keyword)
+        return KeywordRoute(keyword, action, action_type, payload, targets, language, cooldown)
+
+    def route(self, keyword):
+        """Route of a keyword name ('*' route if it has none)."""
+
+        return self.routes.get(keyword) or self.routes[DEFAULT_ROUTE]
+
+    def resolve(self, keyword_file_paths):
+        """Returns the route of each keyword file, the index of a keyword in Porcupine's result is the list index."""
+
+        return [self.route(keyword_name(x)) for x in keyword_file_paths]
+
+    def describe(self, keyword_file_paths):
+        """One line per keyword file for the console."""
+
+        lines = []
+        for index, route in enumerate(self.resolve(keyword_file_paths)):
+            if route.action == 'none':
+                action = "only logged"
+            else:
+                action = "%s -> %s" % (("send '%s' %s" % (route.action_type, route.payload)) if route.action == 'send' else route.action,
+                    ", ".join("/".join(x[:3]) for x in route.targets) if route.targets else "default user")
+            lines.append("#%d %s: %s%s, cooldown %.1fs" % (index, keyword_name(keyword_file_paths[index]), action,
+                (" (%s)" % route.language) if route.language else "", route.cooldown))
+        return lines
@@ -0,0 +1,125 @@
+#
+# S.E.P.I.A. wake-word shared-memory audio rings
+#
+
+from multiprocessing import shared_memory
+
+import numpy as np
+
+_HEADER = 3     # int64 fields: write position, read position, dropped samples
+_WRITE, _READ, _DROPPED = range(_HEADER)
+
+
+class SharedFrameRing():
+    """
+    Single-producer/single-consumer ring of int16 samples in shared memory, to move audio between processes without
+    pickling. The producer writes buffers of any size, the consumer reads fixed-size frames. The capacity is a multiple
+    of the frame length and reads are frame aligned, so every frame is a contiguous view of the shared buffer.
+    """
+
+    def __init__(self, frame_length, capacity_frames=64, name=None):
+        """
+        Constructor. Creates a new shared memory block, or attaches to an existing one if 'name' is given.
+
+        :param frame_length: Number of samples per frame read by the consumer.
+        :param capacity_frames: Size of the ring in frames.
+        :param name: Name of an existing ring (see 'name').
+        """
+        self.frame_length = frame_length
+        self.capacity = frame_length * capacity_frames
+        size = _HEADER * 8 + self.capacity * 2
+        self._owner = name is None
+        if self._owner:
+            self._memory = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            try:
+                # don't let the resource tracker of this process remove memory it doesn't own (Python 3.13+)
+                self._memory = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self._memory = shared_memory.SharedMemory(name=name)
+        self._header = np.ndarray((_HEADER,), dtype=np.int64, buffer=self._memory.buf)
+        self._samples = np.ndarray((self.capacity,), dtype=np.int16, buffer=self._memory.buf, offset=_HEADER * 8)
+        self._carry = b''   # producer: odd byte of the last write (first half of a sample)
+        if self._owner:
+            self._header[:] = 0
+
+    def __getstate__(self):
+        # processes that are not forked attach by name
+        return (self.frame_length, self.capacity // self.frame_length, self._memory.name)
+
+    def __setstate__(self, state):
+        self.__init__(state[0], state[1], name=state[2])
+
+    @property
+    def name(self):
+        """Name of the shared memory block."""
+
+        return self._memory.name
+
+    @property
+    def available(self):
+        """Number of samples written but not read yet."""
+
+        return int(self._header[_WRITE] - self._header[_READ])
+
+    @property
+    def free(self):
+        """Number of samples the producer can write without dropping."""
+
+        return self.capacity - self.available
+
+    @property
+    def dropped(self):
+        """Number of samples the producer had to drop because the ring was full."""
+
+        return int(self._header[_DROPPED])
+
+    def write(self, in_data):
+        """
+        Producer: appends 16-bit samples (any buffer-protocol object). Returns False if they were dropped. A trailing
+        odd byte (e.g. of a socket read) is kept and completed by the next write.
+        """
+        if self._carry or memoryview(in_data).nbytes % 2:
+            in_data = self._carry + bytes(in_data)
+            end = len(in_data) - len(in_data) % 2
+            self._carry = in_data[end:]
+            in_data = in_data[:end]
+        samples = np.frombuffer(in_data, dtype=np.int16)
+        size = len(samples)
+        position = int(self._header[_WRITE])
+        if self.capacity - (position - int(self._header[_READ])) < size:
+            self._header[_DROPPED] += size
+            return False
+        index = position % self.capacity
+        first = min(size, self.capacity - index)
+        self._samples[index:index + first] = samples[:first]
+        if size > first:
+            self._samples[:size - first] = samples[first:]
+        # publish the samples only after they are written
+        self._header[_WRITE] = position + size
+        return True
+
+    def read_frame(self):
+        """
+        Consumer: returns the next frame as a view of the shared buffer or None if there is no complete frame yet.
+        The frame stays valid until 'release_frame' is called.
+        """
+        position = int(self._header[_READ])
+        if self._header[_WRITE] - position < self.frame_length:
+            return None
+        index = position % self.capacity
+        return self._samples[index:index + self.frame_length]
+
+    def release_frame(self):
+        """Consumer: frees the frame returned by 'read_frame' for the producer."""
+
+        self._header[_READ] += self.frame_length
+
+    def close(self):
+        """Detaches from the shared memory and removes it if this instance created it."""
+
+        self._header = None
+        self._samples = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
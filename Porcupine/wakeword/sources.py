@@ -0,0 +1,342 @@
+#
+# S.E.P.I.A. wake-word audio sources
+#
+
+import os
+import socket
+import stat
+import sys
+import threading
+import time
+
+
+def remove_stale_socket(socket_path):
+    """
+    Remove a UNIX socket left over at 'socket_path' by a process that is gone, so the path can be bound again. Raises
+    OSError if the path is something else (e.g. a regular file) or another process still listens on it.
+    """
+    try:
+        mode = os.stat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError("'%s' exists and is not a socket" % socket_path)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+    except OSError:
+        os.remove(socket_path)
+        return
+    finally:
+        client.close()
+    raise OSError("'%s' is in use by another process" % socket_path)
+
+
+class AudioSource(object):
+    """
+    Base class of audio sources. A source delivers buffers of 16-bit PCM to a callback 'callback(in_data)' from its own
+    thread. 'in_data' supports the buffer protocol and is only valid during the call (sources may reuse their buffers),
+    so copy what you need to keep. During the call 'capture_time' is the 'time.perf_counter()' time at which the first
+    sample of the buffer was captured.
+    """
+
+    # True if audio arrives at its natural pace (microphone). Otherwise the consumer may slow the source down.
+    realtime = True
+
+    def __init__(self, sample_rate, frames_per_buffer, channels=1):
+        """
+        Constructor.
+
+        :param sample_rate: Sample rate of the audio.
+        :param frames_per_buffer: Number of samples (per channel) in each buffer.
+        :param channels: Number of interleaved channels.
+        """
+        self.sample_rate = sample_rate
+        self.frames_per_buffer = frames_per_buffer
+        self.channels = channels
+        self.buffer_size = frames_per_buffer * channels * 2
+        self.samples_delivered = 0
+        self.overflows = 0          # buffers the device reported as overflowed (audio was lost before we got it)
+        self.capture_time = 0.0
+        self._callback = None
+        self._thread = None
+        self._running = False
+
+    def open(self):
+        """Prepares the source (e.g. opens the device) without delivering audio yet, optional before 'start'."""
+
+        pass
+
+    def start(self, callback):
+        """Starts delivering audio to 'callback'."""
+
+        self._callback = callback
+        self._running = True
+        self._thread = threading.Thread(target=self._run_safe, name=type(self).__name__)
+        self._thread.daemon = True
+        self._thread.start()
+
+    def stop(self):
+        """Stops delivering audio and releases the source."""
+
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(2)
+
+    def is_active(self):
+        """False once the source has ended (e.g. end of file) or was stopped."""
+
+        return self._running
+
+    def describe(self):
+        """Short description for the console."""
+
+        return type(self).__name__
+
+    def _deliver(self, in_data, capture_time=None):
+        frames = len(in_data) // (2 * self.channels)
+        self.samples_delivered += frames
+        # without a time from the device assume the last sample was captured just now
+        self.capture_time = capture_time if capture_time is not None else time.perf_counter() - frames / float(self.sample_rate)
+        self._callback(in_data)
+
+    def _deliver_frames(self, buffer, size):
+        """
+        Delivers the complete frames (one sample of each channel) of the first 'size' bytes of 'buffer' and moves the
+        rest, which pipes and sockets may return, to the start of the buffer. Returns the number of bytes kept, the
+        next read goes to the buffer behind them.
+        """
+        frame_bytes = 2 * self.channels
+        rest = size % frame_bytes
+        if size > rest:
+            self._deliver(memoryview(buffer)[:size - rest])
+        if rest:
+            buffer[:rest] = buffer[size - rest:size]
+        return rest
+
+    def _run_safe(self):
+        try:
+            self._run()
+        except Exception as e:
+            print("Audio source: %s stopped - %s" % (self.describe(), e))
+        finally:
+            self._running = False
+
+    def _run(self):
+        raise NotImplementedError()
+
+
+class PyAudioSource(AudioSource):
+    """
+    Microphone input via PyAudio. In 'callback' mode PortAudio calls us from its own thread, in 'blocking' mode a thread
+    of ours reads one buffer after another (PyAudio returns a new bytes object for each read). Input overflows are only
+    reported in 'callback' mode, PyAudio's blocking read does not return the status.
+    """
+
+    def __init__(self, sample_rate, frames_per_buffer, channels=1, input_device_index=None, blocking=False):
+        """
+        Constructor.
+
+        :param input_device_index: Optional index of the input device (default device if not set).
+        :param blocking: Use blocking reads instead of a stream callback.
+        """
+        super(PyAudioSource, self).__init__(sample_rate, frames_per_buffer, channels)
+        self.input_device_index = input_device_index
+        self.blocking = blocking
+        self._pa = None
+        self._stream = None
+
+    def open(self):
+        import pyaudio
+
+        self._pa = pyaudio.PyAudio()
+
+        def _stream_callback(in_data, frame_count, time_info, status):
+            if status & pyaudio.paInputOverflow:
+                self.overflows += 1
+            # ADC time of the first sample in the stream's clock, 0 if the host API (e.g. some ALSA devices) has none
+            adc_time = time_info['input_buffer_adc_time'] if time_info else 0
+            if adc_time and 0 <= time_info['current_time'] - adc_time < 1.0:
+                self._deliver(in_data, time.perf_counter() - (time_info['current_time'] - adc_time))
+            else:
+                self._deliver(in_data)
+            return (None, pyaudio.paContinue)
+
+        self._stream = self._pa.open(
+            rate=self.sample_rate,
+            channels=self.channels,
+            format=pyaudio.paInt16,
+            input=True,
+            frames_per_buffer=self.frames_per_buffer,
+            input_device_index=self.input_device_index,
+            stream_callback=(None if self.blocking else _stream_callback),
+            start=False)
+
+    def start(self, callback):
+        self._callback = callback
+        if self._stream is None:
+            self.open()
+        self._stream.start_stream()
+
+        if self.blocking:
+            super(PyAudioSource, self).start(callback)
+        else:
+            self._running = True
+
+    def stop(self):
+        super(PyAudioSource, self).stop()
+        if self._stream is not None:
+            self._stream.stop_stream()
+            self._stream.close()
+            self._stream = None
+        if self._pa is not None:
+            self._pa.terminate()
+            self._pa = None
+
+    def describe(self):
+        if self.input_device_index is None:
+            device = "default (check with --show_audio_devices_info)"
+        else:
+            device = "%d (check with --show_audio_devices_info)" % self.input_device_index
+        return "PyAudio %s, input device: %s" % ("blocking read" if self.blocking else "callback", device)
+
+    def _run(self):
+        while self._running:
+            self._deliver(self._stream.read(self.frames_per_buffer, exception_on_overflow=False))
+
+
+class FileSource(AudioSource):
+    """
+    Replays an audio file (WAV, FLAC, ... via soundfile) through a preallocated buffer, either paced like a microphone
+    or as fast as the consumer can take it (for benchmarks and soak tests).
+    """
+
+    def __init__(self, path, sample_rate, frames_per_buffer, channels=1, speed=1.0, loop=False):
+        """
+        Constructor.
+
+        :param path: Audio file with the given sample rate and channels.
+        :param speed: Replay speed relative to real-time, 0 means as fast as possible.
+        :param loop: Start again at the end of the file.
+        """
+        super(FileSource, self).__init__(sample_rate, frames_per_buffer, channels)
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        self.realtime = speed > 0
+
+    def describe(self):
+        return "file '%s' (%s)" % (self.path, ("%.1fx real-time" % self.speed) if self.speed else "as fast as possible")
+
+    def _run(self):
+        import soundfile
+
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        start = time.time()
+        with soundfile.SoundFile(self.path) as audio_file:
+            if audio_file.samplerate != self.sample_rate or audio_file.channels != self.channels:
+                raise ValueError("'%s' needs %d Hz and %d channel(s)" % (self.path, self.sample_rate, self.channels))
+            while self._running:
+                frames = audio_file.buffer_read_into(buffer, dtype='int16')
+                if frames:
+                    self._deliver(view[:frames * 2 * self.channels])
+                if frames < self.frames_per_buffer:
+                    if not self.loop:
+                        break
+                    audio_file.seek(0)
+                if self.speed:
+                    delay = start + self.samples_delivered / (self.sample_rate * self.speed) - time.time()
+                    if delay > 0:
+                        time.sleep(delay)
+
+
+class StreamSource(AudioSource):
+    """
+    Raw 16-bit little-endian PCM from a binary stream (e.g. stdin of 'arecord -t raw -f S16_LE -r 16000 -c 1 | ...'),
+    read into a preallocated buffer.
+    """
+
+    realtime = False
+
+    def __init__(self, sample_rate, frames_per_buffer, channels=1, stream=None):
+        """
+        Constructor.
+
+        :param stream: Binary stream with a 'readinto' method, default is stdin.
+        """
+        super(StreamSource, self).__init__(sample_rate, frames_per_buffer, channels)
+        self.stream = stream if stream is not None else getattr(sys.stdin, 'buffer', sys.stdin)
+
+    def describe(self):
+        return "raw PCM from %s" % getattr(self.stream, 'name', 'stream')
+
+    def _run(self):
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        kept = 0
+        while self._running:
+            size = self.stream.readinto(view[kept:])
+            if not size:
+                break
+            kept = self._deliver_frames(buffer, kept + size)
+
+
+class UnixSocketSource(AudioSource):
+    """
+    Raw 16-bit little-endian PCM received on a UNIX domain socket. One client is served at a time, when it disconnects
+    the next one can connect (e.g. 'arecord -t raw -f S16_LE -r 16000 -c 1 | socat - UNIX-CONNECT:/tmp/sepia.sock').
+    """
+
+    realtime = False
+
+    def __init__(self, socket_path, sample_rate, frames_per_buffer, channels=1):
+        """
+        Constructor.
+
+        :param socket_path: File system path of the socket to listen on.
+        """
+        super(UnixSocketSource, self).__init__(sample_rate, frames_per_buffer, channels)
+        self.socket_path = socket_path
+        self._server = None
+
+    def describe(self):
+        return "raw PCM on UNIX socket '%s'" % self.socket_path
+
+    def start(self, callback):
+        remove_stale_socket(self.socket_path)
+        self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._server.bind(self.socket_path)
+        self._server.listen(1)
+        self._server.settimeout(0.5)
+        super(UnixSocketSource, self).start(callback)
+
+    def stop(self):
+        super(UnixSocketSource, self).stop()
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def _run(self):
+        buffer = bytearray(self.buffer_size)
+        view = memoryview(buffer)
+        while self._running:
+            try:
+                connection, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            connection.settimeout(0.5)
+            kept = 0    # a partial frame of the last client is dropped
+            try:
+                while self._running:
+                    try:
+                        size = connection.recv_into(view[kept:])
+                    except socket.timeout:
+                        continue
+                    if not size:
+                        break
+                    kept = self._deliver_frames(buffer, kept + size)
+            finally:
+                connection.close()
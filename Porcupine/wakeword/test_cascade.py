@@ -0,0 +1,69 @@
+import unittest
+
+import numpy as np
+
+from wakeword.cascade import CascadeDetector
+
+
+class FakeDetector():
+    """Records the first sample of every frame, fires on frames whose first sample is in 'fire_on'."""
+
+    sample_rate = 100
+    frame_length = 10
+
+    def __init__(self, fire_on=(), keyword_file_paths=('hey_sepia_linux.ppn',)):
+        self.fire_on = set(fire_on)
+        self.keyword_file_paths = list(keyword_file_paths)
+        self.seen = []
+
+    def process_buffer(self, pcm):
+        first = int(np.frombuffer(pcm, dtype=np.int16, count=1)[0])
+        self.seen.append(first)
+        return first in self.fire_on
+
+    def delete(self):
+        pass
+
+
+class CascadeDetectorTestCase(unittest.TestCase):
+    def process(self, cascade, frame_numbers):
+        return [cascade.process_buffer(np.full(10, x, dtype=np.int16).tobytes()) for x in frame_numbers]
+
+    def test_confirm_never_sees_a_frame_twice(self):
+        gate = FakeDetector(fire_on=[5, 8, 30])
+        confirm = FakeDetector()
+        # 10 frames per second: 5 frames history, 3 frames follow-up
+        cascade = CascadeDetector(gate, confirm, 1, history_seconds=0.5, follow_up_seconds=0.3)
+        self.process(cascade, range(1, 41))
+
+        # event at 5: history 1-5, follow-up 6-8; the gate fires at 8 during the follow-up, which is no new event
+        # event at 30 (after a gap): the whole history 26-30, follow-up 31-33
+        self.assertEqual(confirm.seen, [1, 2, 3, 4, 5, 6, 7, 8, 26, 27, 28, 29, 30, 31, 32, 33])
+        # the gate keeps up with the audio during the follow-up
+        self.assertEqual(gate.seen, list(range(1, 41)))
+        self.assertEqual(cascade.confirm_frames, len(confirm.seen))
+        self.assertEqual(cascade.gate_detections, 2)
+
+    def test_replay_skips_frames_of_the_follow_up(self):
+        gate = FakeDetector(fire_on=[5, 10])
+        confirm = FakeDetector(fire_on=[12])
+        cascade = CascadeDetector(gate, confirm, 1, history_seconds=0.5, follow_up_seconds=0.3)
+        results = self.process(cascade, range(1, 14))
+
+        # event at 10 replays only 9 and 10, the confirm stage processed 6-8 in the follow-up of the event at 5
+        self.assertEqual(confirm.seen, [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12])
+        self.assertEqual([i + 1 for i, x in enumerate(results) if x], [12])
+        self.assertEqual(cascade.confirmed, 1)
+        self.assertGreaterEqual(cascade.replay_seconds_max, 0.0)
+
+    def test_keywords_of_both_stages_must_match(self):
+        gate = FakeDetector(keyword_file_paths=['alexa_linux_tiny.ppn', 'hey_sepia_linux_tiny.ppn'])
+        CascadeDetector(gate, FakeDetector(keyword_file_paths=['alexa_linux.ppn', 'hey_sepia_linux.ppn']), 2)
+        with self.assertRaises(ValueError):
+            CascadeDetector(gate, FakeDetector(keyword_file_paths=['hey_sepia_linux.ppn', 'alexa_linux.ppn']), 2)
+        with self.assertRaises(ValueError):
+            CascadeDetector(gate, FakeDetector(keyword_file_paths=['alexa_linux.ppn']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
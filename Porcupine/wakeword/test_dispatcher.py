@@ -0,0 +1,25 @@
+import threading
+import unittest
+
+from wakeword.dispatcher import ActionDispatcher
+
+
+class ActionDispatcherTestCase(unittest.TestCase):
+    def test_submit_always_is_never_dropped(self):
+        dispatcher = ActionDispatcher(max_pending=2)
+        release = threading.Event()
+        done = []
+        dispatcher.submit(release.wait)
+        while dispatcher.pending:
+            pass
+        for i in range(3):
+            dispatcher.submit(done.append, i)
+        dispatcher.submit_always(done.append, 'idle')
+        release.set()
+        dispatcher.stop(timeout=5)
+        self.assertEqual(done, [0, 1, 'idle'])
+        self.assertEqual(dispatcher.dropped, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import threading
+import unittest
+
+import numpy as np
+
+from wakeword.frames import FrameQueue, FrameRingBuffer
+
+
+class FrameRingBufferTestCase(unittest.TestCase):
+    def test_push_keeps_all_samples(self):
+        frame_length = 512
+        audio = np.arange(20000, dtype=np.int16)
+        frame_buffer = FrameRingBuffer(frame_length)
+
+        frames = []
+        offset = 0
+        for size in [4096, 100, 300, 700, 5000, 1, 511, 4096]:
+            for frame in frame_buffer.push(audio[offset:offset + size].tobytes()):
+                frames.append(frame.copy())
+            offset += size
+
+        self.assertEqual(len(frames), offset // frame_length)
+        self.assertEqual(frame_buffer.pending, offset % frame_length)
+        np.testing.assert_array_equal(np.concatenate(frames), audio[:len(frames) * frame_length])
+
+
+class FrameQueueTestCase(unittest.TestCase):
+    def test_put_get_and_drop(self):
+        frame_queue = FrameQueue(capacity=2, slot_size=8)
+
+        self.assertTrue(frame_queue.put(b'\x01\x00\x02\x00'))
+        self.assertTrue(frame_queue.put(b'\x03\x00'))
+        self.assertFalse(frame_queue.put(b'\x04\x00'))
+        self.assertFalse(frame_queue.put(b'\x00' * 10))
+        self.assertEqual((frame_queue.depth, frame_queue.received, frame_queue.dropped), (2, 4, 2))
+
+        self.assertEqual(bytes(frame_queue.get()), b'\x01\x00\x02\x00')
+        frame_queue.release()
+        self.assertEqual(bytes(frame_queue.get()), b'\x03\x00')
+        frame_queue.release()
+        self.assertIsNone(frame_queue.get(timeout=0.01))
+        self.assertEqual(frame_queue.max_depth, 2)
+
+    def test_blocking_producer_thread(self):
+        frame_queue = FrameQueue(capacity=3, slot_size=4)
+        buffers = [np.array([i, -i], dtype=np.int16).tobytes() for i in range(2000)]
+
+        def produce():
+            for i, data in enumerate(buffers):
+                frame_queue.put(data, timestamp=float(i), block=True)
+
+        producer = threading.Thread(target=produce)
+        producer.start()
+        received = []
+        while len(received) < len(buffers):
+            data = frame_queue.get(timeout=1.0)
+            self.assertIsNotNone(data)
+            received.append((bytes(data), frame_queue.timestamp))
+            frame_queue.release()
+        producer.join()
+
+        self.assertEqual(received, [(data, float(i)) for i, data in enumerate(buffers)])
+        self.assertEqual((frame_queue.dropped, frame_queue.depth), (0, 0))
+        self.assertLessEqual(frame_queue.max_depth, 3)
+
+        frame_queue.close()
+        self.assertIsNone(frame_queue.get())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,59 @@
+import unittest
+
+import numpy as np
+
+from wakeword.frontend import AudioFrontEnd
+
+
+def _convert(front_end, samples, sizes):
+    output = []
+    offset = 0
+    while offset < len(samples):
+        for size in sizes:
+            output.append(front_end.process(samples[offset:offset + size * front_end.input_channels]).copy())
+            offset += size * front_end.input_channels
+    return np.concatenate(output)
+
+
+class AudioFrontEndTestCase(unittest.TestCase):
+    def test_channel_selection_and_down_mix(self):
+        stereo = np.array([[100, 300], [-100, -301], [7, 9]], dtype=np.int16).ravel()
+
+        np.testing.assert_array_equal(AudioFrontEnd(16000, 2).process(stereo), [200, -200, 8])
+        np.testing.assert_array_equal(AudioFrontEnd(16000, 2, channel=1).process(stereo), [300, -301, 9])
+
+    def test_buffers_ending_within_a_frame(self):
+        stereo = np.array([[i, 1000 + i] for i in range(100)], dtype=np.int16).tobytes()
+        front_end = AudioFrontEnd(16000, 2, channel=1, max_input_frames=50)
+        output = []
+        for start, end in [(0, 3), (3, 130), (130, 131), (131, 333), (333, 400)]:
+            output.extend(front_end.process(stereo[start:end]).tolist())
+
+        self.assertEqual(output, [1000 + i for i in range(100)])
+
+    def test_resampled_sine(self):
+        for input_rate in [44100, 48000]:
+            t = np.arange(input_rate * 2) / float(input_rate)
+            sine = (10000 * np.sin(2 * np.pi * 1000 * t)).astype(np.int16)
+            front_end = AudioFrontEnd(input_rate, 1, max_input_frames=1000)
+
+            output = _convert(front_end, sine, [1000, 17, 333])
+
+            self.assertAlmostEqual(len(output), len(sine) * 16000 // input_rate, delta=1)
+            # same level, and the peak of the spectrum is still at 1 kHz
+            steady = output[1000:].astype(np.float64)
+            self.assertAlmostEqual(steady.std(), 10000 / np.sqrt(2), delta=50)
+            spectrum = np.abs(np.fft.rfft(steady * np.hanning(len(steady))))
+            self.assertAlmostEqual(np.argmax(spectrum) * 16000.0 / len(steady), 1000, delta=2)
+
+    def test_no_aliasing(self):
+        t = np.arange(48000) / 48000.0
+        tone = (10000 * np.sin(2 * np.pi * 12000 * t)).astype(np.int16)
+
+        output = _convert(AudioFrontEnd(48000, 1, max_input_frames=512), tone, [512])
+
+        self.assertLess(output[1000:].astype(np.float64).std(), 50)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,40 @@
+import os
+import tempfile
+import unittest
+
+from wakeword.keywords import KeywordRegistry, parse_keyword_file_name
+
+
+class KeywordRegistryTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        for name in ['hey_sepia_raspberrypi.ppn', 'hey_sepia_raspberrypi_tiny.ppn', 'hey_sepia_windows.ppn',
+                'alexa_linux.ppn', 'alexa_raspberrypi.ppn', 'my_word.ppn', 'notes.txt']:
+            open(os.path.join(self.folder, name), 'w').close()
+        self.registry = KeywordRegistry([self.folder])
+
+    def test_parse_keyword_file_name(self):
+        self.assertEqual(parse_keyword_file_name('/x/hey_sepia_raspberrypi_tiny.ppn'), ('hey_sepia', 'raspberrypi', True))
+        self.assertEqual(parse_keyword_file_name('alexa_linux.ppn'), ('alexa', 'linux', False))
+        self.assertEqual(parse_keyword_file_name('my_word.ppn'), ('my_word', None, False))
+
+    def test_resolve(self):
+        self.assertEqual(self.registry.keywords, ['alexa', 'hey_sepia', 'my_word'])
+        paths, model = self.registry.resolve_all(['hey_sepia', 'alexa', 'my_word'], target_platform='raspberrypi')
+        self.assertEqual([os.path.basename(x) for x in paths], ['hey_sepia_raspberrypi.ppn', 'alexa_raspberrypi.ppn', 'my_word.ppn'])
+        self.assertEqual(os.path.basename(model), 'porcupine_params.pv')
+
+        paths, model = self.registry.resolve_all(['hey_sepia'], tiny=True, target_platform='raspberrypi')
+        self.assertEqual(os.path.basename(paths[0]), 'hey_sepia_raspberrypi_tiny.ppn')
+        self.assertEqual(os.path.basename(model), 'porcupine_tiny_params.pv')
+
+        with self.assertRaises(ValueError):
+            self.registry.resolve('hey_sepia', target_platform='linux')
+        with self.assertRaises(ValueError):
+            self.registry.resolve('computer', target_platform='linux')
+        with self.assertRaises(ValueError):
+            self.registry.resolve_all(['hey_sepia', 'alexa_tiny'], target_platform='raspberrypi')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from wakeword.metrics import MetricsRegistry
+
+
+class MetricsRegistryTestCase(unittest.TestCase):
+    def test_render(self):
+        metrics = MetricsRegistry('test_')
+        detections = metrics.counter('detections_total', 'Detections.', 'keyword', ['hey_sepia', 'computer'])
+        seconds = metrics.histogram('seconds', 'Durations.', [0.1, 1.0])
+        metrics.callback('depth', 'Queue depth.', lambda: 3)
+        metrics.callback('missing', 'Not started yet.', lambda: None.depth)
+
+        detections.inc(1)
+        detections.inc(1)
+        for value in [0.05, 0.1, 0.5, 2.0]:
+            seconds.observe(value)
+
+        self.assertEqual(metrics.render().splitlines(), [
+            '# HELP test_detections_total Detections.',
+            '# TYPE test_detections_total counter',
+            'test_detections_total{keyword="hey_sepia"} 0',
+            'test_detections_total{keyword="computer"} 2',
+            '# HELP test_seconds Durations.',
+            '# TYPE test_seconds histogram',
+            'test_seconds_bucket{le="0.1"} 2',
+            'test_seconds_bucket{le="1.0"} 3',
+            'test_seconds_bucket{le="+Inf"} 4',
+            'test_seconds_sum 2.65',
+            'test_seconds_count 4',
+            '# HELP test_depth Queue depth.',
+            '# TYPE test_depth gauge',
+            'test_depth 3'])
+
+
+if __name__ == '__main__':
+    unittest.main()
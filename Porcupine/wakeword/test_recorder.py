@@ -0,0 +1,68 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+import soundfile
+
+from wakeword import recorder as recorder_module
+from wakeword.recorder import ClipRecorder
+
+
+class ClipRecorderTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_detections_of_the_same_second_keep_all_clips(self):
+        recorder = ClipRecorder(self.folder, 100, pre_roll_seconds=0.1, post_roll_seconds=0.1)
+        recorder.start()
+        for _ in range(3):
+            recorder.write(np.zeros(20, dtype=np.int16))
+            recorder.trigger(0)
+            recorder.trigger(0)
+        recorder.write(np.zeros(20, dtype=np.int16))
+        recorder.stop()
+
+        self.assertEqual(recorder.saved, 6)
+        self.assertEqual(len(os.listdir(self.folder)), 6)
+
+    def test_clips_are_complete_when_audio_is_faster_than_the_writer(self):
+        write = soundfile.write
+        written = []
+
+        def slow_write(path, data, **kwargs):
+            # the detector thread goes on writing many seconds into the ring meanwhile
+            time.sleep(0.05)
+            written.append(path)
+            write(path, data, **kwargs)
+
+        recorder_module.soundfile.write = slow_write
+        try:
+            recorder = ClipRecorder(self.folder, 100, pre_roll_seconds=0.2, post_roll_seconds=0.1)
+            recorder.start()
+            samples = np.arange(3000, dtype=np.int16)
+            triggers = [50, 60, 400, 1000, 2990]
+            for position in range(0, 3000, 10):
+                recorder.write(samples[position:position + 10])
+                if position + 10 in triggers:
+                    recorder.trigger(position + 10)
+            recorder.stop()
+        finally:
+            recorder_module.soundfile.write = write
+
+        self.assertEqual(recorder.saved, len(triggers))
+        for path in written:
+            # 'detection_<time>_<label>.wav', the label is the position of the trigger
+            position = int(os.path.splitext(os.path.basename(path))[0].split('_')[2])
+            audio, _ = soundfile.read(path, dtype='int16')
+            expected = samples[max(0, position - 20):min(position + 10, 3000)]
+            self.assertEqual(audio.tolist(), expected.tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+import unittest
+
+from sepia.targets import RemoteTarget
+from wakeword.routes import RouteTable
+
+
+class RouteTableTestCase(unittest.TestCase):
+    def test_resolve(self):
+        table = RouteTable({
+            'alexa': {'action': 'send', 'type': 'sync', 'payload': {'events': 'timeEvents'}, 'targets': 'uid1008/o1', 'cooldown': 5},
+            'computer': {'language': 'de', 'targets': ['/o1', '/o2/chat']},
+            '*': {'action': 'none'}}, user_id='uid1007', cooldown=1.5)
+        alexa, computer, other = table.resolve(['/x/alexa_linux.ppn', 'computer_raspberrypi_tiny.ppn', 'my_word.ppn'])
+
+        self.assertEqual((alexa.action, alexa.action_type, alexa.payload, alexa.cooldown), ('send', 'sync', '{"events": "timeEvents"}', 5.0))
+        self.assertEqual(alexa.targets, [RemoteTarget('uid1008', 'o1')])
+        self.assertEqual((computer.action, computer.action_type, computer.cooldown), ('microphone', 'hotkey', 1.5))
+        self.assertEqual(computer.targets, [RemoteTarget('uid1007', 'o1', language='de'), RemoteTarget('uid1007', 'o2', 'chat', language='de')])
+        self.assertEqual((other.keyword, other.action), ('*', 'none'))
+
+    def test_defaults(self):
+        targets = [RemoteTarget('uid1007', 'o1')]
+        route = RouteTable(targets=targets).route('hey_sepia')
+        self.assertEqual((route.action, route.targets, route.cooldown), ('microphone', targets, 2.0))
+        self.assertEqual(RouteTable().route('hey_sepia').targets, None)
+
+    def test_invalid(self):
+        self.assertRaises(ValueError, RouteTable, {'alexa': {'action': 'blink'}})
+        self.assertRaises(ValueError, RouteTable, {'alexa': {'action': 'send'}})
+        self.assertRaises(ValueError, RouteTable, {'alexa': {'target': 'uid1007/o1'}})
+        self.assertRaises(ValueError, RouteTable, {'alexa': {'cooldown': -1}})
+
+    def test_load(self):
+        path = os.path.join(tempfile.mkdtemp(), 'routes.json')
+        with open(path, 'w') as routes_file:
+            json.dump({'alexa': {'action': 'none'}}, routes_file)
+        self.assertEqual(RouteTable.load(path).route('alexa').action, 'none')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,27 @@
+import unittest
+
+import numpy as np
+
+from wakeword.shared import SharedFrameRing
+
+
+class SharedFrameRingTestCase(unittest.TestCase):
+    def test_odd_sized_writes(self):
+        ring = SharedFrameRing(4, capacity_frames=8)
+        try:
+            data = np.arange(20, dtype=np.int16).tobytes()
+            for start, end in [(0, 3), (3, 4), (4, 11), (11, 40)]:
+                self.assertTrue(ring.write(data[start:end]))
+            received = []
+            frame = ring.read_frame()
+            while frame is not None:
+                received.extend(frame.tolist())
+                ring.release_frame()
+                frame = ring.read_frame()
+            self.assertEqual(received, list(range(20)))
+        finally:
+            ring.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import io
+import os
+import shutil
+import socket
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from wakeword.frames import FrameRingBuffer
+from wakeword.sources import StreamSource, remove_stale_socket
+
+
+class ChunkedStream(io.RawIOBase):
+    """Returns the data in odd-sized pieces like a pipe or socket may."""
+
+    def __init__(self, data, sizes):
+        self.data = data
+        self.sizes = sizes
+        self.position = 0
+        self.reads = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        size = min(self.sizes[self.reads % len(self.sizes)], len(buffer), len(self.data) - self.position)
+        self.reads += 1
+        buffer[:size] = self.data[self.position:self.position + size]
+        self.position += size
+        return size
+
+
+class StreamSourceTestCase(unittest.TestCase):
+    def _replay(self, channels):
+        samples = np.arange(3000, dtype=np.int16)
+        source = StreamSource(16000, 256, channels, stream=ChunkedStream(samples.tobytes(), [3, 7, 1, 513, 2, 5]))
+        frames = FrameRingBuffer(4 * channels)
+        received = []
+        def _callback(in_data):
+            for frame in frames.push(in_data):
+                received.extend(frame.tolist())
+
+        source.start(_callback)
+        while source.is_active():
+            time.sleep(0.01)
+        return samples.tolist()[:len(received)], received
+
+    def test_odd_sized_reads(self):
+        for channels in (1, 2):
+            expected, received = self._replay(channels)
+            self.assertEqual(len(received), 3000 - 3000 % (4 * channels))
+            self.assertEqual(received, expected)
+
+
+class RemoveStaleSocketTestCase(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.path = os.path.join(self.folder, 'test.sock')
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def test_only_a_dead_socket_is_removed(self):
+        remove_stale_socket(self.path)
+
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen(1)
+        with self.assertRaises(OSError):
+            remove_stale_socket(self.path)
+        self.assertTrue(os.path.exists(self.path))
+
+        server.close()
+        remove_stale_socket(self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+    def test_other_files_are_kept(self):
+        with open(self.path, 'w') as f:
+            f.write('data')
+        with self.assertRaises(OSError):
+            remove_stale_socket(self.path)
+        self.assertTrue(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
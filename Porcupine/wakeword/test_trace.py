@@ -0,0 +1,33 @@
+import json
+import os
+import tempfile
+import unittest
+
+from wakeword.trace import LatencyTracer
+
+
+class LatencyTracerTestCase(unittest.TestCase):
+    def test_stages_log_and_percentiles(self):
+        log_path = os.path.join(tempfile.mkdtemp(), 'trace.jsonl')
+        tracer = LatencyTracer(log_path, window=2)
+
+        tracer.record({'keyword': 'a', 'capture': 0.0, 'enqueue': 0.25, 'detected': 0.5})
+        durations = tracer.record({'keyword': 'b', 'capture': 10.0, 'enqueue': 10.5, 'detected': 11.0,
+            'send': 11.25, 'ack': 11.5, 'success': True})
+        tracer.record({'keyword': 'c', 'capture': 20.0, 'enqueue': 20.75, 'detected': 21.0})
+        tracer.close()
+
+        self.assertEqual(list(durations.items()), [
+            ('buffering', 0.5), ('detection', 0.5), ('dispatch', 0.25), ('network', 0.25), ('total', 1.5)])
+        # only the last 2 traces count, stages without events in them are left out
+        percentiles = tracer.percentiles([50])
+        self.assertEqual(percentiles['buffering'], [0.625])
+        self.assertEqual(percentiles['total'], [1.5])
+        with open(log_path) as log:
+            lines = [json.loads(line) for line in log]
+        self.assertEqual([x['keyword'] for x in lines], ['a', 'b', 'c'])
+        self.assertEqual(lines[1]['ms']['total'], 1500.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
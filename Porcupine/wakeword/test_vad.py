@@ -0,0 +1,55 @@
+import unittest
+
+import numpy as np
+
+from wakeword.vad import GatedDetector
+
+
+class _RecordingDetector():
+    """Stands in for Porcupine: remembers the first sample of every frame it processes."""
+
+    sample_rate = 16000
+    frame_length = 512
+
+    def __init__(self):
+        self.processed = []
+
+    def process_buffer(self, pcm):
+        self.processed.append(int(np.frombuffer(pcm, dtype=np.int16)[0]))
+        return False
+
+    def delete(self):
+        pass
+
+
+class GatedDetectorTestCase(unittest.TestCase):
+    def test_skips_silence_and_replays_pre_roll(self):
+        detector = _RecordingDetector()
+        gate = GatedDetector(detector, num_keywords=1, pre_roll_seconds=0.1, hangover_seconds=0.1)
+        frame = np.zeros(512, dtype=np.int16)
+
+        # silence: each frame is tagged by its first sample (quiet enough to keep the gate closed)
+        for i in range(10):
+            frame[0] = i
+            self.assertFalse(gate.process_buffer(frame))
+        self.assertEqual(detector.processed, [])
+
+        # loud frame: the last 4 silent frames (0.1 s pre-roll) are replayed before it, oldest first
+        loud = (np.sin(np.arange(512) * 0.05) * 10000).astype(np.int16)
+        loud[0] = 100
+        gate.process_buffer(loud)
+        self.assertEqual(detector.processed, [6, 7, 8, 9, 100])
+        self.assertTrue(gate.is_open)
+
+        # the gate stays open for the hangover (3 frames), then closes again
+        for i in range(20, 26):
+            frame[0] = i
+            gate.process_buffer(frame)
+        self.assertEqual(detector.processed[5:], [20, 21, 22])
+        self.assertFalse(gate.is_open)
+        self.assertEqual((gate.frames, gate.openings, gate.replayed), (17, 1, 4))
+        self.assertAlmostEqual(gate.skip_ratio, (17 - 8) / 17.0)
+
+
+if __name__ == '__main__':
+    unittest.main()
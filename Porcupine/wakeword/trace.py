@@ -0,0 +1,85 @@
+#
+# S.E.P.I.A. wake-word detection latency traces
+#
+
+import json
+import threading
+from collections import OrderedDict, deque
+from datetime import datetime
+
+import numpy as np
+
+# (stage, start event, end event), event times are 'time.perf_counter()' values
+STAGES = [
+    ('buffering', 'capture', 'enqueue'),    # end of the keyword captured by the ADC until its buffer was queued
+    ('detection', 'enqueue', 'detected'),   # waiting for the detector thread plus the detector itself
+    ('dispatch', 'detected', 'send'),       # waiting for the dispatcher thread (and LED) until the request starts
+    ('network', 'send', 'ack'),             # remote action until the server answered
+    ('total', 'capture', 'ack')]
+
+
+class LatencyTracer():
+    """
+    Collects one trace per detection with the time of each step from audio capture to the answer of the SEPIA server.
+    Traces are appended to a JSON-lines log and kept in a rolling window for percentiles, so slow triggers can be put
+    down to buffering, detection or the network.
+    """
+
+    def __init__(self, log_path=None, window=100):
+        """
+        Constructor.
+
+        :param log_path: If provided every trace is appended to this file as one JSON line.
+        :param window: Number of recent traces the percentiles are computed of.
+        """
+        self.log_path = log_path
+        self.traces = 0
+        self._durations = OrderedDict((stage, deque(maxlen=window)) for stage, _, _ in STAGES)
+        self._lock = threading.Lock()
+        self._log = open(log_path, 'a') if log_path else None
+
+    def record(self, trace):
+        """
+        Adds a trace and returns the durations of its stages in seconds (stages with a missing event are left out).
+
+        :param trace: Dict with 'keyword' and the event times 'capture', 'enqueue', 'detected' and, if the detection
+        was sent to the server, 'send', 'ack' and 'success'.
+        """
+        durations = OrderedDict()
+        for stage, start, end in STAGES:
+            if trace.get(start) is not None and trace.get(end) is not None:
+                durations[stage] = trace[end] - trace[start]
+        with self._lock:
+            self.traces += 1
+            for stage, seconds in durations.items():
+                self._durations[stage].append(seconds)
+            if self._log is not None:
+                self._log.write(json.dumps(OrderedDict([
+                    ('time', datetime.now().isoformat()),
+                    ('keyword', trace.get('keyword')),
+                    ('success', trace.get('success')),
+                    ('ms', OrderedDict((stage, round(seconds * 1000, 2)) for stage, seconds in durations.items()))])) + '\n')
+                self._log.flush()
+        return durations
+
+    def percentiles(self, percentiles=(50, 90, 99)):
+        """Returns an ordered dict stage -> list of the given percentiles in seconds over the rolling window."""
+
+        with self._lock:
+            samples = [(stage, list(values)) for stage, values in self._durations.items()]
+        return OrderedDict((stage, list(np.percentile(values, percentiles))) for stage, values in samples if values)
+
+    def stats(self):
+        """Summary of the rolling percentiles for the console."""
+
+        stages = self.percentiles()
+        if not stages:
+            return "Detection latency: no detections yet"
+        return "Detection latency p50/p90/p99 ms (last %d of %d): %s" % (
+            max(len(x) for x in self._durations.values()), self.traces,
+            ", ".join("%s %s" % (stage, "/".join("%.0f" % (x * 1000) for x in values)) for stage, values in stages.items()))
+
+    def close(self):
+        if self._log is not None:
+            self._log.close()
+            self._log = None
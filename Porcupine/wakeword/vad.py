@@ -0,0 +1,203 @@
+#
+# S.E.P.I.A. wake-word energy / voice-activity gate
+#
+
+import math
+import time
+
+import numpy as np
+
+
+class GatedDetector():
+    """
+    Skips the detector during sustained silence. Each frame gets a cheap level (RMS in dBFS) and zero-crossing rate
+    check against an adaptive noise floor. While the gate is closed frames only go into a pre-roll buffer. When it
+    opens the pre-roll is replayed into the detector before the current frame, so the detector sees the run-up to a
+    keyword just like without the gate. The gate stays open for 'hangover_seconds' after the last active frame.
+    Works as a drop-in replacement of a Porcupine instance.
+
+    Porcupine adapts to the input level over several seconds. The hangover has to be long enough for the detector to
+    settle on the quiet background before frames are skipped, otherwise the next sound is seen from a different state
+    and detections change (8 s were not enough, 10 s gave identical detections, check with
+    'porcupine_evaluate.py --compare_vad').
+    """
+
+    def __init__(self, detector, num_keywords, threshold_db=-60.0, margin_db=6.0, fricative_zcr=0.3,
+            pre_roll_seconds=1.0, hangover_seconds=10.0, noise_rise_db=0.5):
+        """
+        Constructor.
+
+        :param detector: Porcupine instance (or a drop-in replacement like 'CascadeDetector').
+        :param num_keywords: Number of keywords of the detector.
+        :param threshold_db: Frames below this level (dBFS) never open the gate (digital silence, idle line noise).
+        :param margin_db: Frames this much above the noise floor open the gate.
+        :param fricative_zcr: Zero-crossing rate (per sample) above which frames at half the margin open the gate too,
+        so quiet unvoiced onsets like 's' are not missed.
+        :param pre_roll_seconds: Audio before the gate opens that is replayed into the detector.
+        :param hangover_seconds: Seconds the gate stays open after the last active frame.
+        :param noise_rise_db: How fast (dB per second) the noise floor follows a louder background.
+        """
+        self._detector = detector
+        self._single_keyword = num_keywords == 1
+        self.threshold_db = threshold_db
+        self.margin_db = margin_db
+        self.fricative_zcr = fricative_zcr
+
+        frames_per_second = self.sample_rate / float(self.frame_length)
+        self._pre_roll = np.zeros((max(1, int(math.ceil(pre_roll_seconds * frames_per_second))), self.frame_length),
+            dtype=np.int16)
+        self._pre_roll_index = 0
+        self._pre_roll_count = 0
+        self._hangover_frames = max(1, int(round(hangover_seconds * frames_per_second)))
+        self._hangover_left = 0
+        self._noise_rise = noise_rise_db / frames_per_second
+        self.noise_floor_db = threshold_db
+
+        self._samples = np.zeros(self.frame_length, dtype=np.float32)
+        self._signs = np.zeros(self.frame_length, dtype=bool)
+        self._crossings = np.zeros(self.frame_length - 1, dtype=bool)
+        self._full_scale = float(self.frame_length) * 32768.0 ** 2
+
+        self.frames = 0             # frames seen by the gate
+        self.skipped = 0            # frames the detector did not process
+        self.replayed = 0           # pre-roll frames processed when the gate opened
+        self.openings = 0           # times the gate opened
+        self.gate_seconds = 0.0     # time spent on the level checks
+        self.detector_seconds = 0.0 # time spent in the detector
+
+    @property
+    def sample_rate(self):
+        """Audio sample rate accepted by Porcupine library."""
+
+        return self._detector.sample_rate
+
+    @property
+    def frame_length(self):
+        """Number of audio samples per frame expected by C library."""
+
+        return self._detector.frame_length
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames the detector did not have to process (replayed frames count as processed)."""
+
+        return (self.skipped - self.replayed) / float(self.frames) if self.frames else 0.0
+
+    @property
+    def cpu_saved(self):
+        """
+        Estimated fraction of the detector's CPU time saved by the gate (after the cost of the gate itself). 0 if the
+        gate costs more than it saves, e.g. when it is open nearly all the time.
+        """
+        processed = self.frames - self.skipped + self.replayed
+        if not processed:
+            return 0.0
+        per_frame = self.detector_seconds / processed
+        return max(0.0, (per_frame * (self.skipped - self.replayed) - self.gate_seconds) / (per_frame * self.frames))
+
+    @property
+    def is_open(self):
+        """True while frames go to the detector."""
+
+        return self._hangover_left > 0
+
+    def level(self, pcm):
+        """Returns (level in dBFS, zero-crossing rate) of a frame."""
+
+        samples = self._samples
+        np.copyto(samples, np.frombuffer(pcm, dtype=np.int16, count=self.frame_length), casting='unsafe')
+        energy = float(np.dot(samples, samples))
+        np.signbit(samples, out=self._signs)
+        np.not_equal(self._signs[1:], self._signs[:-1], out=self._crossings)
+        zcr = np.count_nonzero(self._crossings) / float(self.frame_length - 1)
+        return (10.0 * math.log10(energy / self._full_scale + 1e-12), zcr)
+
+    def _is_active(self, level_db, zcr):
+        if level_db < self.noise_floor_db:
+            self.noise_floor_db = max(level_db, -120.0)
+        else:
+            self.noise_floor_db += min(self._noise_rise, level_db - self.noise_floor_db)
+        if level_db < self.threshold_db:
+            return False
+        if level_db > self.noise_floor_db + self.margin_db:
+            return True
+        return zcr > self.fricative_zcr and level_db > self.noise_floor_db + self.margin_db / 2
+
+    def process_buffer(self, pcm):
+        """
+        Same as 'Porcupine.process_buffer', 'pcm' is a frame of 'frame_length' int16 samples.
+        """
+        self.frames += 1
+        start = time.time()
+        level_db, zcr = self.level(pcm)
+        active = self._is_active(level_db, zcr)
+        self.gate_seconds += time.time() - start
+        if active:
+            if not self._hangover_left:
+                return self._open(pcm)
+            self._hangover_left = self._hangover_frames
+        elif self._hangover_left:
+            self._hangover_left -= 1
+        else:
+            # closed: keep the frame for the pre-roll
+            np.copyto(self._pre_roll[self._pre_roll_index], np.frombuffer(pcm, dtype=np.int16, count=self.frame_length))
+            self._pre_roll_index = (self._pre_roll_index + 1) % len(self._pre_roll)
+            self._pre_roll_count = min(self._pre_roll_count + 1, len(self._pre_roll))
+            self.skipped += 1
+            return self._result(-1)
+        start = time.time()
+        result = self._detector.process_buffer(pcm)
+        self.detector_seconds += time.time() - start
+        return result
+
+    def _open(self, pcm):
+        # replay the pre-roll (oldest frame first), then the frame that opened the gate
+        self.openings += 1
+        self._hangover_left = self._hangover_frames
+        start = time.time()
+        result = -1
+        first = (self._pre_roll_index - self._pre_roll_count) % len(self._pre_roll)
+        for i in range(self._pre_roll_count):
+            replay_result = self._keyword_index(self._detector.process_buffer(self._pre_roll[(first + i) % len(self._pre_roll)]))
+            if result < 0:
+                result = replay_result
+        self.replayed += self._pre_roll_count
+        self._pre_roll_count = 0
+        live_result = self._keyword_index(self._detector.process_buffer(pcm))
+        self.detector_seconds += time.time() - start
+        return self._result(result if result >= 0 else live_result)
+
+    def replace_detector(self, detector, num_keywords):
+        """
+        Puts a new detector behind the gate (e.g. other keywords), the gate keeps its state. Returns the old detector.
+        Call it from the thread that calls 'process_buffer'.
+        """
+        if detector.sample_rate != self.sample_rate or detector.frame_length != self.frame_length:
+            raise ValueError("The new detector needs the same sample rate and frame length")
+        old_detector = self._detector
+        self._detector = detector
+        self._single_keyword = num_keywords == 1
+        return old_detector
+
+    def stats(self):
+        """Summary of how much detector work the gate saved."""
+
+        return ("VAD gate: opened %d times, detector skipped %d of %d frames (%.2f%%, %d pre-roll frames replayed), "
+            "CPU saved ~%.1f%%, noise floor %.1f dBFS") % (
+            self.openings, self.skipped - self.replayed, self.frames, 100 * self.skip_ratio, self.replayed,
+            100 * self.cpu_saved, self.noise_floor_db)
+
+    def delete(self):
+        """Releases the detector."""
+
+        self._detector.delete()
+
+    def _keyword_index(self, result):
+        if self._single_keyword:
+            return 0 if result else -1
+        return result
+
+    def _result(self, keyword_index):
+        if self._single_keyword:
+            return keyword_index == 0
+        return keyword_index